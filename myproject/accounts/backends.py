@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .principal import user_cache_key
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that serves the per-request user lookup from the cache.
+
+    AuthenticationMiddleware resolves request.user through get_user() on every
+    request; the cached instance still carries the password hash, so Django's
+    session-hash check keeps logging out sessions after a password change.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -2,6 +2,8 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from functools import wraps
 
+from .principal import get_principal
+
 
 def permission_required(*permissions):
     """
@@ -11,18 +13,13 @@ def permission_required(*permissions):
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            user = request.user
-            
-            # ✅ Check if Administrator or Superuser
-            if user.is_superuser or user.role == 'administrator':
-                return view_func(request, *args, **kwargs)
+            principal = get_principal(request.user)
             
-            # Check if user has ALL required permissions
-            for permission in permissions:
-                if not getattr(user, permission, False):
-                    # ✅ ADD SPECIAL FLAG FOR MODAL
-                    messages.error(request, '❌ You do not have permission to access this page.', extra_tags='permission_denied')
-                    return redirect('dashboard')
+            # ✅ Administrators and superusers pass; others need ALL permissions
+            if not principal.has_all(*permissions):
+                # ✅ ADD SPECIAL FLAG FOR MODAL
+                messages.error(request, '❌ You do not have permission to access this page.', extra_tags='permission_denied')
+                return redirect('dashboard')
             
             return view_func(request, *args, **kwargs)
         return wrapper
@@ -36,15 +33,8 @@ def admin_or_permission_required(*permissions):
     def decorator(view_func):
         @wraps(view_func)
         def wrapper(request, *args, **kwargs):
-            user = request.user
-            
-            if user.is_superuser or user.role == 'administrator':
-                return view_func(request, *args, **kwargs)
-            
-            # Check if user has ANY of the permissions
-            has_permission = any(getattr(user, perm, False) for perm in permissions)
-            
-            if not has_permission:
+            # Check if user is admin or has ANY of the permissions
+            if not get_principal(request.user).has_any(*permissions):
                 messages.error(request, '❌ You do not have permission to access this page.', extra_tags='permission_denied')
                 return redirect('dashboard')
             
@@ -60,7 +50,7 @@ def admin_only(view_func):
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
         # ✅ Check if Administrator or Superuser
-        if not (request.user.is_superuser or request.user.role == 'administrator'):
+        if not get_principal(request.user).is_administrator:
             messages.error(request, '❌ Only administrators can access this page.', extra_tags='permission_denied')
             return redirect('dashboard')
         return view_func(request, *args, **kwargs)
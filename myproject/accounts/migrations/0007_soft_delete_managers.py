@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:15
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customuser_vendor_id'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='customuser',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-date_joined'], 'verbose_name': 'User', 'verbose_name_plural': 'Users'},
+        ),
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('all_objects', accounts.models.SoftDeleteUserManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-date_joined'], name='user_live_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['role'], name='user_live_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['-deleted_at'], name='user_trash_idx'),
+        ),
+    ]
@@ -1,7 +1,23 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 from decimal import Decimal
 
+from dashboard.images import ImageVariants
+from dashboard.managers import LiveManagerMixin, SoftDeleteQuerySet, TrashedManagerMixin
+
+
+class SoftDeleteUserManager(UserManager.from_queryset(SoftDeleteQuerySet)):
+    pass
+
+
+class LiveUserManager(LiveManagerMixin, SoftDeleteUserManager):
+    use_in_migrations = False
+
+
+class TrashedUserManager(TrashedManagerMixin, SoftDeleteUserManager):
+    use_in_migrations = False
+
+
 class CustomUser(AbstractUser):
     """User Model with Granular Custom Permissions"""
     
@@ -89,6 +105,12 @@ class CustomUser(AbstractUser):
     user_permissions = models.ManyToManyField('auth.Permission', related_name='custom_user_set', blank=True)
     
     REQUIRED_FIELDS = ['email']
+
+    # Soft delete: objects is live users only, see dashboard.managers.
+    # all_objects stays the default so login and createsuperuser see every row.
+    all_objects = SoftDeleteUserManager()
+    objects = LiveUserManager()
+    trashed = TrashedUserManager()
     
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -96,6 +118,10 @@ class CustomUser(AbstractUser):
     @property
     def is_administrator(self):
         return self.role == 'administrator' or self.is_superuser
+
+    @property
+    def profile_picture_variants(self):
+        return ImageVariants(self.profile_picture)
     
     def soft_delete(self, deleted_by_user):
         from django.utils import timezone
@@ -136,7 +162,15 @@ class CustomUser(AbstractUser):
             self.max_discount_percent = Decimal('10.00')
     
     class Meta:
+        default_manager_name = 'all_objects'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-date_joined']
+        indexes = [
+            # user_list: live users newest first, role counts
+            models.Index(fields=['-date_joined'], condition=models.Q(is_deleted=False), name='user_live_joined_idx'),
+            models.Index(fields=['role'], condition=models.Q(is_deleted=False), name='user_live_role_idx'),
+            # user_trash orders by deleted_at
+            models.Index(fields=['-deleted_at'], condition=models.Q(is_deleted=True), name='user_trash_idx'),
+        ]
 
@@ -0,0 +1,100 @@
+"""
+Cached per-user principal: role plus the can_* flags packed into a bitmask.
+
+permission_required and friends check this instead of the wide CustomUser
+row. Entries are dropped by accounts.signals whenever a user is saved or
+deleted (edit, toggle status, soft delete, restore, password change). Only
+cached with SHARED_CACHE; a per-process cache would keep serving revoked
+permissions in the other workers.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CustomUser
+
+# Bit positions follow model field order
+PERMISSION_FIELDS = tuple(f.name for f in CustomUser._meta.concrete_fields if f.name.startswith('can_'))
+PERMISSION_BITS = {name: 1 << i for i, name in enumerate(PERMISSION_FIELDS)}
+
+# Derived from the user's fields, so adding, removing or reordering a can_*
+# flag (or any field of the cached user row) moves every entry to new keys
+# instead of decoding old bitmasks against the new positions
+CACHE_VERSION = hashlib.md5(
+    repr(tuple(f.attname for f in CustomUser._meta.concrete_fields)).encode(), usedforsecurity=False
+).hexdigest()[:8]
+
+
+def principal_cache_key(user_id):
+    return f'accounts:principal:v{CACHE_VERSION}:{user_id}'
+
+
+def user_cache_key(user_id):
+    return f'accounts:user:v{CACHE_VERSION}:{user_id}'
+
+
+class Principal:
+    """Immutable snapshot of what a user is allowed to do."""
+
+    __slots__ = ('user_id', 'role', 'is_superuser', 'is_active', 'permissions')
+
+    def __init__(self, user_id, role, is_superuser, is_active, permissions):
+        self.user_id = user_id
+        self.role = role
+        self.is_superuser = is_superuser
+        self.is_active = is_active
+        self.permissions = permissions
+
+    @classmethod
+    def from_user(cls, user):
+        mask = 0
+        for name, bit in PERMISSION_BITS.items():
+            if getattr(user, name, False):
+                mask |= bit
+        return cls(user.pk, user.role, user.is_superuser, user.is_active, mask)
+
+    @property
+    def is_administrator(self):
+        return self.is_superuser or self.role == 'administrator'
+
+    def has(self, permission):
+        return bool(self.permissions & PERMISSION_BITS.get(permission, 0))
+
+    def has_all(self, *permissions):
+        return self.is_administrator or all(self.has(p) for p in permissions)
+
+    def has_any(self, *permissions):
+        return self.is_administrator or any(self.has(p) for p in permissions)
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+
+def get_principal(user):
+    """Principal for an authenticated user, memoised on the instance and in the cache."""
+    principal = getattr(user, '_principal', None)
+    if principal is not None:
+        return principal
+    if not user.is_authenticated:
+        return Principal(None, None, False, False, 0)
+
+    if not settings.SHARED_CACHE:
+        principal = Principal.from_user(user)
+    else:
+        key = principal_cache_key(user.pk)
+        principal = cache.get(key)
+        if principal is None:
+            principal = Principal.from_user(user)
+            cache.set(key, principal, settings.USER_CACHE_TIMEOUT)
+    user._principal = principal
+    return principal
+
+
+def invalidate_user(user_id):
+    cache.delete_many([principal_cache_key(user_id), user_cache_key(user_id)])
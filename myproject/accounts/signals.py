@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CustomUser
+from .principal import invalidate_user
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Drop the cached user/principal after edit, status toggle, soft delete or password change"""
+    invalidate_user(instance.pk)
+    instance.__dict__.pop('_principal', None)
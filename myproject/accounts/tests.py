@@ -1,3 +1,60 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from .backends import CachedModelBackend
+from .principal import get_principal
+
+User = get_user_model()
+
+
+@override_settings(SHARED_CACHE=True, AUTHENTICATION_BACKENDS=['accounts.backends.CachedModelBackend'])
+class CachedPrincipalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='warehouse1', email='warehouse1@example.com', password='old-pass-123', role='warehouse'
+        )
+
+    def test_backend_serves_user_from_cache(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(self.user.pk).pk, self.user.pk)
+
+    def test_principal_bitmask(self):
+        self.user.can_view_dispatch = True
+        self.user.can_delete_orders = False
+        self.user.save()
+        principal = get_principal(User.objects.get(pk=self.user.pk))
+        self.assertTrue(principal.has('can_view_dispatch'))
+        self.assertFalse(principal.has('can_delete_orders'))
+        self.assertFalse(principal.is_administrator)
+
+    def test_save_invalidates_principal(self):
+        self.assertFalse(get_principal(User.objects.get(pk=self.user.pk)).has('can_delete_orders'))
+        self.user.can_delete_orders = True
+        self.user.save()
+        self.assertTrue(get_principal(User.objects.get(pk=self.user.pk)).has('can_delete_orders'))
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        self.user.soft_delete(deleted_by_user=None)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_principal_not_cached_without_shared_cache(self):
+        get_principal(User.objects.get(pk=self.user.pk))
+        # Another worker's save can't clear this process's cache
+        User.objects.filter(pk=self.user.pk).update(can_delete_orders=True)
+        self.assertTrue(get_principal(User.objects.get(pk=self.user.pk)).has('can_delete_orders'))
+
+    def test_password_change_invalidates_cached_user(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        self.user.set_password('new-pass-456')
+        self.user.save()
+        self.assertTrue(backend.get_user(self.user.pk).check_password('new-pass-456'))
@@ -34,7 +34,7 @@ def user_list(request):
     search = request.GET.get('search', '')
     role_filter = request.GET.get('role', '')
     
-    users = User.objects.filter(is_deleted=False)
+    users = User.objects.all()
     
     if search:
         users = users.filter(
@@ -50,12 +50,12 @@ def user_list(request):
     users = users.order_by('-date_joined')
     
     role_counts = {
-        'administrator': User.objects.filter(role='administrator', is_deleted=False).count(),
-        'warehouse': User.objects.filter(role='warehouse', is_deleted=False).count(),
-        'sales': User.objects.filter(role='sales', is_deleted=False).count(),
+        'administrator': User.objects.filter(role='administrator').count(),
+        'warehouse': User.objects.filter(role='warehouse').count(),
+        'sales': User.objects.filter(role='sales').count(),
     }
     
-    deleted_count = User.objects.filter(is_deleted=True).count()
+    deleted_count = User.trashed.count()
     
     context = {
         'users': users,
@@ -70,7 +70,7 @@ def user_list(request):
 @administrator_required
 def user_trash(request):
     """Display trashed users"""
-    users = User.objects.filter(is_deleted=True).order_by('-deleted_at')
+    users = User.trashed.order_by('-deleted_at')
     context = {'users': users}
     return render(request, 'accounts/user_trash.html', context)
 
@@ -106,11 +106,11 @@ def user_create(request):
                 ]
             })
         
-        if User.objects.filter(username=username).exists():
+        if User.all_objects.filter(username=username).exists():
             messages.error(request, f'❌ Username "{username}" already exists!')
             return render(request, 'accounts/user_create.html')
         
-        if User.objects.filter(email=email).exists():
+        if User.all_objects.filter(email=email).exists():
             messages.error(request, f'❌ Email "{email}" is already registered!')
             return render(request, 'accounts/user_create.html')
         
@@ -260,7 +260,7 @@ def user_create(request):
 @administrator_required
 def user_edit(request, user_id):
     """Edit user and permissions"""
-    edit_user = get_object_or_404(User, id=user_id, is_deleted=False)
+    edit_user = get_object_or_404(User.objects, id=user_id)
     
     if request.method == 'POST':
         # Basic Information
@@ -399,7 +399,7 @@ def user_edit(request, user_id):
 @login_required
 @administrator_required
 def user_soft_delete(request, user_id):
-    user = get_object_or_404(User, id=user_id, is_deleted=False)
+    user = get_object_or_404(User.objects, id=user_id)
     
     if user.id == request.user.id:
         messages.error(request, '❌ You cannot delete yourself!')
@@ -417,7 +417,7 @@ def user_soft_delete(request, user_id):
 @login_required
 @administrator_required
 def user_restore(request, user_id):
-    user = get_object_or_404(User, id=user_id, is_deleted=True)
+    user = get_object_or_404(User.trashed, id=user_id)
     username = user.username
     user.restore()
     messages.success(request, f'♻️ User "{username}" restored!')
@@ -426,7 +426,7 @@ def user_restore(request, user_id):
 @login_required
 @administrator_required
 def user_hard_delete(request, user_id):
-    user = get_object_or_404(User, id=user_id, is_deleted=True)
+    user = get_object_or_404(User.trashed, id=user_id)
     
     if user.id == request.user.id:
         messages.error(request, '❌ You cannot delete yourself!')
@@ -440,7 +440,7 @@ def user_hard_delete(request, user_id):
 @login_required
 @administrator_required
 def user_toggle_status(request, user_id):
-    user = get_object_or_404(User, id=user_id, is_deleted=False)
+    user = get_object_or_404(User.objects, id=user_id)
     
     if user.id == request.user.id:
         messages.error(request, '❌ You cannot deactivate yourself!')
@@ -487,12 +487,12 @@ def profile_view(request):
         # Orders Statistics (only if user has permission)
         if user.can_view_orders or user.role == 'administrator':
             if user.role == 'administrator':
-                orders = Order.objects.filter(is_deleted=False)
+                orders = Order.objects.all()
             elif user.role == 'sales':
                 # Sales can see their own orders
-                orders = Order.objects.filter(created_by=user, is_deleted=False)
+                orders = Order.objects.filter(created_by=user)
             else:
-                orders = Order.objects.filter(is_deleted=False)
+                orders = Order.objects.all()
             
             stats['orders_count'] = orders.count()
             stats['orders_value'] = orders.aggregate(
@@ -513,16 +513,14 @@ def profile_view(request):
         
         # Products Statistics
         if user.can_view_products or user.role == 'administrator':
-            stats['products_count'] = Product.objects.filter(
-                is_deleted=False
-            ).count()
+            stats['products_count'] = Product.objects.count()
         
         # Returns Statistics
         if user.can_view_returns or user.role == 'administrator':
             if user.role == 'administrator':
-                returns = ReturnRequest.objects.filter(is_deleted=False)
+                returns = ReturnRequest.objects.all()
             else:
-                returns = ReturnRequest.objects.filter(created_by=user, is_deleted=False)
+                returns = ReturnRequest.objects.filter(created_by=user)
             
             stats['returns_count'] = returns.count()
             stats['pending_returns'] = returns.filter(return_status='pending').count()
@@ -531,14 +529,12 @@ def profile_view(request):
         # Dispatch Statistics (fallback to orders with dispatched/in_transit status)
         if user.can_view_dispatch or user.role == 'administrator':
             stats['dispatch_count'] = Order.objects.filter(
-                is_deleted=False,
                 order_status__in=['dispatched', 'in_transit']
             ).count()
         
         # Inventory Statistics
         if user.can_view_inventory or user.role == 'administrator':
             stats['low_stock_count'] = Product.objects.filter(
-                is_deleted=False,
                 stock__lte=10
             ).count()
     
@@ -557,8 +553,7 @@ def profile_view(request):
         # Recent orders
         if user.can_view_orders or user.role == 'administrator':
             recent_orders = Order.objects.filter(
-                created_at__gte=timezone.now() - timezone.timedelta(days=7),
-                is_deleted=False
+                created_at__gte=timezone.now() - timezone.timedelta(days=7)
             ).order_by('-created_at')[:5]
             
             for order in recent_orders:
@@ -574,8 +569,7 @@ def profile_view(request):
         # Recent returns
         if user.can_view_returns or user.role == 'administrator':
             recent_returns = ReturnRequest.objects.filter(
-                created_at__gte=timezone.now() - timezone.timedelta(days=7),
-                is_deleted=False
+                created_at__gte=timezone.now() - timezone.timedelta(days=7)
             ).order_by('-created_at')[:5]
             
             for ret in recent_returns:
@@ -650,7 +644,7 @@ def profile_update(request):
         # Validate email uniqueness (excluding current user)
         if email and email != user.email:
             from .models import User
-            if User.objects.filter(email=email).exclude(id=user.id).exists():
+            if User.all_objects.filter(email=email).exclude(id=user.id).exists():
                 messages.error(request, '❌ This email is already registered to another user.')
                 has_errors = True
         
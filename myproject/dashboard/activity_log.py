@@ -0,0 +1,113 @@
+"""
+Write-behind batching for OrderActivityLog and ReturnActivityLog.
+
+Inside a collect() scope, log_order() / log_return() build unsaved rows and
+the whole batch is written with one bulk_create per model when the enclosing
+transaction commits (or straight away under autocommit). If the transaction
+rolls back the batch is dropped with it, exactly like the individual
+INSERTs would have been. Outside a scope both helpers fall back to
+objects.create(), so call sites can be switched over one at a time:
+
+    with transaction.atomic():
+        with activity_log.collect():
+            for order in orders:
+                ...
+                activity_log.log_order(order=order, action_type='status_changed', ...)
+
+Views can use the collect_activity decorator to scope a whole request.
+Entries logged inside a savepoint that is rolled back while the scope stays
+open are still written, so log after the savepoint, not inside it.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import transaction
+
+BATCH_SIZE = 500
+
+_current = ContextVar('dashboard_activity_log', default=None)
+
+
+class ActivityLogCollector:
+    """Unsaved log rows waiting for the transaction to commit."""
+
+    def __init__(self):
+        self.order_logs = []
+        self.return_logs = []
+
+    def __len__(self):
+        return len(self.order_logs) + len(self.return_logs)
+
+    def flush(self):
+        from .models import OrderActivityLog, ReturnActivityLog
+
+        order_logs, self.order_logs = self.order_logs, []
+        return_logs, self.return_logs = self.return_logs, []
+        if order_logs:
+            OrderActivityLog.objects.bulk_create(order_logs, batch_size=BATCH_SIZE)
+        if return_logs:
+            ReturnActivityLog.objects.bulk_create(return_logs, batch_size=BATCH_SIZE)
+        return len(order_logs) + len(return_logs)
+
+
+def current_collector():
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """
+    Buffer activity logs until the enclosing transaction commits.
+
+    Nested scopes join the outermost one, so a decorated view calling a helper
+    that opens its own scope still produces a single batch.
+    """
+    collector = _current.get()
+    if collector is not None:
+        yield collector
+        return
+
+    collector = ActivityLogCollector()
+    token = _current.set(collector)
+    try:
+        yield collector
+    finally:
+        _current.reset(token)
+        if len(collector):
+            # Dropped by Django if the surrounding atomic block rolls back
+            transaction.on_commit(collector.flush)
+
+
+def collect_activity(view_func):
+    """View decorator: one activity-log batch per request."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with collect():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def log_order(**fields):
+    """OrderActivityLog.objects.create() that batches inside collect()."""
+    from .models import OrderActivityLog
+
+    collector = _current.get()
+    if collector is None:
+        return OrderActivityLog.objects.create(**fields)
+    entry = OrderActivityLog(**fields)
+    collector.order_logs.append(entry)
+    return entry
+
+
+def log_return(**fields):
+    """ReturnActivityLog.objects.create() that batches inside collect()."""
+    from .models import ReturnActivityLog
+
+    collector = _current.get()
+    if collector is None:
+        return ReturnActivityLog.objects.create(**fields)
+    entry = ReturnActivityLog(**fields)
+    collector.return_logs.append(entry)
+    return entry
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, Order, OrderItem, Category, Customer
+from .models import Product, Order, OrderItem, Category, Customer, RequestMetric, PriceChangeBatch
 from .models import ProductAttribute, ProductAttributeValue, ProductVariation, VariationAttributeValue
 
 
@@ -44,4 +44,18 @@ class ProductAttributeValueAdmin(admin.ModelAdmin):
 class ProductVariationAdmin(admin.ModelAdmin):
     list_display = ['sku', 'product', 'price', 'stock']
     list_filter = ['product']
-    search_fields = ['sku', 'product__name']
\ No newline at end of file
+    search_fields = ['sku', 'product__name']
+
+
+@admin.register(RequestMetric)
+class RequestMetricAdmin(admin.ModelAdmin):
+    list_display = ['url_name', 'window_start', 'request_count', 'wall_ms_max', 'query_count_max', 'ncm_calls']
+    list_filter = ['url_name']
+    date_hierarchy = 'window_start'
+
+
+@admin.register(PriceChangeBatch)
+class PriceChangeBatchAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'action', 'percentage', 'product_count', 'variation_count', 'created_by', 'rolled_back_at']
+    list_filter = ['action', 'include_variations']
+    date_hierarchy = 'created_at'
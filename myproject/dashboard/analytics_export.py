@@ -0,0 +1,239 @@
+"""
+Parquet export of orders, order items, returns and stock movements for
+offline analytics.
+
+    result = analytics_export.export('/srv/exports/analytics')             # changed months only
+    result = analytics_export.export(directory, full=True, datasets=['orders', 'order_items'])
+    result.rows, result.files, result.datasets['orders']
+
+Each dataset is a directory of month partitions in the Hive layout that
+pandas / pyarrow / DuckDB / Spark read as one table with a `month` column:
+
+    orders/month=2026-10/part-0.parquet
+
+A partition is read with one ordered query streamed in EXPORT_BATCH rows
+(QuerySet.iterator) and written a record batch at a time, so memory stays flat
+however large the table. Trashed orders and returns are included, with their
+is_deleted column.
+
+Every run stores a watermark per dataset in _watermarks.json. The next run
+only rewrites the months whose rows (or whose parent order / return / stock-in)
+have an updated_at at or after it, so each id still appears exactly once.
+Orders purged from the database only disappear from the files with
+full=True, which rewrites every month and removes empty ones.
+"""
+
+import json
+import os
+import shutil
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .models import Order, OrderItem, ReturnItem, ReturnRequest, StockInItem
+
+EXPORT_BATCH = 10000
+COMPRESSION = 'zstd'
+WATERMARK_FILE = '_watermarks.json'
+# Rows saved by a transaction still open when the previous run read are picked up by the next one
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# model, extra {column: lookup} besides the model's own fields, month partition field, watermark field
+Dataset = namedtuple('Dataset', ['model', 'extra', 'partition', 'watermark'])
+
+DATASETS = {
+    'orders': Dataset(Order, {}, 'created_at', 'updated_at'),
+    # Items change together with their order (order_edit saves it)
+    'order_items': Dataset(OrderItem, {}, 'order__created_at', 'order__updated_at'),
+    'returns': Dataset(ReturnRequest, {}, 'created_at', 'updated_at'),
+    'return_items': Dataset(ReturnItem, {}, 'return_request__created_at', 'return_request__updated_at'),
+    'stock_movements': Dataset(StockInItem, {
+        'reference_number': 'stock_in__reference_number',
+        'stock_in_type': 'stock_in__stock_in_type',
+        'supplier_name': 'stock_in__supplier_name',
+        'stock_in_created_at': 'stock_in__created_at',
+    }, 'stock_in__created_at', 'stock_in__updated_at'),
+}
+
+
+class ExportResult:
+
+    def __init__(self):
+        self.datasets = {}  # name -> {'rows', 'files', 'months'}
+        self.bytes = 0
+        self.seconds = 0.0
+
+    @property
+    def rows(self):
+        return sum(entry['rows'] for entry in self.datasets.values())
+
+    @property
+    def files(self):
+        return sum(entry['files'] for entry in self.datasets.values())
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else self.rows
+
+
+def _field(model, lookup):
+    """The model field a values() lookup such as 'stock_in__reference_number' ends on."""
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def _arrow_type(field):
+    internal = field.get_internal_type()
+    if field.is_relation:
+        return _arrow_type(field.target_field)
+    if internal in ('AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField', 'PositiveIntegerField',
+                    'PositiveSmallIntegerField', 'SmallIntegerField'):
+        return pa.int64()
+    if internal == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC')
+    if internal == 'DateField':
+        return pa.date32()
+    if internal == 'BooleanField':
+        return pa.bool_()
+    return pa.string()  # Char / Text / File fields
+
+
+def columns(dataset):
+    """[(column, values() lookup)], the model's own columns first."""
+    spec = DATASETS[dataset]
+    own = [(field.attname, field.attname) for field in spec.model._meta.concrete_fields]
+    return own + list(spec.extra.items())
+
+
+def schema(dataset):
+    model = DATASETS[dataset].model
+    return pa.schema([(column, _arrow_type(_field(model, lookup))) for column, lookup in columns(dataset)])
+
+
+def _months(dataset, since=None):
+    """Local month starts (aware) with rows in the dataset, or with rows changed since the watermark."""
+    spec = DATASETS[dataset]
+    rows = spec.model._base_manager.all()
+    if since is not None:
+        rows = rows.filter(**{f'{spec.watermark}__gte': since})
+    return list(rows.datetimes(spec.partition, 'month'))
+
+
+def _next_month(start):
+    naive = timezone.make_naive(start)
+    return timezone.make_aware((naive.replace(day=1) + timedelta(days=32)).replace(day=1))
+
+
+def _write_month(dataset, arrow_schema, start, path):
+    """Stream one month into path (via a temp file); returns the row count, 0 leaves no file."""
+    spec = DATASETS[dataset]
+    rows = spec.model._base_manager.filter(**{
+        f'{spec.partition}__gte': start, f'{spec.partition}__lt': _next_month(start),
+    }).order_by('pk').values_list(*[lookup for _, lookup in columns(dataset)]).iterator(chunk_size=EXPORT_BATCH)
+
+    written = 0
+    temp_path = f'{path}.tmp'
+    writer = None
+    try:
+        while True:
+            chunk = list(islice(rows, EXPORT_BATCH))
+            if not chunk:
+                break
+            if writer is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                writer = pq.ParquetWriter(temp_path, arrow_schema, compression=COMPRESSION)
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), arrow_schema)],
+                schema=arrow_schema,
+            ))
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if written:
+        os.replace(temp_path, path)
+    elif os.path.exists(path):
+        os.remove(path)  # the month's rows were all purged
+    return written
+
+
+def _partition_dir(directory, dataset, start):
+    return os.path.join(directory, dataset, f'month={timezone.make_naive(start):%Y-%m}')
+
+
+def _read_watermarks(directory):
+    try:
+        with open(os.path.join(directory, WATERMARK_FILE), encoding='utf-8') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_watermarks(directory, watermarks):
+    path = os.path.join(directory, WATERMARK_FILE)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as fh:
+        json.dump(watermarks, fh, indent=2, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+
+
+def export(directory, datasets=None, full=False, stdout=None):
+    """
+    Write the datasets (all by default) under directory; returns an
+    ExportResult. Without full, only months changed since the last run's
+    watermark are rewritten, and a dataset exported for the first time is
+    written in full. ValueError for an unknown dataset.
+    """
+    datasets = list(datasets or DATASETS)
+    unknown = [name for name in datasets if name not in DATASETS]
+    if unknown:
+        raise ValueError(f'Unknown export dataset "{unknown[0]}"')
+
+    started = time.perf_counter()
+    result = ExportResult()
+    os.makedirs(directory, exist_ok=True)
+    watermarks = _read_watermarks(directory)
+
+    for dataset in datasets:
+        # Taken before reading, so anything saved during the export is exported again next time
+        run_started = timezone.now()
+        since = watermarks.get(dataset)
+        incremental = not full and since is not None
+        months = _months(dataset, since=datetime.fromisoformat(since) if incremental else None)
+        arrow_schema = schema(dataset)
+        entry = result.datasets[dataset] = {'rows': 0, 'files': 0, 'months': len(months)}
+
+        written_dirs = set()
+        for start in months:
+            partition = _partition_dir(directory, dataset, start)
+            path = os.path.join(partition, 'part-0.parquet')
+            rows = _write_month(dataset, arrow_schema, start, path)
+            if rows:
+                entry['rows'] += rows
+                entry['files'] += 1
+                result.bytes += os.path.getsize(path)
+                written_dirs.add(partition)
+            if stdout:
+                stdout.write(f'  {dataset} {os.path.basename(partition)}: {rows} rows')
+
+        dataset_dir = os.path.join(directory, dataset)
+        if not incremental and os.path.isdir(dataset_dir):
+            # Months with no rows left (purged orders)
+            for name in os.listdir(dataset_dir):
+                if name.startswith('month=') and os.path.join(dataset_dir, name) not in written_dirs:
+                    shutil.rmtree(os.path.join(dataset_dir, name), ignore_errors=True)
+
+        watermarks[dataset] = (run_started - WATERMARK_OVERLAP).isoformat()
+        _save_watermarks(directory, watermarks)
+
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,90 @@
+"""
+Shared helpers for the benchmark management commands.
+
+Results are appended as JSON lines to settings.BENCHMARK_RESULTS_FILE, one
+line per (suite, case) run, tagged with the git revision so runs can be
+compared across commits.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def results_path():
+    return getattr(settings, 'BENCHMARK_RESULTS_FILE', os.path.join(settings.BASE_DIR, 'logs', 'benchmarks.jsonl'))
+
+
+def summarize_timings(timings):
+    """Milliseconds summary for a list of durations in seconds."""
+    ordered = sorted(timings)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 2),
+        'median_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def time_call(func, repeat=5, warmup=1):
+    """Run func warmup + repeat times; return (timings, last result)."""
+    result = None
+    for _ in range(warmup):
+        result = func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def record(suite, case, metrics):
+    """Append one result line and return it."""
+    entry = {
+        'suite': suite,
+        'case': case,
+        'revision': git_revision(),
+        'recorded_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        **metrics,
+    }
+    path = results_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as fh:
+        fh.write(json.dumps(entry, default=str) + '\n')
+    return entry
+
+
+def previous(suite, case, exclude_revision=None):
+    """Most recent stored result for suite/case, optionally from another revision."""
+    path = results_path()
+    if not os.path.exists(path):
+        return None
+    found = None
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('suite') == suite and entry.get('case') == case and entry.get('revision') != exclude_revision:
+                found = entry
+    return found
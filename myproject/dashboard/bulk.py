@@ -0,0 +1,39 @@
+"""
+Write a different value to each of many rows, one UPDATE per batch.
+
+    bulk.update_rows(Customer.objects.all(), customers, ['email', 'updated_at'])
+
+Same result as QuerySet.bulk_update(), but the per-row CASE is plain SQL:
+bulk_update() builds a When() expression for every row and field, and for
+a few thousand rows that costs more to compile than the UPDATE takes to run.
+"""
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+BATCH_SIZE = 500
+
+
+def update_rows(queryset, objs, fields, batch_size=BATCH_SIZE):
+    """UPDATE fields of objs (model instances with a pk) to their current values; returns the row count."""
+    connection = connections[queryset.db]
+    opts = queryset.model._meta
+    pk_column = connection.ops.quote_name(opts.pk.column)
+    fields = [opts.get_field(name) for name in fields]
+    objs = list(objs)
+    updated = 0
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        values = {}
+        for field in fields:
+            then = '%s'
+            if connection.features.requires_casted_case_in_updates:
+                then = f'CAST(%s AS {field.db_type(connection)})'
+            params = []
+            for obj in batch:
+                params += [obj.pk, field.get_db_prep_save(getattr(obj, field.attname), connection)]
+            values[field.attname] = RawSQL(
+                f'CASE {pk_column} {" ".join([f"WHEN %s THEN {then}"] * len(batch))} END', params, output_field=field,
+            )
+        updated += queryset.filter(pk__in=[obj.pk for obj in batch]).update(**values)
+    return updated
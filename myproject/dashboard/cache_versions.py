@@ -0,0 +1,32 @@
+"""
+Version stamps for cache namespaces.
+
+Cached entries embed version(key) in their own keys; bump(key) makes every
+one of them unreachable at once, in every process sharing the cache, without
+having to know or delete the individual keys:
+
+    key = f'dashboard:sales_facts:{cache_versions.version(VERSION_KEY)}:...'
+    cache_versions.bump(VERSION_KEY)
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def version(key):
+    """Current stamp for key, created on first use."""
+    stamp = cache.get(key)
+    if stamp is None:
+        # Fresh stamp (not 1) so an evicted key can't match a stale entry
+        cache.add(key, time.time_ns(), None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def bump(key):
+    """Move key to a new stamp, orphaning everything cached under the old one."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
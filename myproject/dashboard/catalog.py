@@ -0,0 +1,54 @@
+"""
+Shared lookups for the products list.
+
+categories() is cached until a Category changes (see signals.py), when the
+cache is shared between workers.
+product_facets() computes the stat cards and the per-category counts in one
+conditional aggregate, COUNT(*) FILTER (WHERE ...) per facet, instead of a
+COUNT query for each.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Category, Product
+
+CATEGORIES_CACHE_KEY = 'dashboard:catalog:categories'
+
+LOW_STOCK = 10
+
+
+def categories():
+    """All categories ordered by name."""
+    if not settings.SHARED_CACHE:
+        return list(Category.objects.order_by('name'))
+    result = cache.get(CATEGORIES_CACHE_KEY)
+    if result is None:
+        result = list(Category.objects.order_by('name'))
+        cache.set(CATEGORIES_CACHE_KEY, result, None)
+    return result
+
+
+def invalidate_categories():
+    cache.delete(CATEGORIES_CACHE_KEY)
+
+
+def product_facets(category_list):
+    """
+    {'total', 'active', 'low_stock', 'out_of_stock', 'categories': {id: count}}
+    over the live catalogue.
+    """
+    aggregates = {
+        'total': Count('pk'),
+        'active': Count('pk', filter=Q(is_active=True)),
+        'low_stock': Count('pk', filter=Q(stock__lte=LOW_STOCK, stock__gt=0)),
+        'out_of_stock': Count('pk', filter=Q(stock=0)),
+    }
+    for category in category_list:
+        aggregates[f'category_{category.pk}'] = Count('pk', filter=Q(category_id=category.pk))
+
+    row = Product.objects.aggregate(**aggregates)
+    facets = {name: row[name] for name in ('total', 'active', 'low_stock', 'out_of_stock')}
+    facets['categories'] = {category.pk: row[f'category_{category.pk}'] for category in category_list}
+    return facets
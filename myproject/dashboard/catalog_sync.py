@@ -0,0 +1,361 @@
+"""
+Catalogue export and upsert import (products, variations, categories, prices).
+
+    header, rows = catalog_sync.export_rows()            # generator, see tabular.write_*
+    result = catalog_sync.import_file(upload, user)      # ImportResult
+    result = catalog_sync.import_file(upload, user, set_stock=True)
+
+One row per product or variation:
+
+    type, sku, parent_sku, name, variation_name, category, price, cost_price,
+    stock, barcode, is_active, status, description
+
+A product's sku is its slug; new products get the slugified sku. Variation rows carry their product's sku in
+parent_sku and come after it. Without a type column, rows that have a
+parent_sku are variations.
+
+Import works through the file in chunks of CHUNK_SIZE rows, each in its own
+transaction. Each chunk matches rows to existing products (by slug, then by
+barcode) and variations (by SKU, then by barcode) with one lookup per model.
+It then bulk_creates the rows that are new and updates only the rows whose
+values differ, with bulk.update_rows(). Columns missing from the file and
+empty cells are left untouched, so "sku,price" is a valid price list
+(clearing a field is done in the product form). Memory use depends on the
+chunk size, not on the file size.
+
+stock is exported but only read for new rows: an export re-imported hours
+later would otherwise undo every sale and stock-in made since, with no StockIn
+record. set_stock=True overwrites existing stock from the file as well.
+"""
+
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import bulk, catalog, tabular
+from .models import Category, Product, ProductVariation
+
+CHUNK_SIZE = 1000
+
+HEADER = [
+    'type', 'sku', 'parent_sku', 'name', 'variation_name', 'category', 'price', 'cost_price',
+    'stock', 'barcode', 'is_active', 'status', 'description',
+]
+
+COLUMNS = {
+    'type': ('type', 'row type'),
+    'sku': ('sku', 'slug', 'code'),
+    'parent_sku': ('parent sku', 'parent', 'product sku'),
+    'name': ('name', 'product name', 'title'),
+    'variation_name': ('variation name', 'variation'),
+    'category': ('category',),
+    'price': ('price', 'selling price'),
+    'cost_price': ('cost price', 'cost'),
+    'stock': ('stock', 'quantity', 'qty'),
+    'barcode': ('barcode', 'ean', 'upc'),
+    'is_active': ('is active', 'active'),
+    'status': ('status',),
+    'description': ('description',),
+}
+
+# Model field written for each column, per row type; stock only with set_stock or on create
+PRODUCT_FIELDS = ('name', 'category', 'price', 'cost_price', 'barcode', 'is_active', 'description')
+VARIATION_FIELDS = ('variation_name', 'price', 'barcode', 'is_active', 'status')
+STOCK_FIELDS = ('stock',)
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+VARIATION_STATUSES = {value for value, _ in ProductVariation.STATUS_CHOICES}
+
+
+class ImportResult:
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.rejected = []  # (line, sku, reason)
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else self.rows
+
+
+# ---------------------------------------------------------------- export
+
+def export_rows(products=None, chunk_size=CHUNK_SIZE):
+    """(HEADER, generator of rows): every product followed by its variations."""
+    products = Product.objects.all() if products is None else products
+    return HEADER, _export(products.select_related('category').order_by('pk'), chunk_size)
+
+
+def _export(products, chunk_size):
+    last_pk = 0
+    while True:
+        # Keyset over pk: constant memory without a server-side cursor
+        chunk = list(products.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return
+        variations = {}
+        for variation in ProductVariation.objects.filter(product__in=chunk).order_by('product_id', 'pk'):
+            variations.setdefault(variation.product_id, []).append(variation)
+        for product in chunk:
+            yield [
+                'product', product.slug, '', product.name, '', product.category.name if product.category else '',
+                product.price, product.cost_price, product.stock, product.barcode or '',
+                _flag(product.is_active), '', product.description,
+            ]
+            for variation in variations.get(product.pk, ()):
+                yield [
+                    'variation', variation.sku, product.slug, '', variation.variation_name or '', '',
+                    variation.price, '', variation.stock, variation.barcode or '',
+                    _flag(variation.is_active), variation.status, '',
+                ]
+        last_pk = chunk[-1].pk
+
+
+def _flag(value):
+    return 'yes' if value or value is None else 'no'
+
+
+# ---------------------------------------------------------------- import
+
+class _RowError(ValueError):
+    pass
+
+
+def _parse(row, columns):
+    """{column: python value} for the non-empty cells of the row."""
+    values = {}
+    for key, index in columns.items():
+        raw = tabular.cell(row, index)
+        if raw == '':
+            continue
+        if key in ('price', 'cost_price'):
+            try:
+                values[key] = Decimal(raw).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise _RowError(f'{key} is not a number')
+            if values[key] < 0:
+                raise _RowError(f'{key} cannot be negative')
+        elif key == 'stock':
+            try:
+                values[key] = int(Decimal(raw))
+            except (InvalidOperation, ValueError, OverflowError):
+                raise _RowError('stock is not a whole number')
+        elif key == 'is_active':
+            if raw.lower() in TRUE_VALUES:
+                values[key] = True
+            elif raw.lower() in FALSE_VALUES:
+                values[key] = False
+            else:
+                raise _RowError('is_active must be yes or no')
+        elif key == 'status':
+            if raw not in VARIATION_STATUSES:
+                raise _RowError(f'status must be one of {", ".join(sorted(VARIATION_STATUSES))}')
+            values[key] = raw
+        else:
+            values[key] = raw
+    return values
+
+
+def _current(obj, field):
+    """Field value normalised the way _parse() reads it back from a file."""
+    if field == 'category':
+        return obj.category_id
+    value = getattr(obj, field)
+    if field == 'barcode':
+        return (value or '').strip() or None
+    if field == 'is_active':
+        return value is not False
+    if isinstance(value, str) or value is None and field in ('name', 'variation_name', 'description'):
+        return (value or '').strip()
+    return value
+
+
+def _apply_values(obj, values, fields):
+    """Set changed fields on obj; returns the names that changed."""
+    changed = []
+    for field in fields:
+        if field in values and _current(obj, field) != values[field]:
+            setattr(obj, 'category_id' if field == 'category' else field, values[field])
+            changed.append(field)
+    return changed
+
+
+def _categories(names, cache):
+    """Fill cache {name: category_id}, creating missing categories in bulk."""
+    missing = {name for name in names if name and name not in cache}
+    if not missing:
+        return
+    for pk, name in Category.objects.filter(name__in=missing).values_list('pk', 'name'):
+        cache.setdefault(name, pk)
+    new = []
+    taken = set(Category.objects.filter(slug__in=[slugify(n) for n in missing]).values_list('slug', flat=True))
+    for name in sorted(missing - set(cache)):
+        slug = base = slugify(name) or 'category'
+        suffix = 2
+        while slug in taken:
+            slug = f'{base}-{suffix}'
+            suffix += 1
+        taken.add(slug)
+        new.append(Category(name=name, slug=slug))
+    for category in Category.objects.bulk_create(new):
+        cache[category.name] = category.pk
+    if new:
+        catalog.invalidate_categories()  # bulk_create sends no post_save
+
+
+def _match(by_slug, sku):
+    """Exact slug first (older products have mixed-case slugs), then the slugified SKU."""
+    if not sku:
+        return None
+    return by_slug.get(sku) or by_slug.get(slugify(sku))
+
+
+def _import_products(rows, user, result, category_cache, set_stock):
+    """rows: [(line, values)] for product rows of one chunk."""
+    fields = PRODUCT_FIELDS + STOCK_FIELDS if set_stock else PRODUCT_FIELDS
+    _categories({values.get('category') for _, values in rows}, category_cache)
+    skus = {sku for _, values in rows if values.get('sku') for sku in (values['sku'], slugify(values['sku']))}
+    barcodes = {values['barcode'] for _, values in rows if values.get('barcode')}
+    by_sku, by_barcode = {}, {}
+    products = Product.all_objects.filter(Q(slug__in=skus) | Q(barcode__in=barcodes)).only('slug', *fields)
+    for product in products:
+        by_sku[product.slug] = product
+        if product.barcode:
+            by_barcode.setdefault(product.barcode, product)
+
+    now = timezone.now()
+    to_create, to_update, update_fields = [], {}, set()
+    for line, values in rows:
+        if 'category' in values:
+            values['category'] = category_cache[values['category']]
+        product = _match(by_sku, values.get('sku')) or by_barcode.get(values.get('barcode'))
+        if product is None:
+            if not slugify(values.get('sku', '')) or not values.get('name') or 'price' not in values:
+                result.rejected.append((line, values.get('sku', ''), 'New product needs sku, name and price'))
+                continue
+            product = Product(user=user, slug=slugify(values['sku']), description='', product_type='simple')
+            _apply_values(product, values, PRODUCT_FIELDS + STOCK_FIELDS)
+            by_sku[product.slug] = product
+            to_create.append(product)
+            continue
+        if product.pk in to_update or product in to_create:
+            result.rejected.append((line, values.get('sku', ''), 'Same product twice in one chunk'))
+            continue
+        changed = _apply_values(product, values, fields)
+        if changed:
+            product.updated_at = now
+            to_update[product.pk] = product
+            update_fields.update(changed)
+        else:
+            result.unchanged += 1
+
+    Product.objects.bulk_create(to_create)
+    bulk.update_rows(Product.all_objects.all(), to_update.values(), sorted(update_fields | {'updated_at'}))
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def _import_variations(rows, result, set_stock):
+    """rows: [(line, values)] for variation rows of one chunk, after their products."""
+    fields = VARIATION_FIELDS + STOCK_FIELDS if set_stock else VARIATION_FIELDS
+    skus = {values['sku'] for _, values in rows if values.get('sku')}
+    barcodes = {values['barcode'] for _, values in rows if values.get('barcode')}
+    parents = {
+        sku for _, values in rows if values.get('parent_sku')
+        for sku in (values['parent_sku'], slugify(values['parent_sku']))
+    }
+    by_sku, by_barcode = {}, {}
+    variations = ProductVariation.objects.filter(Q(sku__in=skus) | Q(barcode__in=barcodes))
+    variations = variations.only('sku', *fields)
+    for variation in variations:
+        by_sku[variation.sku] = variation
+        if variation.barcode:
+            by_barcode.setdefault(variation.barcode, variation)
+    parent_products = {
+        slug: (pk, price)
+        for pk, slug, price in Product.all_objects.filter(slug__in=parents).values_list('pk', 'slug', 'price')
+    }
+
+    now = timezone.now()
+    to_create, to_update, update_fields, made_variable = [], {}, set(), set()
+    for line, values in rows:
+        variation = by_sku.get(values.get('sku')) or by_barcode.get(values.get('barcode'))
+        if variation is None:
+            parent = _match(parent_products, values.get('parent_sku'))
+            if not values.get('sku') or parent is None:
+                result.rejected.append((line, values.get('sku', ''), 'New variation needs sku and a known parent_sku'))
+                continue
+            variation = ProductVariation(product_id=parent[0], sku=values['sku'], price=values.get('price', parent[1]))
+            _apply_values(variation, values, VARIATION_FIELDS + STOCK_FIELDS)
+            by_sku[variation.sku] = variation
+            to_create.append(variation)
+            made_variable.add(parent[0])
+            continue
+        if variation.pk in to_update or variation in to_create:
+            result.rejected.append((line, values.get('sku', ''), 'Same variation twice in one chunk'))
+            continue
+        changed = _apply_values(variation, values, fields)
+        if changed:
+            variation.updated_at = now
+            to_update[variation.pk] = variation
+            update_fields.update(changed)
+        else:
+            result.unchanged += 1
+
+    ProductVariation.objects.bulk_create(to_create)
+    bulk.update_rows(ProductVariation.objects.all(), to_update.values(), sorted(update_fields | {'updated_at'}))
+    if made_variable:
+        simple = Product.all_objects.filter(pk__in=made_variable).exclude(product_type='variable')
+        simple.update(product_type='variable')
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def import_file(upload, user, chunk_size=CHUNK_SIZE, kind=None, set_stock=False):
+    """
+    Upsert a catalogue file (kind: csv / xlsx / jsonl, default from its name); returns an ImportResult.
+    Existing stock is only overwritten with set_stock.
+    """
+    started = time.perf_counter()
+    result = ImportResult()
+    header, rows = tabular.read(upload, kind)
+    columns = tabular.column_map(header, COLUMNS, required=('sku',))
+    category_cache = {}
+
+    line = 1
+    for chunk in tabular.chunked(rows, chunk_size):
+        products, variations = [], []
+        for row in chunk:
+            line += 1
+            try:
+                values = _parse(row, columns)
+            except _RowError as e:
+                result.rows += 1
+                result.rejected.append((line, tabular.cell(row, columns['sku']), str(e)))
+                continue
+            if not values:
+                continue  # blank line
+            result.rows += 1
+            row_type = values.pop('type', '').lower() or ('variation' if values.get('parent_sku') else 'product')
+            if row_type not in ('product', 'variation'):
+                result.rejected.append((line, values.get('sku', ''), 'type must be product or variation'))
+                continue
+            (variations if row_type == 'variation' else products).append((line, values))
+
+        with transaction.atomic():
+            if products:
+                _import_products(products, user, result, category_cache, set_stock)
+            if variations:
+                _import_variations(variations, result, set_stock)
+
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,255 @@
+"""
+In-process city directory for the order form.
+
+Cities are loaded once per process into a prefix trie (names, individual
+words and aliases) and answered from memory: autocomplete, valley/out-valley
+classification and typo-tolerant matching. A version stamp in the shared
+cache is bumped whenever a City changes; each process compares it on access
+and reloads when it is stale. Without SHARED_CACHE the stamp is the table's
+latest updated_at and row count, one small query per access.
+"""
+
+import re
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+from . import cache_versions
+
+CityEntry = namedtuple('CityEntry', 'id name valley_status is_active')
+
+VERSION_KEY = 'dashboard:city_directory:version'
+
+# Common spellings / neighbourhoods -> canonical city name
+ALIASES = {
+    'ktm': 'Kathmandu',
+    'kath': 'Kathmandu',
+    'kathmandu valley': 'Kathmandu',
+    'thamel': 'Kathmandu',
+    'patan': 'Lalitpur',
+    'ltp': 'Lalitpur',
+    'bkt': 'Bhaktapur',
+    'bhaktpur': 'Bhaktapur',
+    'thimi': 'Madhyapur Thimi',
+    'brt': 'Biratnagar',
+    'bhairahawa': 'Siddharthanagar',
+}
+
+# Used to classify names that are not in the City table yet
+DEFAULT_VALLEY_CITIES = {
+    'kathmandu', 'lalitpur', 'bhaktapur', 'kirtipur', 'thimi', 'madhyapur thimi',
+    'tokha', 'budhanilkantha', 'gokarneshwor', 'patan', 'thamel', 'ktm',
+}
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(name):
+    return _NON_WORD_RE.sub(' ', (name or '').lower()).strip()
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, or limit + 1 as soon as it is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        best = i
+        for j, cb in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(value)
+            best = min(best, value)
+        if best > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class _TrieNode:
+    __slots__ = ('children', 'city_ids')
+
+    def __init__(self):
+        self.children = {}
+        self.city_ids = set()
+
+
+class CityDirectory:
+    """Immutable snapshot of the City table."""
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.by_id = {e.id: e for e in entries}
+        self.by_key = {}
+        self.root = _TrieNode()
+
+        for entry in entries:
+            key = normalize(entry.name)
+            self.by_key[key] = entry
+            self._insert(key, entry.id)
+            for word in key.split()[1:]:
+                self._insert(word, entry.id)
+
+        self.aliases = {}
+        for alias, canonical in ALIASES.items():
+            entry = self.by_key.get(normalize(canonical))
+            if entry:
+                self.aliases[alias] = entry
+                self._insert(alias, entry.id)
+
+    def _insert(self, key, city_id):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.city_ids.add(city_id)
+
+    def _collect(self, node, found, limit):
+        stack = [node]
+        while stack and len(found) < limit * 4:
+            current = stack.pop()
+            found.update(current.city_ids)
+            stack.extend(current.children.values())
+
+    def autocomplete(self, prefix, limit=10, active_only=True):
+        key = normalize(prefix)
+        if not key:
+            return []
+        node = self.root
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                return []
+        found = set()
+        self._collect(node, found, limit)
+        entries = [self.by_id[i] for i in found if not active_only or self.by_id[i].is_active]
+        # Names that start with the query rank ahead of word/alias hits
+        entries.sort(key=lambda e: (not normalize(e.name).startswith(key), e.name))
+        return entries[:limit]
+
+    def fuzzy(self, name, limit=5):
+        key = normalize(name)
+        max_distance = 1 if len(key) <= 5 else 2
+        scored = []
+        for candidate, entry in list(self.by_key.items()) + list(self.aliases.items()):
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, entry.name, entry))
+        scored.sort(key=lambda s: (s[0], s[1]))
+        seen, results = set(), []
+        for distance, _, entry in scored:
+            if entry.id not in seen:
+                seen.add(entry.id)
+                results.append((entry, distance))
+        return results[:limit]
+
+    def get(self, name):
+        return self.by_key.get(normalize(name))
+
+    def resolve(self, name):
+        """Active city that name spells exactly or through an alias: (entry or None, match_type)."""
+        key = normalize(name)
+        for match_type, lookup in (('exact', self.by_key), ('alias', self.aliases)):
+            entry = lookup.get(key)
+            if entry and entry.is_active:
+                return entry, match_type
+        return None, None
+
+    def suggest(self, name, limit=5):
+        """Active cities name may have meant: close spellings first, then completions."""
+        entries = [entry for entry, _ in self.fuzzy(name, limit=limit) if entry.is_active]
+        entries += [entry for entry in self.autocomplete(name, limit=limit) if entry not in entries]
+        return entries[:limit]
+
+    def classify(self, name):
+        """
+        Valley status for any user-typed city name.
+
+        Returns a dict shaped like the old valley-status endpoints. Only an
+        exact or alias match of an active city exists; anything else gets
+        the default valley rule, with close cities as suggestions.
+        """
+        entry, match_type = self.resolve(name)
+        if entry:
+            return {
+                'city': entry.name,
+                'city_id': entry.id,
+                'valley_status': entry.valley_status,
+                'exists': True,
+                'match_type': match_type,
+                'suggestions': [],
+            }
+        key = normalize(name)
+        is_valley = key in DEFAULT_VALLEY_CITIES or any(w in DEFAULT_VALLEY_CITIES for w in key.split())
+        return {
+            'city': (name or '').strip().title(),
+            'city_id': None,
+            'valley_status': 'valley' if is_valley else 'out_valley',
+            'exists': False,
+            'match_type': 'default',
+            'suggestions': self.suggest(key) if key else [],
+        }
+
+    def active_cities(self):
+        return sorted((e for e in self.by_id.values() if e.is_active), key=lambda e: e.name)
+
+
+_lock = threading.Lock()
+_directory = None
+
+
+def _load(version):
+    from .models import City
+    entries = [CityEntry(*row) for row in City.objects.values_list('id', 'name', 'valley_status', 'is_active')]
+    return CityDirectory(entries, version)
+
+
+def _version():
+    if not settings.SHARED_CACHE:
+        # Another process's invalidate() never reaches this cache
+        from django.db.models import Count, Max
+        from .models import City
+        return tuple(City.objects.aggregate(Max('updated_at'), Count('pk')).values())
+    return cache_versions.version(VERSION_KEY)
+
+
+def get_directory():
+    """Current directory, reloading if another process or request changed a City."""
+    global _directory
+    version = _version()
+    directory = _directory
+    if directory is None or directory.version != version:
+        with _lock:
+            if _directory is None or _directory.version != version:
+                _directory = _load(version)
+            directory = _directory
+    return directory
+
+
+def invalidate():
+    """Mark every process's directory stale."""
+    cache_versions.bump(VERSION_KEY)
+
+
+def ensure_city(name, valley_status):
+    """
+    Make sure a City row exists with the given valley status, writing only
+    when the directory says something is missing or different.
+    """
+    from .models import City
+
+    name = (name or '').strip()
+    if not name:
+        return None
+    entry = get_directory().get(name)
+    if entry and entry.valley_status == valley_status:
+        return entry.id
+
+    city, created = City.objects.get_or_create(
+        name=entry.name if entry else name,
+        defaults={'valley_status': valley_status, 'is_active': True},
+    )
+    if not created and city.valley_status != valley_status:
+        city.valley_status = valley_status
+        city.save(update_fields=['valley_status', 'updated_at'])
+    return city.id
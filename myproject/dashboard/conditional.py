@@ -0,0 +1,95 @@
+"""
+Conditional GET and compact JSON for the AJAX endpoints.
+
+    @login_required
+    @conditional.etag_json(_product_etag)
+    def api_get_product(request, product_id):
+        ...
+        return conditional.FastJsonResponse({...})
+
+The etag function gets the view's arguments and returns the parts that
+identify the current payload (updated_at values, counts, cache version
+stamps), or None when there is nothing to validate against. A request whose
+If-None-Match matches is answered with 304 before the view runs, so nothing
+is queried beyond the stamps and nothing is serialised.
+
+FastJsonResponse encodes with orjson, several times faster than json.dumps
+with DjangoJSONEncoder on the Decimal- and datetime-heavy product payloads.
+"""
+
+import hashlib
+from decimal import Decimal
+from functools import wraps
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.functional import Promise
+import orjson
+
+
+def _orjson_default(value):
+    if isinstance(value, (Decimal, Promise)):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes; Decimal as string, datetimes as RFC 3339, int keys as strings."""
+    return orjson.dumps(data, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJsonResponse(HttpResponse):
+    """JsonResponse for dict payloads using dumps()."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
+
+
+def make_etag(*parts):
+    """Quoted ETag for the given parts."""
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_json(etag_func):
+    """
+    View decorator: ETag from etag_func(request, *args, **kwargs), 304 when it
+    matches If-None-Match. Responses are private and revalidated on every use.
+    """
+    def compute(request, *args, **kwargs):
+        parts = etag_func(request, *args, **kwargs)
+        if parts is None:
+            return None
+        # Same URL, different user or query: different representation
+        return make_etag(request.user.pk, request.GET.urlencode(), parts)
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            etag = compute(request, *args, **kwargs)
+            if etag is not None:
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return _finish(not_modified, etag)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if etag is None:
+                # The view may have filled the cache the stamp comes from
+                etag = compute(request, *args, **kwargs)
+            return _finish(response, etag)
+        return wrapper
+    return decorator
+
+
+def _finish(response, etag):
+    if etag is not None:
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
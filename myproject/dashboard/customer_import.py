@@ -0,0 +1,271 @@
+"""
+Bulk customer import from CSV / XLSX / JSON Lines, deduplicated by phone.
+
+    result = customer_import.import_file(upload, dry_run=True)
+    result.created, result.updated, result.unchanged, result.duplicates, result.changes
+
+Phones are normalised (digits only, +977 / 00977 dropped) before anything
+is compared. The file is processed in chunks of CHUNK_SIZE rows: each chunk
+looks up its phones with one batched query per LOOKUP_BATCH phones, merges
+the rows into the matching customers (or into an earlier row with the same
+phone) and writes the result with bulk_create / bulk.update_rows in its own
+transaction. Memory use depends on the chunk size, not on the file size.
+The lookup compares against the indexed digits-only form of Customer.phone
+(models.phone_digits), so numbers stored as 984-1234567 or +977 984 123 4567
+are found as well.
+
+How a file value is merged into an existing customer is decided per field:
+
+    fill       only when the customer's field is empty (default)
+    overwrite  the file wins whenever its cell is not empty
+    append     added on a new line unless already there (notes)
+    keep       never changed by an import
+
+Defaults are in DEFAULT_RULES and can be overridden with the
+CUSTOMER_IMPORT_RULES setting or the rules argument. A dry run goes through
+exactly the same steps inside a transaction that is rolled back, so its
+report is what a real import would do.
+"""
+
+import re
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from . import bulk, tabular
+from .models import Customer, phone_digits
+
+CHUNK_SIZE = 1000
+LOOKUP_BATCH = 500
+REPORT_LIMIT = 200  # rejected rows / planned changes kept for the report
+
+COLUMNS = {
+    'phone': ('phone', 'mobile', 'phone number', 'mobile number', 'contact', 'contact number'),
+    'name': ('name', 'customer name', 'full name'),
+    'alternate_phone': ('alternate phone', 'alt phone', 'phone 2', 'secondary phone'),
+    'email': ('email', 'e-mail', 'email address'),
+    'city': ('city', 'district'),
+    'state': ('state', 'province'),
+    'postal_code': ('postal code', 'zip', 'postcode'),
+    'country': ('country',),
+    'address': ('address', 'street address', 'shipping address'),
+    'landmark': ('landmark',),
+    'customer_type': ('customer type', 'type'),
+    'notes': ('notes', 'note', 'remarks'),
+}
+FIELDS = tuple(key for key in COLUMNS if key != 'phone')
+
+STRATEGIES = ('fill', 'overwrite', 'append', 'keep')
+DEFAULT_RULES = {field: 'fill' for field in FIELDS}
+DEFAULT_RULES['notes'] = 'append'
+
+CUSTOMER_TYPES = {value for value, _ in Customer.CUSTOMER_TYPES}
+COUNTRY_CODE = '977'
+
+
+class ImportResult:
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0  # rows merged into an earlier row of the same file
+        self.rejected = []  # (line, phone, reason), first REPORT_LIMIT
+        self.rejected_count = 0
+        self.changes = []  # (line, phone, 'create' / 'update', [fields]), first REPORT_LIMIT
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else self.rows
+
+    def reject(self, line, phone, reason):
+        self.rejected_count += 1
+        if len(self.rejected) < REPORT_LIMIT:
+            self.rejected.append((line, phone, reason))
+
+    def record(self, line, phone, action, fields):
+        if len(self.changes) < REPORT_LIMIT:
+            self.changes.append((line, phone, action, fields))
+
+
+def normalize_phone(raw):
+    """'+977-984-1234567' -> '9841234567'; '' when it is not a plausible phone number."""
+    digits = re.sub(r'\D', '', str(raw or ''))
+    for prefix in ('00' + COUNTRY_CODE, COUNTRY_CODE):
+        if digits.startswith(prefix) and len(digits) - len(prefix) >= 8:
+            digits = digits[len(prefix):]
+            if not digits.startswith('9'):
+                digits = '0' + digits  # landline: +977 1 4xxxxxx is 01-4xxxxxx
+            break
+    return digits if 7 <= len(digits) <= 15 else ''
+
+
+def phone_variants(phone):
+    """Digit strings (models.phone_digits of Customer.phone) a normalised phone may be stored as."""
+    national = phone[1:] if phone.startswith('0') else phone
+    return {phone, f'{COUNTRY_CODE}{national}', f'00{COUNTRY_CODE}{national}'}
+
+
+def resolve_rules(rules=None):
+    resolved = {**DEFAULT_RULES, **getattr(settings, 'CUSTOMER_IMPORT_RULES', {}), **(rules or {})}
+    for field, strategy in resolved.items():
+        if field not in DEFAULT_RULES:
+            raise ValueError(f'Unknown customer field "{field}"')
+        if strategy not in STRATEGIES:
+            raise ValueError(f'Unknown merge rule "{strategy}" for {field}, use one of {", ".join(STRATEGIES)}')
+    return resolved
+
+
+class _RowError(ValueError):
+    pass
+
+
+def _parse(row, columns):
+    """{field: value} for the non-empty cells of the row, phone normalised."""
+    values = {}
+    for key, index in columns.items():
+        raw = tabular.cell(row, index)
+        if not raw:
+            continue
+        if key in ('phone', 'alternate_phone'):
+            phone = normalize_phone(raw)
+            if not phone:
+                raise _RowError(f'{key.replace("_", " ")} "{raw}" is not a phone number')
+            raw = phone
+        elif key == 'email':
+            try:
+                validate_email(raw)
+            except ValidationError:
+                raise _RowError(f'email "{raw}" is not valid')
+            raw = raw.lower()
+        elif key == 'customer_type':
+            raw = raw.lower()
+            if raw not in CUSTOMER_TYPES:
+                raise _RowError(f'customer type must be one of {", ".join(sorted(CUSTOMER_TYPES))}')
+        max_length = Customer._meta.get_field(key).max_length
+        if max_length and len(raw) > max_length:
+            raise _RowError(f'{key.replace("_", " ")} is longer than {max_length} characters')
+        values[key] = raw
+    if values.get('alternate_phone') == values.get('phone'):
+        values.pop('alternate_phone', None)
+    return values
+
+
+def merge(customer, values, rules):
+    """Apply values to customer according to rules; returns the names of the fields that changed."""
+    changed = []
+    for field in FIELDS:
+        value = values.get(field)
+        strategy = rules[field]
+        if not value or strategy == 'keep':
+            continue
+        current = getattr(customer, field) or ''
+        if current == value or strategy == 'fill' and current:
+            continue
+        if strategy == 'append':
+            if value in current:
+                continue
+            value = f'{current}\n{value}' if current else value
+        setattr(customer, field, value)
+        changed.append(field)
+    return changed
+
+
+def _existing(phones):
+    """{normalised phone: Customer} for the phones already in the database."""
+    found = {}
+    phones = list(phones)
+    for start in range(0, len(phones), LOOKUP_BATCH):
+        variants = {variant for phone in phones[start:start + LOOKUP_BATCH] for variant in phone_variants(phone)}
+        matches = Customer.objects.alias(digits=phone_digits('phone')).filter(digits__in=variants)
+        for customer in matches.order_by('pk'):
+            found.setdefault(normalize_phone(customer.phone), customer)
+    return found
+
+
+def _import_chunk(rows, rules, result, started_at):
+    """rows: [(line, values)] of one chunk."""
+    existing = _existing({values['phone'] for _, values in rows})
+    now = timezone.now()
+    to_create, to_update, update_fields, seen = {}, {}, set(), set()
+
+    for line, values in rows:
+        phone = values['phone']
+        if phone in to_create:
+            result.duplicates += 1
+            merge(to_create[phone], values, rules)
+            continue
+        customer = existing.get(phone)
+        if customer is None:
+            if not values.get('name') or not values.get('city'):
+                result.reject(line, phone, 'New customer needs name and city')
+                continue
+            customer = Customer(phone=phone, address='')
+            result.record(line, phone, 'create', merge(customer, values, {field: 'overwrite' for field in FIELDS}))
+            to_create[phone] = customer
+            continue
+
+        # Written by an earlier chunk of this import counts as a duplicate too
+        duplicate = phone in seen or customer.updated_at >= started_at
+        seen.add(phone)
+        changed = merge(customer, values, rules)
+        if changed:
+            customer.updated_at = now
+            to_update[phone] = customer
+            update_fields.update(changed)
+            result.record(line, phone, 'update', changed)
+        if duplicate:
+            result.duplicates += 1
+        elif not changed:
+            result.unchanged += 1
+
+    with transaction.atomic():
+        Customer.objects.bulk_create(list(to_create.values()), batch_size=LOOKUP_BATCH)
+        bulk.update_rows(Customer.objects.all(), to_update.values(), sorted(update_fields | {'updated_at'}))
+    result.created += len(to_create)
+    result.updated += len(to_update)
+
+
+def import_file(upload, rules=None, dry_run=False, chunk_size=CHUNK_SIZE, kind=None):
+    """Import a customer file; returns an ImportResult. ValueError if the file or the rules are unusable."""
+    started = time.perf_counter()
+    started_at = timezone.now()
+    rules = resolve_rules(rules)
+    result = ImportResult(dry_run)
+    header, rows = tabular.read(upload, kind)
+    columns = tabular.column_map(header, COLUMNS, required=('phone',))
+
+    with transaction.atomic() if dry_run else nullcontext():
+        line = 1
+        for chunk in tabular.chunked(rows, chunk_size):
+            parsed = []
+            for row in chunk:
+                line += 1
+                try:
+                    values = _parse(row, columns)
+                except _RowError as e:
+                    result.rows += 1
+                    result.reject(line, tabular.cell(row, columns['phone']), str(e))
+                    continue
+                if not values:
+                    continue  # blank line
+                result.rows += 1
+                if 'phone' not in values:
+                    result.reject(line, '', 'Missing phone number')
+                    continue
+                parsed.append((line, values))
+            if parsed:
+                _import_chunk(parsed, rules, result, started_at)
+        if dry_run:
+            transaction.set_rollback(True)
+
+    result.seconds = time.perf_counter() - started
+    return result
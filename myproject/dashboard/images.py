@@ -0,0 +1,236 @@
+"""
+Resized derivatives for uploaded images.
+
+Every product, variation, gallery and profile image gets a thumbnail and a
+medium copy, each as JPEG and WebP, stored next to the original:
+
+    products/mug.png -> products/mug.png__thumb.jpg   products/mug.png__thumb.webp
+                        products/mug.png__medium.jpg  products/mug.png__medium.webp
+
+The original's extension stays in the name so mug.png and mug.jpg don't
+share derivatives.
+
+They are generated after the upload's transaction commits, on a small
+background thread pool (IMAGE_DERIVATIVES_ASYNC=False runs them inline), and
+by the generate_image_derivatives command for existing media. Until a
+derivative exists ImageVariants falls back to the original URL.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import cache_versions
+
+logger = logging.getLogger(__name__)
+
+# name -> longest edge in pixels
+SIZES = {
+    'thumb': 160,
+    'medium': 640,
+}
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+# Models and image fields that get derivatives: (app_label.Model, field name)
+IMAGE_FIELDS = [
+    ('dashboard.Product', 'image'),
+    ('dashboard.ProductVariation', 'image'),
+    ('dashboard.ProductImage', 'image'),
+    ('accounts.CustomUser', 'profile_picture'),
+]
+
+_READY_TIMEOUT = 60 * 60 * 24
+_MISSING_TIMEOUT = 60
+
+# Bumped whenever derivatives are written or removed, so JSON ETags that
+# embed derivative URLs (dashboard.conditional) change with them
+VERSION_KEY = 'images:derivatives:version'
+
+
+def derivative_name(name, size, fmt):
+    return f'{name}__{size}.{fmt}'
+
+
+def derivative_names(name):
+    return [derivative_name(name, size, fmt) for size in SIZES for fmt in FORMATS]
+
+
+def _ready_key(name):
+    return f'images:derivatives:{name}'
+
+
+def is_ready(name, storage):
+    """Whether the derivatives for name exist; cached so list pages don't stat every file."""
+    ready = cache.get(_ready_key(name))
+    if ready is None:
+        ready = all(storage.exists(n) for n in derivative_names(name))
+        cache.set(_ready_key(name), ready, _READY_TIMEOUT if ready else _MISSING_TIMEOUT)
+    return ready
+
+
+def version():
+    return cache_versions.version(VERSION_KEY)
+
+
+def _render(image, edge, fmt):
+    format_name, options = FORMATS[fmt]
+    copy = image.copy()
+    copy.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+    if format_name == 'JPEG' and copy.mode != 'RGB':
+        # JPEG has no alpha: flatten onto white like the profile picture upload does
+        background = Image.new('RGB', copy.size, (255, 255, 255))
+        rgba = copy.convert('RGBA')
+        background.paste(rgba, mask=rgba.split()[-1])
+        copy = background
+    elif format_name == 'WEBP' and copy.mode not in ('RGB', 'RGBA'):
+        copy = copy.convert('RGBA')
+    buffer = BytesIO()
+    copy.save(buffer, format_name, **options)
+    return buffer.getvalue()
+
+
+def generate(name, storage, force=False):
+    """Write all derivatives of name; returns the number of files written."""
+    if not name or not storage.exists(name):
+        return 0
+    targets = {
+        (size, fmt): derivative_name(name, size, fmt)
+        for size in SIZES for fmt in FORMATS
+    }
+    if not force:
+        targets = {key: target for key, target in targets.items() if not storage.exists(target)}
+    if not targets:
+        cache.set(_ready_key(name), True, _READY_TIMEOUT)
+        return 0
+
+    try:
+        with storage.open(name, 'rb') as fh:
+            image = Image.open(fh)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, UnidentifiedImageError):
+        logger.warning('Cannot read image %s for derivatives', name, exc_info=True)
+        return 0
+
+    written = 0
+    for (size, fmt), target in targets.items():
+        content = _render(image, SIZES[size], fmt)
+        # Delete first so the storage doesn't save under a suffixed name
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(content))
+        written += 1
+    cache.set(_ready_key(name), True, _READY_TIMEOUT)
+    cache_versions.bump(VERSION_KEY)
+    return written
+
+
+def delete(name, storage):
+    """Remove the derivatives of name (the original is left alone)."""
+    for target in derivative_names(name):
+        if storage.exists(target):
+            storage.delete(target)
+    cache.delete(_ready_key(name))
+    cache_versions.bump(VERSION_KEY)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix='image-derivatives'
+                )
+    return _executor
+
+
+def _generate_quietly(name, storage):
+    try:
+        generate(name, storage)
+    except Exception:
+        logger.exception('Generating derivatives for %s failed', name)
+
+
+def schedule(field_file):
+    """Generate derivatives for an uploaded file once the current transaction commits."""
+    if not field_file or is_ready(field_file.name, field_file.storage):
+        return
+    name, storage = field_file.name, field_file.storage
+
+    def submit():
+        if settings.IMAGE_DERIVATIVES_ASYNC:
+            _get_executor().submit(_generate_quietly, name, storage)
+        else:
+            _generate_quietly(name, storage)
+
+    transaction.on_commit(submit)
+
+
+class ImageVariants:
+    """
+    URLs of an image field's derivatives, falling back to the original.
+
+        {{ product.image_variants.thumb }}  {{ product.image_variants.medium_webp }}
+    """
+
+    def __init__(self, field_file):
+        self.field_file = field_file
+
+    def __bool__(self):
+        return bool(self.field_file)
+
+    @property
+    def ready(self):
+        return bool(self.field_file) and is_ready(self.field_file.name, self.field_file.storage)
+
+    @property
+    def original(self):
+        return self.field_file.url if self.field_file else None
+
+    def url(self, size, fmt='jpg'):
+        if not self.field_file:
+            return None
+        if size not in SIZES or not self.ready:
+            return self.field_file.url
+        return self.field_file.storage.url(derivative_name(self.field_file.name, size, fmt))
+
+    @property
+    def thumb(self):
+        return self.url('thumb')
+
+    @property
+    def thumb_webp(self):
+        return self.url('thumb', 'webp')
+
+    @property
+    def medium(self):
+        return self.url('medium')
+
+    @property
+    def medium_webp(self):
+        return self.url('medium', 'webp')
+
+    def as_dict(self, prefix='image'):
+        """JSON API keys: image (original), image_thumb, image_thumb_webp, image_medium, image_medium_webp."""
+        return {
+            prefix: self.original,
+            f'{prefix}_thumb': self.thumb,
+            f'{prefix}_thumb_webp': self.thumb_webp,
+            f'{prefix}_medium': self.medium,
+            f'{prefix}_medium_webp': self.medium_webp,
+        }
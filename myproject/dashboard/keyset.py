@@ -0,0 +1,83 @@
+"""
+Keyset (seek) pagination for newest-first lists.
+
+    page = keyset.paginate(products, request.GET, per_page=50)
+    page.rows, page.has_next, page.next_cursor, page.has_previous, page.previous_cursor
+
+Rows are ordered by (created_at DESC, id DESC) and a page continues from the
+last row of the previous one with WHERE (created_at, id) < (cursor), so page
+500 costs the same index range scan as page 1; OFFSET would read and throw
+away every row before it. Links carry ?after=<cursor> or ?before=<cursor>,
+opaque URL-safe strings; an unreadable cursor falls back to the first page.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+
+    def __init__(self, rows, has_next, has_previous):
+        self.rows = rows
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode(self.rows[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode(self.rows[0]) if self.has_previous else None
+
+
+def encode(row):
+    raw = f'{row.created_at.isoformat()}|{row.pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode(cursor):
+    """(created_at, id) from a cursor, or None."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def paginate(queryset, params, per_page):
+    """One page of queryset, newest first, positioned by params['after'] / params['before']."""
+    before = decode(params.get('before'))
+    if before:
+        created_at, pk = before
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            .order_by('created_at', 'pk')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page]
+        rows.reverse()
+        return KeysetPage(rows, has_next=True, has_previous=has_previous)
+
+    after = decode(params.get('after'))
+    if after:
+        created_at, pk = after
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    rows = list(queryset.order_by('-created_at', '-pk')[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=after is not None)
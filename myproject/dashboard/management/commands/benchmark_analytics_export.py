@@ -0,0 +1,121 @@
+"""
+Compare the XLSX order export with the Parquet analytics export.
+
+    python manage.py benchmark_analytics_export --user syn_user_19
+
+Times export_orders_excel for one user (the one with the most orders by
+default) and a full Parquet export of orders + order items, then reading each
+result back: openpyxl in read-only mode against pyarrow. Both are reported in
+rows per second since the XLSX export only covers one user's orders. Parquet
+files go to a temporary directory that is removed afterwards. Results are
+stored with the other benchmark suites and compared with the latest run from
+a different git revision.
+"""
+
+import inspect
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from openpyxl import load_workbook
+
+from dashboard import analytics_export, benchmarks, views
+from dashboard.performance import RequestStats
+
+User = get_user_model()
+
+SUITE = 'analytics_export'
+DATASETS = ('orders', 'order_items')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the XLSX order export against the Parquet analytics export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Whose orders the XLSX export covers (default: most orders)')
+        parser.add_argument('--no-record', action='store_true', help='Print results without storing them')
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        revision = benchmarks.git_revision()
+        results = {}
+
+        body, results['xlsx_write'] = self._measure(lambda: self._xlsx(user))
+        rows, results['xlsx_read'] = self._measure(lambda: self._read_xlsx(body))
+        results['xlsx_write'].update(rows=rows, bytes=len(body))
+        results['xlsx_read'].update(rows=rows)
+
+        directory = tempfile.mkdtemp(prefix='analytics-bench-')
+        try:
+            export, results['parquet_write'] = self._measure(
+                lambda: analytics_export.export(directory, datasets=DATASETS, full=True)
+            )
+            rows, results['parquet_read'] = self._measure(lambda: self._read_parquet(directory))
+            results['parquet_write'].update(rows=export.rows, bytes=export.bytes)
+            results['parquet_read'].update(rows=rows)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write(f"Revision {revision} on {connection.vendor}: XLSX for {user.username}, "
+                          f"Parquet for every order\n")
+        self.stdout.write(f"{'case':<16}{'rows':>10}{'ms':>10}{'rows/s':>10}{'MB':>8}{'queries':>9}{'vs prev':>10}")
+        for name, metrics in results.items():
+            metrics['rows_per_second'] = round(metrics['rows'] / metrics['ms'] * 1000) if metrics['ms'] else 0
+            baseline = benchmarks.previous(SUITE, name, exclude_revision=revision)
+            if not options['no_record']:
+                benchmarks.record(SUITE, name, metrics)
+
+            delta = ''
+            if baseline and baseline.get('rows_per_second'):
+                change = (metrics['rows_per_second'] - baseline['rows_per_second']) / baseline['rows_per_second'] * 100
+                delta = f'{change:+.0f}% ({baseline["revision"]})'
+            megabytes = f"{metrics['bytes'] / 1024 / 1024:.1f}" if 'bytes' in metrics else ''
+            self.stdout.write(f"{name:<16}{metrics['rows']:>10}{metrics['ms']:>10.0f}{metrics['rows_per_second']:>10}"
+                              f"{megabytes:>8}{metrics['queries']:>9}  {delta}")
+
+    def _xlsx(self, user):
+        request = RequestFactory().get('/orders/export/')
+        request.user = user
+        # Past login / permission checks: the benchmark user needn't have can_export_data
+        response = inspect.unwrap(views.export_orders_excel)(request)
+        if response.status_code != 200:
+            raise CommandError(f'XLSX export failed: {response.content[:200]!r}')
+        return response.content
+
+    def _read_xlsx(self, body):
+        sheet = load_workbook(BytesIO(body), read_only=True).active
+        return sum(1 for _ in sheet.iter_rows(min_row=2, values_only=True))
+
+    def _read_parquet(self, directory):
+        import pyarrow.dataset
+
+        return sum(
+            pyarrow.dataset.dataset(os.path.join(directory, name), partitioning='hive').to_table().num_rows
+            for name in DATASETS
+        )
+
+    def _measure(self, func):
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+        return result, {'ms': round(elapsed * 1000, 1), 'queries': stats.queries}
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" not found')
+        user = User.objects.annotate(orders=Count('created_orders')).order_by('-orders').first()
+        if user is None:
+            raise CommandError('No users found; pass --user')
+        return user
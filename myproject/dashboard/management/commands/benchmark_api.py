@@ -0,0 +1,131 @@
+"""
+Time the POS / order-form JSON APIs, fresh and as a repeat request.
+
+    python manage.py benchmark_api --repeat 20
+
+Each endpoint is requested once to learn its ETag, then timed without a
+validator (full payload) and with If-None-Match (304 path). Median times,
+query counts and bytes are printed, stored with the other benchmark suites
+and compared with the latest run from a different git revision.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from dashboard import benchmarks
+from dashboard.models import Customer, Product
+from dashboard.performance import RequestStats
+
+User = get_user_model()
+
+SUITE = 'api'
+
+
+def _cases():
+    """(case name, url) for every endpoint there is data for."""
+    cases = [
+        ('api_search_products', reverse('api_search_products')),
+        ('api_get_cities', reverse('api_get_cities')),
+        ('ncm_branches_json', reverse('ncm_branches_json') + '?format=json'),
+    ]
+    product = Product.objects.filter(is_active=True, product_type='simple').first()
+    if product:
+        cases.append(('api_get_product', reverse('api_get_product', args=[product.id])))
+    variable = Product.objects.filter(is_active=True, product_type='variable').first()
+    if variable:
+        cases.append(('api_get_product_variations', reverse('api_get_product_variations', args=[variable.id])))
+    customer = Customer.objects.first()
+    if customer:
+        cases.append(('api_get_customer', reverse('api_get_customer', args=[customer.id])))
+    return cases
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the AJAX JSON APIs with and without a matching If-None-Match'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--user', help='Username to run as (default: first active administrator)')
+        parser.add_argument('--only', nargs='*', help='Limit to these URL names')
+        parser.add_argument('--no-record', action='store_true', help='Print results without storing them')
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        client = Client()
+        client.force_login(user)
+        revision = benchmarks.git_revision()
+
+        self.stdout.write(f'Revision {revision} on {connection.vendor}, running as {user.username}\n')
+        self.stdout.write(
+            f"{'endpoint':<30}{'full ms':>9}{'queries':>9}{'KB':>8}{'304 ms':>9}{'queries':>9}{'vs prev':>10}"
+        )
+
+        for name, url in _cases():
+            if options['only'] and name not in options['only']:
+                continue
+            first = client.get(url)
+            if first.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'{name:<30} HTTP {first.status_code}, skipped'))
+                continue
+            etag = first.get('ETag')
+
+            full = self._measure(client, url, options['repeat'])
+            metrics = {
+                'median_ms': full['median_ms'],
+                'queries': full['queries'],
+                'response_bytes': len(first.content),
+            }
+            not_modified = ''
+            if etag:
+                conditional = self._measure(client, url, options['repeat'], HTTP_IF_NONE_MATCH=etag)
+                metrics.update({
+                    'not_modified_median_ms': conditional['median_ms'],
+                    'not_modified_queries': conditional['queries'],
+                    'not_modified_status': conditional['status'],
+                })
+                not_modified = f"{conditional['median_ms']:>9.2f}{conditional['queries']:>9}"
+            else:
+                not_modified = f"{'no ETag':>18}"
+
+            baseline = benchmarks.previous(SUITE, name, exclude_revision=revision)
+            if not options['no_record']:
+                benchmarks.record(SUITE, name, metrics)
+
+            delta = ''
+            if baseline and baseline.get('median_ms'):
+                change = (metrics['median_ms'] - baseline['median_ms']) / baseline['median_ms'] * 100
+                delta = f'{change:+.0f}% ({baseline["revision"]})'
+            self.stdout.write(
+                f"{name:<30}{full['median_ms']:>9.2f}{full['queries']:>9}{len(first.content) / 1024:>8.1f}"
+                f"{not_modified}  {delta}"
+            )
+
+    def _measure(self, client, url, repeat, **headers):
+        stats = RequestStats()
+
+        def fetch():
+            stats.queries = 0
+            with connection.execute_wrapper(stats):
+                return client.get(url, **headers)
+
+        timings, response = benchmarks.time_call(fetch, repeat=repeat)
+        return {
+            **benchmarks.summarize_timings(timings),
+            'queries': stats.queries,
+            'status': response.status_code,
+        }
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" not found')
+        user = User.objects.filter(is_active=True, role='administrator').first() \
+            or User.objects.filter(is_active=True, is_superuser=True).first()
+        if user is None:
+            raise CommandError('No active administrator found; pass --user')
+        return user
@@ -0,0 +1,125 @@
+"""
+Parallel order-creation benchmark for the active database profile.
+
+Run it once per profile and compare the output, e.g.:
+
+    DB_SQLITE_TUNED=False python manage.py benchmark_order_concurrency
+    python manage.py benchmark_order_concurrency
+    DB_ENGINE=postgresql python manage.py benchmark_order_concurrency
+
+Every order it creates is prefixed with BENCH- and removed afterwards
+unless --keep is given.
+"""
+
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+
+from dashboard.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Benchmark parallel order creation against the configured database profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent writer threads')
+        parser.add_argument('--orders', type=int, default=50, help='Orders created per worker')
+        parser.add_argument('--items', type=int, default=2, help='Order items per order')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark orders')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        per_worker = options['orders']
+        items = options['items']
+        prefix = f'BENCH-{uuid.uuid4().hex[:8]}'
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def worker(worker_no):
+            local_latencies = []
+            local_errors = []
+            try:
+                for i in range(per_worker):
+                    started = time.perf_counter()
+                    try:
+                        self._create_order(f'{prefix}-{worker_no}-{i}', items)
+                    except OperationalError as e:
+                        local_errors.append(str(e))
+                        continue
+                    local_latencies.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local_latencies)
+                    errors.extend(local_errors)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        self._report(workers * per_worker, latencies, errors, elapsed)
+
+        if not options['keep']:
+            Order.all_objects.filter(order_number__startswith=prefix).delete()
+
+    def _create_order(self, order_number, items):
+        with transaction.atomic():
+            order = Order.objects.create(
+                order_number=order_number,
+                branch_city='Kathmandu',
+                customer_name='Benchmark Customer',
+                customer_phone='9800000000',
+                shipping_address='Benchmark Street',
+                order_from='benchmark',
+                payment_method='cod',
+                total_amount=Decimal('0'),
+            )
+            for n in range(items):
+                OrderItem.objects.create(
+                    order=order,
+                    product_name=f'Benchmark item {n}',
+                    quantity=1,
+                    price=Decimal('100.00'),
+                )
+            order.total_amount = Decimal('100.00') * items
+            order.save(update_fields=['total_amount'])
+
+    def _profile_label(self):
+        db = settings.DATABASES['default']
+        label = connection.vendor
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            label += f" (journal_mode={journal_mode}, transaction_mode={db.get('OPTIONS', {}).get('transaction_mode', 'DEFERRED')})"
+        elif connection.vendor == 'postgresql':
+            pooled = 'pool' in db.get('OPTIONS', {})
+            label += f" (pool={pooled}, CONN_MAX_AGE={db.get('CONN_MAX_AGE')})"
+        return label
+
+    def _report(self, attempted, latencies, errors, elapsed):
+        self.stdout.write(f'Profile:        {self._profile_label()}')
+        self.stdout.write(f'Attempted:      {attempted}')
+        self.stdout.write(f'Created:        {len(latencies)}')
+        self.stdout.write(f'Failed:         {len(errors)}')
+        self.stdout.write(f'Elapsed:        {elapsed:.2f}s')
+        self.stdout.write(f'Throughput:     {len(latencies) / elapsed:.1f} orders/s')
+        if latencies:
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            self.stdout.write(f'Latency p50:    {statistics.median(ordered) * 1000:.1f} ms')
+            self.stdout.write(f'Latency p95:    {p95 * 1000:.1f} ms')
+        if errors:
+            self.stdout.write(self.style.WARNING(f'First error:    {errors[0]}'))
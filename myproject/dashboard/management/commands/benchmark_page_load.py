@@ -0,0 +1,110 @@
+"""
+Count the requests and bytes a browser needs to load dashboard pages.
+
+    python manage.py collectstatic --noinput
+    python manage.py benchmark_page_load
+
+Each page is fetched as an administrator, the local stylesheets, scripts and
+images it references are fetched the way a browser would (Accept-Encoding:
+br, gzip), and two visits are modelled: a first visit with an empty cache,
+and a repeat visit where assets sent as immutable come from the browser cache
+and everything else costs a revalidation request. Results are stored with the
+other benchmark suites and compared with the latest run from another revision.
+"""
+
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from dashboard import benchmarks, static_assets
+
+User = get_user_model()
+
+SUITE = 'page_load'
+
+PAGES = ['orders_list', 'products']
+
+ASSET_RE = re.compile(r'<(?:link|script|img)\b[^>]*?\b(?:href|src)=["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+def body_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = 'Measure requests and bytes for first and repeat visits of the orders and products pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to run as (default: first active administrator)')
+        parser.add_argument('--no-record', action='store_true', help='Print results without storing them')
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        client = Client(HTTP_ACCEPT_ENCODING='br, gzip')
+        client.force_login(user)
+        revision = benchmarks.git_revision()
+        prefix = static_assets.static_prefix()
+
+        self.stdout.write(f'Revision {revision}, running as {user.username}\n')
+        self.stdout.write(
+            f"{'page':<20}{'assets':>8}{'1st reqs':>10}{'1st KB':>9}{'repeat reqs':>13}{'repeat KB':>11}{'vs prev':>10}"
+        )
+
+        for url_name in PAGES:
+            page = client.get(reverse(url_name))
+            if page.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'{url_name:<20} HTTP {page.status_code}, skipped'))
+                continue
+            html_bytes = body_size(page)
+            assets = sorted({
+                url for url in ASSET_RE.findall(page.content.decode('utf-8', 'replace')) if url.startswith(prefix)
+            })
+
+            first_bytes = html_bytes
+            repeat_requests = 1
+            for url in assets:
+                response = client.get(url)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.WARNING(f'  {url}: HTTP {response.status_code}'))
+                    continue
+                first_bytes += body_size(response)
+                if 'immutable' not in response.get('Cache-Control', ''):
+                    repeat_requests += 1
+
+            metrics = {
+                'assets': len(assets),
+                'first_requests': 1 + len(assets),
+                'first_bytes': first_bytes,
+                'repeat_requests': repeat_requests,
+                # Revalidated assets answer 304 without a body
+                'repeat_bytes': html_bytes,
+            }
+            baseline = benchmarks.previous(SUITE, url_name, exclude_revision=revision)
+            if not options['no_record']:
+                benchmarks.record(SUITE, url_name, metrics)
+
+            delta = ''
+            if baseline and baseline.get('first_bytes'):
+                change = (first_bytes - baseline['first_bytes']) / baseline['first_bytes'] * 100
+                delta = f'{change:+.0f}% ({baseline["revision"]})'
+            self.stdout.write(
+                f"{url_name:<20}{len(assets):>8}{metrics['first_requests']:>10}{first_bytes / 1024:>9.1f}"
+                f"{repeat_requests:>13}{html_bytes / 1024:>11.1f}  {delta}"
+            )
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" not found')
+        user = User.objects.filter(is_active=True, role='administrator').first() \
+            or User.objects.filter(is_active=True, is_superuser=True).first()
+        if user is None:
+            raise CommandError('No active administrator found; pass --user')
+        return user
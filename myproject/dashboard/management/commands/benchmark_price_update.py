@@ -0,0 +1,129 @@
+"""
+Compare the bulk price-change paths on a large selection of products.
+
+    python manage.py benchmark_price_update --products 10000 --variations 2
+
+Creates the products (and variations) inside a transaction, times the
+previous per-product save() loop and pricing.apply() with and without
+variations on the same selection, then rolls everything back. Wall time and
+query counts are stored with the other benchmark suites and compared with
+the latest run from a different git revision.
+"""
+
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from dashboard import benchmarks, pricing
+from dashboard.models import Product, ProductVariation
+from dashboard.performance import RequestStats
+
+User = get_user_model()
+
+SUITE = 'price_update'
+
+
+class _Rollback(Exception):
+    pass
+
+
+def legacy_increase(products, percentage):
+    """products_bulk_action before set-based updates: one save() per product."""
+    factor = 1 + percentage / 100
+    for product in products:
+        product.price = product.price * factor
+        product.save()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark bulk price changes: save() loop vs. set-based UPDATE (data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--variations', type=int, default=2, help='Variations per product')
+        parser.add_argument('--skip-legacy', action='store_true', help='Only time the set-based path')
+        parser.add_argument('--user', help='Username to run as (default: first active administrator)')
+        parser.add_argument('--no-record', action='store_true', help='Print results without storing them')
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        revision = benchmarks.git_revision()
+        results = {}
+
+        try:
+            with transaction.atomic():
+                selection = self._create(user, options['products'], options['variations'])
+                percentage = Decimal('5')
+
+                if not options['skip_legacy']:
+                    results['save_loop'] = self._measure(lambda: legacy_increase(selection, percentage))
+                results['set_based'] = self._measure(
+                    lambda: pricing.apply(selection, 'increase_price', percentage, user=user)
+                )
+                results['set_based_with_variations'] = self._measure(
+                    lambda: pricing.apply(selection, 'increase_price', percentage, include_variations=True, user=user)
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(
+            f"Revision {revision} on {connection.vendor}: {options['products']} products, "
+            f"{options['variations']} variation(s) each\n"
+        )
+        self.stdout.write(f"{'case':<30}{'ms':>10}{'queries':>9}{'vs prev':>10}")
+        for name, metrics in results.items():
+            metrics['products'] = options['products']
+            baseline = benchmarks.previous(SUITE, name, exclude_revision=revision)
+            if not options['no_record']:
+                benchmarks.record(SUITE, name, metrics)
+
+            delta = ''
+            if baseline and baseline.get('ms'):
+                change = (metrics['ms'] - baseline['ms']) / baseline['ms'] * 100
+                delta = f'{change:+.0f}% ({baseline["revision"]})'
+            self.stdout.write(f"{name:<30}{metrics['ms']:>10.1f}{metrics['queries']:>9}  {delta}")
+
+    def _create(self, user, count, variations_each):
+        tag = uuid.uuid4().hex[:8]
+        products = Product.objects.bulk_create(
+            [
+                Product(user=user, name=f'Bench {n}', slug=f'bench-{tag}-{n}', description='',
+                        price=Decimal('100.00') + n % 500)
+                for n in range(count)
+            ],
+            batch_size=500,
+        )
+        ProductVariation.objects.bulk_create(
+            [
+                ProductVariation(product=product, sku=f'BENCH-{tag}-{product.pk}-{v}', price=product.price + v)
+                for product in products
+                for v in range(variations_each)
+            ],
+            batch_size=500,
+        )
+        return Product.objects.filter(slug__startswith=f'bench-{tag}-')
+
+    def _measure(self, func):
+        stats = RequestStats()
+        with connection.execute_wrapper(stats):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+        return {'ms': round(elapsed * 1000, 1), 'queries': stats.queries}
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" not found')
+        user = User.objects.filter(is_active=True, role='administrator').first() \
+            or User.objects.filter(is_active=True, is_superuser=True).first()
+        if user is None:
+            raise CommandError('No active administrator found; pass --user')
+        return user
@@ -0,0 +1,101 @@
+"""
+Time the heaviest dashboard views against the current database.
+
+    python manage.py generate_synthetic_data --scale 1
+    python manage.py benchmark_views --repeat 5
+
+Each view is requested through the test client as an administrator. Wall time,
+query count and response size are printed, appended to the benchmark results
+file, and compared with the latest run from a different git revision.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from dashboard import benchmarks
+from dashboard.performance import RequestStats
+
+User = get_user_model()
+
+SUITE = 'views'
+
+# (url name, query string)
+VIEWS = [
+    ('orders_list', 'date_range=all'),
+    ('orders_list', 'date_range=all&status=delivered'),
+    ('products', ''),
+    ('inventory_dashboard', ''),
+    ('customers_list', ''),
+    ('ncm_orders_list', ''),
+    ('returns_dashboard', ''),
+    ('export_orders_excel', ''),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark key dashboard views and store the results for comparison across commits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--user', help='Username to run as (default: first active administrator)')
+        parser.add_argument('--only', nargs='*', help='Limit to these URL names')
+        parser.add_argument('--no-record', action='store_true', help='Print results without storing them')
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        client = Client()
+        client.force_login(user)
+        revision = benchmarks.git_revision()
+
+        self.stdout.write(f'Revision {revision} on {connection.vendor}, running as {user.username}\n')
+        self.stdout.write(f"{'view':<48}{'median ms':>11}{'p95 ms':>10}{'queries':>9}{'KB':>9}{'vs prev':>10}")
+
+        for url_name, query in VIEWS:
+            if options['only'] and url_name not in options['only']:
+                continue
+            case = f'{url_name}?{query}' if query else url_name
+            url = reverse(url_name) + (f'?{query}' if query else '')
+
+            stats = RequestStats()
+
+            def fetch():
+                stats.queries = 0
+                with connection.execute_wrapper(stats):
+                    return client.get(url)
+
+            timings, response = benchmarks.time_call(fetch, repeat=options['repeat'])
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'{case:<48} HTTP {response.status_code}, skipped'))
+                continue
+
+            size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+            metrics = benchmarks.summarize_timings(timings)
+            metrics.update({'queries': stats.queries, 'response_bytes': size})
+
+            baseline = benchmarks.previous(SUITE, case, exclude_revision=revision)
+            if not options['no_record']:
+                benchmarks.record(SUITE, case, metrics)
+
+            delta = ''
+            if baseline and baseline.get('median_ms'):
+                change = (metrics['median_ms'] - baseline['median_ms']) / baseline['median_ms'] * 100
+                delta = f'{change:+.0f}% ({baseline["revision"]})'
+            self.stdout.write(
+                f"{case:<48}{metrics['median_ms']:>11.1f}{metrics['p95_ms']:>10.1f}"
+                f"{stats.queries:>9}{size / 1024:>9.1f}  {delta}"
+            )
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" not found')
+        user = User.objects.filter(is_active=True, role='administrator').first() \
+            or User.objects.filter(is_active=True, is_superuser=True).first()
+        if user is None:
+            raise CommandError('No active administrator found; pass --user')
+        return user
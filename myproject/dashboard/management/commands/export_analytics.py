@@ -0,0 +1,42 @@
+"""
+Parquet files of orders, order items, returns and stock movements for the
+analysts, partitioned by month. Meant to run from cron:
+
+    30 * * * *  cd /srv/app/myproject && python manage.py export_analytics
+    python manage.py export_analytics --full --dataset orders --dataset order_items
+
+Only months changed since the previous run are rewritten unless --full is
+given, see dashboard/analytics_export.py.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import analytics_export
+
+
+class Command(BaseCommand):
+    help = 'Export orders, items, returns and stock movements as month-partitioned Parquet files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Output directory (default: ANALYTICS_EXPORT_DIR)')
+        parser.add_argument('--dataset', action='append', choices=list(analytics_export.DATASETS),
+                            help='Only this dataset; repeat for several (default: all)')
+        parser.add_argument('--full', action='store_true', help='Rewrite every month, not just the changed ones')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.ANALYTICS_EXPORT_DIR
+        try:
+            result = analytics_export.export(
+                directory, datasets=options['dataset'], full=options['full'],
+                stdout=self.stdout if options['verbosity'] > 1 else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for name, entry in result.datasets.items():
+            self.stdout.write(f"{name:<20}{entry['rows']:>10} rows{entry['files']:>6} file(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result.rows} row(s) in {result.files} file(s), {result.bytes / 1024 / 1024:.1f} MB, '
+            f'in {result.seconds:.1f}s ({result.rows_per_second} rows/sec) -> {directory}'
+        ))
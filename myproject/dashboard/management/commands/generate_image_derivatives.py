@@ -0,0 +1,66 @@
+"""
+Backfill thumbnail / medium / WebP derivatives for existing media.
+
+    python manage.py generate_image_derivatives
+    python manage.py generate_image_derivatives --force --only dashboard.Product
+
+New uploads get theirs automatically (dashboard/signals.py); this covers
+files uploaded before the pipeline existed or after changing SIZES/FORMATS.
+The summary compares the total size of the originals with their thumbnails.
+"""
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import images
+
+
+class Command(BaseCommand):
+    help = 'Generate resized JPEG/WebP derivatives for existing product, variation, gallery and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+        parser.add_argument('--only', nargs='*', help='Limit to these models, e.g. dashboard.Product')
+
+    def handle(self, *args, **options):
+        labels = [label for label, _ in images.IMAGE_FIELDS]
+        unknown = set(options['only'] or []) - set(labels)
+        if unknown:
+            raise CommandError(f'Unknown model(s): {", ".join(sorted(unknown))}. Choose from {", ".join(labels)}')
+
+        total_files = total_written = original_bytes = thumb_bytes = 0
+        for label, field_name in images.IMAGE_FIELDS:
+            if options['only'] and label not in options['only']:
+                continue
+            model = apps.get_model(label)
+            storage = model._meta.get_field(field_name).storage
+            names = (
+                model._base_manager.exclude(**{f'{field_name}__isnull': True})
+                .exclude(**{field_name: ''})
+                .values_list(field_name, flat=True)
+                .distinct()
+            )
+
+            files = written = 0
+            for name in names.iterator():
+                if not storage.exists(name):
+                    self.stdout.write(self.style.WARNING(f'  missing: {name}'))
+                    continue
+                files += 1
+                written += images.generate(name, storage, force=options['force'])
+                thumb = images.derivative_name(name, 'thumb', 'webp')
+                if storage.exists(thumb):
+                    original_bytes += storage.size(name)
+                    thumb_bytes += storage.size(thumb)
+
+            self.stdout.write(f'{label:<28}{files:>6} image(s){written:>8} derivative(s) written')
+            total_files += files
+            total_written += written
+
+        summary = f'✅ {total_files} image(s), {total_written} derivative(s) written'
+        if thumb_bytes:
+            summary += (
+                f'; originals {original_bytes / 1024:.0f} KB vs WebP thumbnails {thumb_bytes / 1024:.0f} KB'
+                f' ({original_bytes / thumb_bytes:.0f}x smaller)'
+            )
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,461 @@
+"""
+Generate a realistic synthetic dataset for load testing and benchmarks.
+
+    python manage.py generate_synthetic_data --scale 1      # ~100k orders
+    python manage.py generate_synthetic_data --scale 10     # ~1M orders, several million rows
+    python manage.py generate_synthetic_data --purge        # remove everything it created
+
+All rows are written with bulk_create in batches. Synthetic rows are tagged
+(SYN- order numbers, syn- slugs, @synthetic.test emails) so --purge can find
+them again without touching real data.
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import batched
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from dashboard import catalog, purge, returns_analytics, sales_facts
+from dashboard.models import (
+    Category, City, Customer, Dispatch, DispatchItem, Order, OrderActivityLog, OrderItem,
+    Product, ProductImage, ProductVariation, ReturnItem, ReturnRequest, StockIn, StockInItem,
+)
+
+User = get_user_model()
+
+SYN = 'SYN'
+EMAIL_DOMAIN = 'synthetic.test'
+
+# Row counts at --scale 1
+BASE_COUNTS = {
+    'users': 30,
+    'categories': 40,
+    'products': 2000,
+    'customers': 20000,
+    'orders': 100000,
+    'stock_ins': 1000,
+}
+
+VALLEY_CITIES = ['Kathmandu', 'Lalitpur', 'Bhaktapur', 'Kirtipur', 'Madhyapur Thimi', 'Budhanilkantha', 'Tokha']
+OUT_VALLEY_CITIES = [
+    'Pokhara', 'Biratnagar', 'Birgunj', 'Bharatpur', 'Butwal', 'Dharan', 'Hetauda', 'Janakpur',
+    'Nepalgunj', 'Dhangadhi', 'Itahari', 'Bhairahawa', 'Damak', 'Birtamod', 'Tulsipur', 'Ghorahi',
+]
+FIRST_NAMES = ['Aarav', 'Sita', 'Ram', 'Gita', 'Bikash', 'Anita', 'Suman', 'Pooja', 'Nabin', 'Srijana', 'Rajesh', 'Kabita']
+LAST_NAMES = ['Shrestha', 'Gurung', 'Tamang', 'Magar', 'Rai', 'Thapa', 'Karki', 'Adhikari', 'Maharjan', 'Sharma']
+PRODUCT_WORDS = ['Cotton', 'Silk', 'Classic', 'Slim', 'Leather', 'Wool', 'Denim', 'Premium', 'Casual', 'Sport']
+PRODUCT_NOUNS = ['Shirt', 'Kurta', 'Jacket', 'Shoes', 'Bag', 'Saree', 'Watch', 'Cap', 'Shawl', 'Trousers']
+SIZES = ['S', 'M', 'L', 'XL']
+
+ORDER_STATUSES = ['processing', 'confirmed', 'shipped', 'delivered', 'cancelled', 'dispatched', 'pending']
+PAYMENT_STATUSES = ['pending', 'paid', 'partial', 'refunded']
+PAYMENT_METHODS = ['cod', 'esewa', 'khalti', 'bank', 'cash']
+ORDER_SOURCES = ['website', 'facebook', 'instagram', 'phone', 'walk-in']
+LOGISTICS = ['ncm', 'sundarijal', 'express', 'local', None]
+NCM_STATUSES = ['Pickup Order Created', 'Sent for Pickup', 'Pickup Complete', 'Sent for Delivery', 'Delivered', 'Returned']
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at values we assign."""
+    saved = []
+    for model in models:
+        for name in ('created_at', 'updated_at'):
+            try:
+                field = model._meta.get_field(name)
+            except Exception:
+                continue
+            saved.append((field, field.auto_now, field.auto_now_add))
+            field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, catalogue, customers, orders, dispatches, returns and stock-ins'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the base row counts')
+        parser.add_argument('--days', type=int, default=365, help='Spread order dates over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--purge', action='store_true', help='Delete previously generated data and exit')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            self.purge()
+            return
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.days = options['days']
+        counts = {key: max(1, int(value * options['scale'])) for key, value in BASE_COUNTS.items()}
+
+        if Order.all_objects.filter(order_number__startswith=f'{SYN}-').exists():
+            self.stderr.write(self.style.ERROR('Synthetic data already exists, run with --purge first'))
+            return
+
+        started = time.perf_counter()
+        with explicit_timestamps(Order, OrderItem, OrderActivityLog, Customer, Product, ProductVariation,
+                                 ReturnRequest, Dispatch, StockIn):
+            self.cities = self._step('cities', self.create_cities)
+            self.users = self._step('users', self.create_users, counts['users'])
+            self.categories = self._step('categories', self.create_categories, counts['categories'])
+            self.products = self._step('products', self.create_products, counts['products'])
+            self.variations = self._step('variations', self.create_variations)
+            self.customers = self._step('customers', self.create_customers, counts['customers'])
+            self._step('orders', self.create_orders, counts['orders'])
+            self._step('dispatches', self.create_dispatches)
+            self._step('returns', self.create_returns)
+            self._step('stock-ins', self.create_stock_ins, counts['stock_ins'])
+            self._step('sales facts', lambda: sales_facts.rebuild().rows)
+        # bulk_create sends no post_save
+        catalog.invalidate_categories()
+        returns_analytics.invalidate()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Done in {time.perf_counter() - started:.1f}s'))
+
+    # ------------------------------------------------------------------ helpers
+
+    def _step(self, label, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        rows = len(result) if hasattr(result, '__len__') else result
+        self.stdout.write(f'  {label:<12} {rows:>10} rows  {time.perf_counter() - started:6.1f}s')
+        return result
+
+    def _bulk(self, model, objs):
+        created = []
+        for start in range(0, len(objs), self.batch_size):
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(objs[start:start + self.batch_size]))
+        return created
+
+    def _past(self, max_days=None):
+        return self.now - timedelta(
+            days=self.rng.randint(0, max_days or self.days),
+            seconds=self.rng.randint(0, 86399),
+        )
+
+    def _name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    # ------------------------------------------------------------------ steps
+
+    def create_cities(self):
+        existing = set(City.objects.values_list('name', flat=True))
+        new = [
+            City(name=name, valley_status='valley' if name in VALLEY_CITIES else 'out_valley')
+            for name in VALLEY_CITIES + OUT_VALLEY_CITIES if name not in existing
+        ]
+        self._bulk(City, new)
+        return VALLEY_CITIES + OUT_VALLEY_CITIES
+
+    def create_users(self, count):
+        password = make_password('synthetic')
+        roles = ['administrator'] * 2 + ['warehouse'] * 3 + ['sales'] * 5
+        users = []
+        for i in range(count):
+            user = User(
+                username=f'syn_user_{i}', email=f'user{i}@{EMAIL_DOMAIN}', password=password,
+                first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                role=roles[i % len(roles)],
+            )
+            user.set_default_permissions_by_role()
+            users.append(user)
+        return self._bulk(User, users)
+
+    def create_categories(self, count):
+        return self._bulk(Category, [
+            Category(name=f'Synthetic Category {i}', slug=f'syn-category-{i}') for i in range(count)
+        ])
+
+    def create_products(self, count):
+        products = []
+        for i in range(count):
+            price = Decimal(self.rng.randrange(200, 20000, 50))
+            stock = self.rng.choice([0, 3, 8] + [self.rng.randint(11, 500)] * 7)
+            created = self._past()
+            products.append(Product(
+                user=self.rng.choice(self.users),
+                name=f'{self.rng.choice(PRODUCT_WORDS)} {self.rng.choice(PRODUCT_NOUNS)} {i}',
+                slug=f'syn-product-{i}',
+                description='Synthetic product',
+                category=self.rng.choice(self.categories),
+                product_type='variable' if i % 3 == 0 else 'simple',
+                price=price,
+                cost_price=(price * Decimal('0.6')).quantize(Decimal('0.01')),
+                stock=stock,
+                stock_status='out_of_stock' if stock == 0 else ('low_stock' if stock <= 10 else 'in_stock'),
+                barcode=f'{SYN}P{i:08d}',
+                is_active=self.rng.random() > 0.05,
+                is_deleted=self.rng.random() < 0.02,
+                created_at=created,
+                updated_at=created,
+            ))
+        products = self._bulk(Product, products)
+
+        # Image metadata only; no files are written
+        images = [
+            ProductImage(product=product, image=f'products/gallery/syn-{product.pk}-{n}.jpg',
+                         alt_text=product.name, is_featured=(n == 0), order=n)
+            for product in products for n in range(self.rng.randint(0, 3))
+        ]
+        self._bulk(ProductImage, images)
+        return products
+
+    def create_variations(self):
+        variations = []
+        for product in self.products:
+            if product.product_type != 'variable':
+                continue
+            for size in SIZES:
+                variations.append(ProductVariation(
+                    product=product,
+                    variation_name=f'Size: {size}',
+                    sku=f'{SYN}-{product.pk}-{size}',
+                    price=product.price,
+                    stock=self.rng.randint(0, 100),
+                    barcode=f'{SYN}V{product.pk:07d}{size}',
+                    created_at=product.created_at,
+                    updated_at=product.created_at,
+                ))
+        return self._bulk(ProductVariation, variations)
+
+    def create_customers(self, count):
+        customers = []
+        for i in range(count):
+            created = self._past()
+            customers.append(Customer(
+                name=self._name(),
+                phone=f'96{i:08d}',
+                email=f'customer{i}@{EMAIL_DOMAIN}',
+                city=self.rng.choice(self.cities),
+                address=f'Ward {self.rng.randint(1, 32)}, Synthetic Marg',
+                customer_type=self.rng.choice(['retail'] * 8 + ['wholesale', 'vip']),
+                created_at=created,
+                updated_at=created,
+            ))
+        return self._bulk(Customer, customers)
+
+    def create_orders(self, count):
+        variations_by_product = {}
+        for variation in self.variations:
+            variations_by_product.setdefault(variation.product_id, []).append(variation)
+
+        total = 0
+        # Orders are generated and written chunk by chunk so memory stays flat;
+        # dispatches and returns read them back from the database
+        for start in range(0, count, self.batch_size):
+            orders, order_lines = [], []
+            for i in range(start, min(start + self.batch_size, count)):
+                customer = self.rng.choice(self.customers)
+                created = self._past()
+                logistics = self.rng.choice(LOGISTICS)
+                order_status = self.rng.choice(ORDER_STATUSES)
+                lines = []
+                for _ in range(self.rng.choices([1, 2, 3, 4], weights=[50, 30, 15, 5])[0]):
+                    product = self.rng.choice(self.products)
+                    variation = self.rng.choice(variations_by_product.get(product.pk, [None]))
+                    lines.append((product, variation, self.rng.randint(1, 3)))
+                subtotal = sum(p.price * qty for p, v, qty in lines)
+                shipping = Decimal(self.rng.choice([0, 100, 150]))
+                order = Order(
+                    order_number=f'{SYN}-{i:08d}',
+                    barcode=f'{SYN}B{i:08d}',
+                    branch_city=customer.city,
+                    in_out='in' if customer.city in VALLEY_CITIES else 'out',
+                    logistics=logistics,
+                    status=order_status,
+                    created_by=self.rng.choice(self.users),
+                    customer=customer,
+                    customer_name=customer.name,
+                    customer_phone=customer.phone,
+                    customer_email=customer.email,
+                    shipping_address=customer.address,
+                    order_from=self.rng.choice(ORDER_SOURCES),
+                    order_status=order_status,
+                    payment_method=self.rng.choice(PAYMENT_METHODS),
+                    payment_status=self.rng.choice(PAYMENT_STATUSES),
+                    shipping_charge=shipping,
+                    tax_percent=Decimal('0'),
+                    total_amount=subtotal + shipping,
+                    is_deleted=self.rng.random() < 0.01,
+                    created_at=created,
+                    updated_at=created,
+                )
+                if order_status in ('dispatched', 'shipped', 'delivered'):
+                    order.dispatch_date = created + timedelta(days=1)
+                if order_status == 'delivered':
+                    order.delivered_at = created + timedelta(days=self.rng.randint(2, 6))
+                if logistics == 'ncm':
+                    order.ncm_order_id = 900000000 + i
+                    order.ncm_status = self.rng.choice(NCM_STATUSES)
+                    order.ncm_created_at = created + timedelta(hours=2)
+                    order.ncm_destination_branch = customer.city.upper()
+                orders.append(order)
+                order_lines.append(lines)
+
+            with transaction.atomic():
+                orders = Order.objects.bulk_create(orders)
+                items, logs = [], []
+                for order, lines in zip(orders, order_lines):
+                    for product, variation, qty in lines:
+                        items.append(OrderItem(
+                            order=order, product=product, product_variation=variation,
+                            product_name=product.name, product_sku=variation.sku if variation else product.barcode,
+                            variation_name=variation.variation_name if variation else None,
+                            quantity=qty, price=product.price, total=product.price * qty,
+                            created_at=order.created_at,
+                        ))
+                    logs.append(OrderActivityLog(
+                        order=order, action_type='created', user=order.created_by,
+                        description=f'Order {order.order_number} created', created_at=order.created_at,
+                    ))
+                    if order.order_status != 'processing':
+                        logs.append(OrderActivityLog(
+                            order=order, action_type='status_changed', user=order.created_by,
+                            field_name='order_status', old_value='processing', new_value=order.order_status,
+                            description=f'Status changed to {order.order_status}',
+                            created_at=order.created_at + timedelta(hours=6),
+                        ))
+                items = OrderItem.objects.bulk_create(items)
+                OrderActivityLog.objects.bulk_create(logs)
+            total += len(orders) + len(items) + len(logs)
+        return total
+
+    def create_dispatches(self):
+        orders = Order.all_objects.filter(
+            order_number__startswith=f'{SYN}-', dispatch_date__isnull=False,
+        ).order_by('dispatch_date', 'pk').values_list('pk', 'order_number', 'dispatch_date', 'logistics')
+
+        total = n = 0
+        # Batches of 50 orders in dispatch-date order, written batch_size orders at a time
+        for group in batched(batched(orders.iterator(chunk_size=self.batch_size), 50), max(1, self.batch_size // 50)):
+            dispatches = []
+            for batch in group:
+                _, _, created, logistics = batch[0]
+                dispatches.append(Dispatch(
+                    batch_number=f'{SYN}-DSP-{n:07d}', logistics=logistics or 'local',
+                    total_orders=len(batch), created_by=self.rng.choice(self.users),
+                    created_at=created, updated_at=created,
+                ))
+                n += 1
+            with transaction.atomic():
+                dispatches = Dispatch.objects.bulk_create(dispatches)
+                items = DispatchItem.objects.bulk_create([
+                    DispatchItem(dispatch=dispatch, scanned_order_id=order_number, order_id=pk)
+                    for dispatch, batch in zip(dispatches, group) for pk, order_number, _, _ in batch
+                ])
+            total += len(dispatches) + len(items)
+        return total
+
+    def create_returns(self):
+        orders = Order.objects.filter(
+            order_number__startswith=f'{SYN}-', order_status='delivered',
+        ).order_by('pk').values_list(
+            'pk', 'customer_id', 'customer_name', 'customer_phone', 'delivered_at', 'created_by_id',
+        )
+        reasons = [c for c, _ in ReturnRequest.RETURN_REASON_CHOICES]
+        statuses = [c for c, _ in ReturnRequest.RETURN_STATUS_CHOICES]
+
+        total = n = 0
+        # About one delivered order in ten comes back
+        for chunk in batched(orders.iterator(chunk_size=self.batch_size), self.batch_size):
+            sample = [row for row in chunk if self.rng.random() < 0.1]
+            if not sample:
+                continue
+            items_by_order = {}
+            for item in OrderItem.objects.filter(order_id__in=[row[0] for row in sample]).order_by('pk'):
+                items_by_order.setdefault(item.order_id, []).append(item)
+
+            returns, return_lines = [], []
+            for order_id, customer_id, customer_name, customer_phone, delivered_at, created_by_id in sample:
+                item = self.rng.choice(items_by_order[order_id])
+                created = delivered_at + timedelta(days=self.rng.randint(1, 10))
+                returns.append(ReturnRequest(
+                    rma_number=f'RMA-{SYN}-{n:07d}',
+                    order_id=order_id, customer_id=customer_id,
+                    customer_name=customer_name, customer_phone=customer_phone,
+                    return_reason=self.rng.choice(reasons), return_status=self.rng.choice(statuses),
+                    total_amount=item.total, refund_amount=item.total,
+                    created_by_id=created_by_id, is_deleted=self.rng.random() < 0.03,
+                    created_at=created, updated_at=created,
+                ))
+                return_lines.append(item)
+                n += 1
+            with transaction.atomic():
+                returns = ReturnRequest.objects.bulk_create(returns)
+                ReturnItem.objects.bulk_create([
+                    ReturnItem(
+                        return_request=rr, order_item=item, product_id=item.product_id,
+                        product_variation_id=item.product_variation_id, product_name=item.product_name,
+                        product_sku=item.product_sku or '', quantity=item.quantity, price=item.price,
+                        total=item.total, return_quantity=item.quantity, refund_amount=item.total,
+                    )
+                    for rr, item in zip(returns, return_lines)
+                ])
+            total += len(returns) * 2
+        return total
+
+    def create_stock_ins(self, count):
+        stock_ins, lines = [], []
+        for n in range(count):
+            created = self._past()
+            picks = self.rng.sample(self.products, k=min(3, len(self.products)))
+            entry = [(p, self.rng.randint(5, 100), p.cost_price) for p in picks]
+            stock_ins.append(StockIn(
+                reference_number=f'SI-{SYN}-{n:07d}',
+                stock_in_type=self.rng.choice([c for c, _ in StockIn.STOCK_IN_TYPES]),
+                supplier_name=f'Supplier {self.rng.randint(1, 50)}',
+                total_quantity=sum(qty for _, qty, _ in entry),
+                total_cost=sum(qty * cost for _, qty, cost in entry),
+                created_by=self.rng.choice(self.users),
+                created_at=created, updated_at=created,
+            ))
+            lines.append(entry)
+        stock_ins = self._bulk(StockIn, stock_ins)
+        self._bulk(StockInItem, [
+            StockInItem(stock_in=si, product=p, quantity=qty, unit_cost=cost, total_cost=qty * cost)
+            for si, entry in zip(stock_ins, lines) for p, qty, cost in entry
+        ])
+        return len(stock_ins) + sum(len(e) for e in lines)
+
+    # ------------------------------------------------------------------ purge
+
+    def purge(self):
+        # The large tables go through dashboard.purge in chunks of raw DELETEs
+        chunked = [
+            ('stock-ins', StockIn.objects.filter(reference_number__startswith=f'SI-{SYN}-')),
+            ('returns', ReturnRequest.all_objects.filter(rma_number__startswith=f'RMA-{SYN}-')),
+            ('dispatches', Dispatch.all_objects.filter(batch_number__startswith=f'{SYN}-DSP-')),
+            ('orders', Order.all_objects.filter(order_number__startswith=f'{SYN}-')),
+            ('customers', Customer.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')),
+            ('products', Product.all_objects.filter(slug__startswith='syn-product-')),
+        ]
+        for label, queryset in chunked:
+            # Synthetic image names point at no files
+            deleted = purge.purge(queryset, remove_files=False)
+            self.stdout.write(f'  {label:<12} {deleted:>10} rows deleted')
+
+        # A few dozen rows each
+        for label, queryset in [
+            ('categories', Category.objects.filter(slug__startswith='syn-category-')),
+            ('users', User.all_objects.filter(email__endswith=f'@{EMAIL_DOMAIN}')),
+        ]:
+            with transaction.atomic():
+                deleted, _ = queryset.delete()
+            self.stdout.write(f'  {label:<12} {deleted:>10} rows deleted')
+        self.stdout.write(self.style.SUCCESS('✅ Synthetic data removed'))
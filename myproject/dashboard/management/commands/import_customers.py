@@ -0,0 +1,60 @@
+"""
+Import customers in bulk from a CSV, XLSX or JSON Lines file.
+
+    python manage.py import_customers contacts.xlsx --dry-run
+    python manage.py import_customers contacts.csv --rule name=overwrite --rule notes=keep
+
+Rows are deduplicated by normalised phone, within the file and against the
+existing customers; see dashboard/customer_import.py for the merge rules.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import customer_import, tabular
+
+
+class Command(BaseCommand):
+    help = 'Create or update customers from a file, deduplicated by phone number'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=tabular.FORMATS, help='Default: from the file extension')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change, write nothing')
+        parser.add_argument(
+            '--rule', action='append', default=[], metavar='FIELD=STRATEGY',
+            help=f'Merge rule for one field ({", ".join(customer_import.STRATEGIES)}); repeatable',
+        )
+        parser.add_argument('--chunk-size', type=int, default=customer_import.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        rules = {}
+        for rule in options['rule']:
+            field, _, strategy = rule.partition('=')
+            rules[field.strip()] = strategy.strip()
+
+        try:
+            kind = options['format'] or tabular.file_format(options['path'])
+            with open(options['path'], 'rb') as f:
+                result = customer_import.import_file(
+                    f, rules=rules, dry_run=options['dry_run'], chunk_size=options['chunk_size'], kind=kind,
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options['verbosity'] > 1:
+            for line, phone, action, fields in result.changes:
+                self.stdout.write(f'  line {line} {phone}: {action} {", ".join(fields)}')
+        for line, phone, reason in result.rejected[:50]:
+            self.stdout.write(self.style.WARNING(f'  line {line} {phone}: {reason}'))
+        if result.rejected_count > 50:
+            self.stdout.write(self.style.WARNING(f'  … {result.rejected_count - 50} more rejected line(s)'))
+
+        summary = (
+            f'{result.rows} row(s) in {result.seconds:.1f}s ({result.rows_per_second} rows/sec): '
+            f'{result.created} created, {result.updated} updated, {result.unchanged} unchanged, '
+            f'{result.duplicates} duplicate(s), {result.rejected_count} rejected'
+        )
+        if result.dry_run:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing written. {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ {summary}'))
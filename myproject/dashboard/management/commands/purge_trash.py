@@ -0,0 +1,39 @@
+"""
+Retention sweeper for the trash pages.
+
+Permanently deletes returns, dispatches, orders and products that were moved
+to the trash more than TRASH_RETENTION_DAYS days ago. Meant to run daily from
+cron or any other scheduler:
+
+    15 3 * * *  cd /srv/app/myproject && python manage.py purge_trash
+
+Rows are purged in PURGE_CHUNK_SIZE chunks, see dashboard/purge.py.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import purge
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete items that have been in the trash longer than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Retention in days (default: TRASH_RETENTION_DAYS)')
+        parser.add_argument('--chunk-size', type=int, help='Rows per transaction (default: PURGE_CHUNK_SIZE)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows are due')
+
+    def handle(self, *args, **options):
+        days = settings.TRASH_RETENTION_DAYS if options['days'] is None else options['days']
+        if days < 0:
+            raise CommandError('--days must be zero or more')
+
+        results = purge.sweep(days=days, chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+
+        verb = 'due for purge' if options['dry_run'] else 'purged'
+        for name, count in results.items():
+            self.stdout.write(f'{name:<20}{count:>8} {verb}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {sum(results.values())} trashed item(s) older than {days} day(s) {verb}'
+        ))
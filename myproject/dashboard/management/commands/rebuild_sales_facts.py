@@ -0,0 +1,24 @@
+"""
+Recompute the sales fact table from every live order.
+
+    python manage.py rebuild_sales_facts
+
+Needed once after the table is created, and after data is written without
+signals (raw SQL, restored backups). Day to day the table follows order
+changes by itself, see dashboard/sales_facts.py.
+"""
+
+from django.core.management.base import BaseCommand
+
+from dashboard import sales_facts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the line-item sales fact table used by the sales reports'
+
+    def handle(self, *args, **options):
+        result = sales_facts.rebuild(stdout=self.stdout if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result.rows} line(s) from {result.orders} order(s) in {result.seconds:.1f}s '
+            f'({result.rows_per_second} rows/sec)'
+        ))
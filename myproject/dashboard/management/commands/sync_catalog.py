@@ -0,0 +1,96 @@
+"""
+Dump or load the product catalogue as CSV, XLSX or JSON Lines.
+
+    python manage.py sync_catalog export catalogue.csv
+    python manage.py sync_catalog export - --format jsonl > catalogue.jsonl
+    python manage.py sync_catalog import catalogue.xlsx --user admin
+    python manage.py sync_catalog import stocktake.csv --set-stock
+
+Import upserts by SKU / barcode and only writes rows that changed, see
+dashboard/catalog_sync.py for the file layout. The stock column only
+sets the stock of new rows unless --set-stock is given.
+"""
+
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard import catalog_sync, tabular
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Export the product catalogue to a file, or upsert it from one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['export', 'import'])
+        parser.add_argument('path', help="File to read or write ('-' exports to stdout)")
+        parser.add_argument('--format', choices=tabular.FORMATS, help='Default: from the file extension')
+        parser.add_argument('--user', help='Owner of new products (default: first active administrator)')
+        parser.add_argument('--chunk-size', type=int, default=catalog_sync.CHUNK_SIZE)
+        parser.add_argument('--set-stock', action='store_true',
+                            help='Overwrite the stock of existing products and variations from the file')
+
+    def handle(self, *args, **options):
+        try:
+            kind = options['format'] or tabular.file_format(options['path'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['action'] == 'export':
+            self._export(options['path'], kind, options['chunk_size'])
+        else:
+            self._import(options['path'], kind, options)
+
+    def _export(self, path, kind, chunk_size):
+        header, rows = catalog_sync.export_rows(chunk_size=chunk_size)
+        if kind == 'xlsx':
+            if path == '-':
+                raise CommandError('XLSX needs a file path')
+            tabular.write_xlsx(header, rows, path)
+            self.stderr.write(self.style.SUCCESS(f'✅ Catalogue written to {path}'))
+            return
+
+        chunks = tabular.write_csv(header, rows) if kind == 'csv' else tabular.write_jsonl(header, rows)
+        if path == '-':
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            return
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'✅ Catalogue written to {path}'))
+
+    def _import(self, path, kind, options):
+        user = self._get_user(options['user'])
+        try:
+            with open(path, 'rb') as f:
+                result = catalog_sync.import_file(
+                    f, user, chunk_size=options['chunk_size'], kind=kind, set_stock=options['set_stock'],
+                )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, sku, reason in result.rejected[:50]:
+            self.stdout.write(self.style.WARNING(f'  line {line} {sku}: {reason}'))
+        if len(result.rejected) > 50:
+            self.stdout.write(self.style.WARNING(f'  … {len(result.rejected) - 50} more rejected line(s)'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result.rows} row(s) in {result.seconds:.1f}s ({result.rows_per_second} rows/sec): '
+            f'{result.created} created, {result.updated} updated, {result.unchanged} unchanged, '
+            f'{len(result.rejected)} rejected'
+        ))
+
+    def _get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" not found')
+        user = User.objects.filter(is_active=True, role='administrator').first() \
+            or User.objects.filter(is_active=True, is_superuser=True).first()
+        if user is None:
+            raise CommandError('No active administrator found; pass --user')
+        return user
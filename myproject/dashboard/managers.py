@@ -0,0 +1,70 @@
+"""
+Managers for models that are trashed with an is_deleted flag.
+
+Each trashable model exposes three managers:
+
+    Model.objects      live rows only (is_deleted=False)
+    Model.trashed      trash-page rows only (is_deleted=True)
+    Model.all_objects  everything; Django's default manager, so the admin,
+                       unique validation, reverse relations and restore /
+                       permanent-delete lookups keep seeing trashed rows
+
+The live filter matches the partial indexes declared with
+condition=Q(is_deleted=False), so listing queries built on objects can use them.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.utils import timezone
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+
+    def live(self):
+        return self.filter(is_deleted=False)
+
+    def trashed(self):
+        return self.filter(is_deleted=True)
+
+    def soft_delete(self, **fields):
+        """Bulk move to trash; extra fields (e.g. deleted_by) are set as well."""
+        return self.update(is_deleted=True, deleted_at=timezone.now(), **fields)
+
+    def restore(self, **fields):
+        return self.update(is_deleted=False, deleted_at=None, **fields)
+
+    def update(self, **kwargs):
+        # update() skips auto_now; bump updated_at anyway so the list-row
+        # fragment caches keyed on it see bulk status changes
+        if 'updated_at' not in kwargs and _has_auto_now_updated_at(self.model):
+            kwargs['updated_at'] = timezone.now()
+        return super().update(**kwargs)
+
+
+def _has_auto_now_updated_at(model):
+    try:
+        return getattr(model._meta.get_field('updated_at'), 'auto_now', False)
+    except FieldDoesNotExist:
+        return False
+
+
+class LiveManagerMixin:
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
+class TrashedManagerMixin:
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=True)
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    pass
+
+
+class LiveManager(LiveManagerMixin, SoftDeleteManager):
+    pass
+
+
+class TrashedManager(TrashedManagerMixin, SoftDeleteManager):
+    pass
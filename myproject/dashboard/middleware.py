@@ -0,0 +1,121 @@
+import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from . import performance, static_assets
+
+
+class PerformanceMiddleware:
+    """
+    Record wall time, DB time, query count, repeated queries, NCM HTTP time
+    and response size per URL name. Enabled with PERF_MONITORING_ENABLED.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERF_MONITORING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        performance.install_db_hook()
+        performance.install_http_hook()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = performance.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            performance.end_request(token)
+        self._record(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = performance.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            performance.end_request(token)
+        self._record(request, response, stats, started, flush=False)
+        if performance.collector.flush_due():
+            await sync_to_async(performance.collector.flush)()
+        return response
+
+    def _record(self, request, response, stats, started, flush=True):
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        url_name = (match.view_name if match else None) or 'unresolved'
+        if response.streaming:
+            size = 0
+        else:
+            size = len(response.content)
+
+        performance.collector.record(url_name, wall_ms, stats, response.status_code, size, flush=flush)
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT with long-lived cache
+    headers and precompressed variants, see dashboard/static_assets.py.
+    Enabled with STATIC_SERVE; requests for unknown files fall through.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'STATIC_SERVE', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self._serve(request)
+        return self.get_response(request) if response is None else response
+
+    async def __acall__(self, request):
+        response = self._serve(request)
+        return await self.get_response(request) if response is None else response
+
+    def _serve(self, request):
+        """Response for a file under STATIC_ROOT, None to pass the request on."""
+        prefix = static_assets.static_prefix()
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(prefix):
+            return None
+
+        name = request.path[len(prefix):]
+        path = static_assets.find_file(name)
+        if path is None:
+            return None
+
+        mtime = int(os.stat(path).st_mtime)
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_modified_since is not None and mtime <= if_modified_since:
+            response = HttpResponseNotModified()
+        else:
+            send_path, encoding = static_assets.choose_variant(path, request)
+            response = FileResponse(
+                open(send_path, 'rb'), filename=os.path.basename(name), content_type=static_assets.content_type(name),
+            )
+            response['Content-Length'] = os.path.getsize(send_path)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['Last-Modified'] = http_date(mtime)
+        response['Cache-Control'] = static_assets.cache_control(name)
+        response['Vary'] = 'Accept-Encoding'
+        return response
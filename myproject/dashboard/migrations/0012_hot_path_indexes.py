@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_order_ncm_created_at_order_ncm_delivery_type_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='order_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['order_status', '-created_at'], name='order_live_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['payment_status', '-created_at'], name='order_live_payment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['-deleted_at'], name='order_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_phone', '-created_at'], name='order_phone_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['barcode'], name='order_barcode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('ncm_order_id__isnull', False)), fields=['logistics', '-ncm_created_at'], name='order_ncm_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('ncm_order_id__isnull', False)), fields=['ncm_status'], name='order_ncm_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderactivitylog',
+            index=models.Index(fields=['order', '-created_at'], name='activity_order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='product_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['user', 'is_deleted', 'is_active'], name='product_user_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['stock'], name='product_live_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='returnrequest',
+            index=models.Index(fields=['is_deleted', 'return_status', '-created_at'], name='return_deleted_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='returnrequest',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='return_live_created_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(max_length=200)),
+                ('window_start', models.DateTimeField()),
+                ('window_end', models.DateTimeField()),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('error_count', models.PositiveIntegerField(default=0)),
+                ('wall_ms_total', models.FloatField(default=0)),
+                ('wall_ms_max', models.FloatField(default=0)),
+                ('db_ms_total', models.FloatField(default=0)),
+                ('query_count_total', models.PositiveIntegerField(default=0)),
+                ('query_count_max', models.PositiveIntegerField(default=0)),
+                ('ncm_ms_total', models.FloatField(default=0)),
+                ('ncm_calls', models.PositiveIntegerField(default=0)),
+                ('response_bytes_total', models.BigIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('duplicate_queries', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'verbose_name': 'Request Metric',
+                'verbose_name_plural': 'Request Metrics',
+                'ordering': ['-window_start'],
+                'indexes': [models.Index(fields=['-window_start', 'url_name'], name='requestmetric_window_idx')],
+            },
+        ),
+    ]
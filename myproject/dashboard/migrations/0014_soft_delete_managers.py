@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:17
+
+import django.db.models.manager
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_requestmetric'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='dispatch',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-created_at'], 'verbose_name': 'Dispatch', 'verbose_name_plural': 'Dispatches'},
+        ),
+        migrations.AlterModelOptions(
+            name='order',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-created_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-created_at'], 'verbose_name': 'Product', 'verbose_name_plural': 'Products'},
+        ),
+        migrations.AlterModelOptions(
+            name='returnrequest',
+            options={'default_manager_name': 'all_objects', 'ordering': ['-created_at'], 'verbose_name': 'Return Request', 'verbose_name_plural': 'Return Requests'},
+        ),
+        migrations.AlterModelManagers(
+            name='dispatch',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='order',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='product',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='returnrequest',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='dispatch',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at'], name='dispatch_live_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dispatch',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['-deleted_at'], name='dispatch_trash_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='returnrequest',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['-deleted_at'], name='return_trash_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_soft_delete_managers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChangeBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('increase_price', 'Increase Price'), ('decrease_price', 'Decrease Price')], max_length=20)),
+                ('percentage', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('include_variations', models.BooleanField(default=False)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('variation_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('rolled_back_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_change_batches', to=settings.AUTH_USER_MODEL)),
+                ('rolled_back_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Price Change Batch',
+                'verbose_name_plural': 'Price Change Batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceChangeItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='dashboard.pricechangebatch')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.product')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.productvariation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['batch', 'product'], name='pricechange_product_idx'), models.Index(fields=['batch', 'variation'], name='pricechange_variation_idx')],
+            },
+        ),
+    ]
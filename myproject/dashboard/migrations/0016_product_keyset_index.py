@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_price_change_batches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_live_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at', '-id'], name='product_live_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 13:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_product_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['barcode'], name='product_barcode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productvariation',
+            index=models.Index(fields=['barcode'], name='variation_barcode_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0018_order_code_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesFact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('week', models.DateField()),
+                ('month', models.DateField()),
+                ('order_from', models.CharField(max_length=50)),
+                ('branch_city', models.CharField(max_length=100)),
+                ('in_out', models.CharField(max_length=3)),
+                ('order_status', models.CharField(max_length=50)),
+                ('quantity', models.IntegerField()),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('category', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.category')),
+                ('created_by', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dashboard.order')),
+                ('order_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_fact', to='dashboard.orderitem')),
+                ('product', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.product')),
+                ('variation', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dashboard.productvariation')),
+            ],
+            options={
+                'verbose_name': 'Sales Fact',
+                'verbose_name_plural': 'Sales Facts',
+                'indexes': [models.Index(fields=['day'], name='salesfact_day_idx'), models.Index(fields=['product', 'day'], name='salesfact_product_day_idx'), models.Index(fields=['variation', 'day'], name='salesfact_variation_day_idx')],
+            },
+        ),
+    ]
@@ -1,13 +1,27 @@
 from django.db import models
+from django.db.models.functions import Replace, Upper
 from django.conf import settings  # ✅ Add this import
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 import random
 import string
 
+from .images import ImageVariants
+from .managers import LiveManager, SoftDeleteManager, TrashedManager
+
 # ✅ Remove this line:
 # from django.contrib.auth.models import User
 
+PHONE_SEPARATORS = ('-', ' ', '+', '(', ')', '.')
+
+
+def phone_digits(field):
+    """Database expression for the digits of a phone column, separators stripped; indexed on Customer.phone."""
+    expression = models.F(field)
+    for separator in PHONE_SEPARATORS:
+        expression = Replace(expression, models.Value(separator), models.Value(''))
+    return expression
+
 
 class Category(models.Model):
     name = models.CharField(max_length=200)
@@ -75,10 +89,32 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def image_variants(self):
+        """Thumbnail / medium / WebP URLs, see dashboard.images"""
+        return ImageVariants(self.image)
+
+    # Soft delete: objects is live rows only, see dashboard.managers
+    all_objects = SoftDeleteManager()
+    objects = LiveManager()
+    trashed = TrashedManager()
+
     class Meta:
+        default_manager_name = 'all_objects'
         ordering = ['-created_at']
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        indexes = [
+            # products_view / dashboard: live catalogue, newest first
+            # keyset pagination seeks on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(is_deleted=False), name='product_live_keyset_idx'),
+            # api_search_products, stock-in and inventory views scope by owner
+            models.Index(fields=['user', 'is_deleted', 'is_active'], name='product_user_live_idx'),
+            # low-stock widgets: stock__lte / stock__gt ordered by stock
+            models.Index(fields=['stock'], condition=models.Q(is_deleted=False), name='product_live_stock_idx'),
+            # stock-in and catalogue imports match rows by barcode
+            models.Index(fields=['barcode'], name='product_barcode_idx'),
+        ]
 class Customer(models.Model):
     CUSTOMER_TYPES = [
         ('retail', 'Retail'),
@@ -107,6 +143,9 @@ class Customer(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(phone_digits('phone'), name='customer_phone_digits_idx'),
+        ]
 
 
 class Order(models.Model):
@@ -199,8 +238,37 @@ class Order(models.Model):
         tax_amount = (after_discount * self.tax_percent) / 100
         self.total_amount = after_discount + tax_amount + self.shipping_charge
     
+    # Soft delete: objects is live rows only, see dashboard.managers
+    all_objects = SoftDeleteManager()
+    objects = LiveManager()
+    trashed = TrashedManager()
+
     class Meta:
+        default_manager_name = 'all_objects'
         ordering = ['-created_at']
+        indexes = [
+            # orders_list: live orders newest first, optionally by status / payment
+            models.Index(fields=['-created_at'], condition=models.Q(is_deleted=False), name='order_live_created_idx'),
+            models.Index(fields=['order_status', '-created_at'], condition=models.Q(is_deleted=False), name='order_live_status_idx'),
+            models.Index(fields=['payment_status', '-created_at'], condition=models.Q(is_deleted=False), name='order_live_payment_idx'),
+            # trash pages order by deleted_at
+            models.Index(fields=['-deleted_at'], condition=models.Q(is_deleted=True), name='order_trash_idx'),
+            # search_customer_by_phone / customer_detail
+            models.Index(fields=['customer_phone', '-created_at'], name='order_phone_created_idx'),
+            # dispatch scan matches order_number OR barcode
+            models.Index(fields=['barcode'], name='order_barcode_idx'),
+            # order_lookup.find(): any of the three codes, case-insensitive
+            models.Index(Upper('order_number'), name='order_number_upper_idx'),
+            models.Index(Upper('barcode'), name='order_barcode_upper_idx'),
+            models.Index(Upper('tracking_number'), name='order_tracking_upper_idx'),
+            # ncm_orders_list and the NCM sync views
+            models.Index(
+                fields=['logistics', '-ncm_created_at'],
+                condition=models.Q(is_deleted=False, ncm_order_id__isnull=False),
+                name='order_ncm_live_idx',
+            ),
+            models.Index(fields=['ncm_status'], condition=models.Q(ncm_order_id__isnull=False), name='order_ncm_status_idx'),
+        ]
 
 
 class OrderItem(models.Model):
@@ -271,9 +339,18 @@ class ProductVariation(models.Model):
     
     def __str__(self):
         return f"{self.product.name} - {self.sku}"
-    
+
+    @property
+    def image_variants(self):
+        """Thumbnail / medium / WebP URLs, see dashboard.images"""
+        return ImageVariants(self.image)
+
     class Meta:
         ordering = ['sku']
+        indexes = [
+            # stock-in and catalogue imports match rows by barcode
+            models.Index(fields=['barcode'], name='variation_barcode_idx'),
+        ]
 
 
 class VariationAttributeValue(models.Model):
@@ -305,6 +382,11 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"{self.product.name} - Image {self.id}"
 
+    @property
+    def image_variants(self):
+        """Thumbnail / medium / WebP URLs, see dashboard.images"""
+        return ImageVariants(self.image)
+
     def save(self, *args, **kwargs):
         if not self.alt_text:
             self.alt_text = f"{self.product.name} - Gallery Image"
@@ -356,6 +438,9 @@ class OrderActivityLog(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['order', '-created_at'], name='activity_order_created_idx'),
+        ]
 
 
 class StockIn(models.Model):
@@ -549,10 +634,22 @@ class ReturnRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Soft delete: objects is live rows only, see dashboard.managers
+    all_objects = SoftDeleteManager()
+    objects = LiveManager()
+    trashed = TrashedManager()
+
     class Meta:
+        default_manager_name = 'all_objects'
         ordering = ['-created_at']
         verbose_name = 'Return Request'
         verbose_name_plural = 'Return Requests'
+        indexes = [
+            # returns_dashboard / returns_list / trash counts
+            models.Index(fields=['is_deleted', 'return_status', '-created_at'], name='return_deleted_status_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_deleted=False), name='return_live_created_idx'),
+            models.Index(fields=['-deleted_at'], condition=models.Q(is_deleted=True), name='return_trash_idx'),
+        ]
     
     def __str__(self):
         return f"{self.rma_number} - {self.customer_name}"
@@ -562,7 +659,7 @@ class ReturnRequest(models.Model):
             # Generate RMA number: RMA-YYYYMMDD-XXXX
             today = timezone.now()
             date_str = today.strftime('%Y%m%d')
-            last_return = ReturnRequest.objects.filter(
+            last_return = ReturnRequest.all_objects.filter(
                 rma_number__startswith=f'RMA-{date_str}'
             ).order_by('-rma_number').first()
             
@@ -711,7 +808,13 @@ class Dispatch(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Soft delete: objects is live rows only, see dashboard.managers
+    all_objects = SoftDeleteManager()
+    objects = LiveManager()
+    trashed = TrashedManager()
+
     class Meta:
+        default_manager_name = 'all_objects'
         ordering = ['-created_at']
         verbose_name = 'Dispatch'
         verbose_name_plural = 'Dispatches'
@@ -719,6 +822,9 @@ class Dispatch(models.Model):
             models.Index(fields=['-created_at']),
             models.Index(fields=['batch_number']),
             models.Index(fields=['is_deleted']),
+            # dispatch_list / dispatch_management: live batches newest first
+            models.Index(fields=['-created_at'], condition=models.Q(is_deleted=False), name='dispatch_live_created_idx'),
+            models.Index(fields=['-deleted_at'], condition=models.Q(is_deleted=True), name='dispatch_trash_idx'),
         ]
     
     def __str__(self):
@@ -798,3 +904,129 @@ class DispatchItem(models.Model):
         if self.order:
             return self.order.customer_name
         return "N/A"
+
+
+class RequestMetric(models.Model):
+    """Per-URL-name request aggregates flushed by PerformanceMiddleware"""
+    url_name = models.CharField(max_length=200)
+    window_start = models.DateTimeField()
+    window_end = models.DateTimeField()
+    
+    request_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    wall_ms_total = models.FloatField(default=0)
+    wall_ms_max = models.FloatField(default=0)
+    db_ms_total = models.FloatField(default=0)
+    query_count_total = models.PositiveIntegerField(default=0)
+    query_count_max = models.PositiveIntegerField(default=0)
+    ncm_ms_total = models.FloatField(default=0)
+    ncm_calls = models.PositiveIntegerField(default=0)
+    response_bytes_total = models.BigIntegerField(default=0)
+    
+    # Wall-time bucket counts, see performance.HISTOGRAM_BUCKETS_MS
+    histogram = models.JSONField(default=list)
+    # {fingerprint: {sql, max_repeats, requests}} for statements repeated within a request
+    duplicate_queries = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        ordering = ['-window_start']
+        verbose_name = 'Request Metric'
+        verbose_name_plural = 'Request Metrics'
+        indexes = [
+            models.Index(fields=['-window_start', 'url_name'], name='requestmetric_window_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.url_name} @ {self.window_start:%Y-%m-%d %H:%M}"
+
+
+class PriceChangeBatch(models.Model):
+    """One bulk price change from products_bulk_action, see dashboard.pricing"""
+    ACTION_CHOICES = [
+        ('increase_price', 'Increase Price'),
+        ('decrease_price', 'Decrease Price'),
+    ]
+    
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    percentage = models.DecimalField(max_digits=6, decimal_places=2)
+    include_variations = models.BooleanField(default=False)
+    product_count = models.PositiveIntegerField(default=0)
+    variation_count = models.PositiveIntegerField(default=0)
+    
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='price_change_batches')
+    created_at = models.DateTimeField(auto_now_add=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+    rolled_back_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='+')
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Price Change Batch'
+        verbose_name_plural = 'Price Change Batches'
+    
+    def __str__(self):
+        return f"{self.get_action_display()} {self.percentage}% ({self.product_count} products)"
+
+
+class PriceChangeItem(models.Model):
+    """Old and new price of one product or variation in a PriceChangeBatch"""
+    batch = models.ForeignKey(PriceChangeBatch, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        indexes = [
+            # Rollback joins items back to their rows
+            models.Index(fields=['batch', 'product'], name='pricechange_product_idx'),
+            models.Index(fields=['batch', 'variation'], name='pricechange_variation_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id or self.variation_id}: {self.old_price} → {self.new_price}"
+
+
+class SalesFact(models.Model):
+    """One OrderItem of a live order with the order's dimensions copied in, see dashboard.sales_facts"""
+    order_item = models.OneToOneField(OrderItem, on_delete=models.CASCADE, related_name='sales_fact')
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='+')
+    # Indexed together with day below
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                db_index=False)
+    variation = models.ForeignKey(ProductVariation, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                  db_index=False)
+    # Rarely deleted, not worth an index on a table this size
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                 db_index=False)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+', db_index=False)
+    
+    # Date buckets of the order's created_at (local time)
+    day = models.DateField()
+    week = models.DateField()  # Monday
+    month = models.DateField()  # 1st
+    
+    order_from = models.CharField(max_length=50)
+    branch_city = models.CharField(max_length=100)
+    in_out = models.CharField(max_length=3)
+    order_status = models.CharField(max_length=50)
+    
+    quantity = models.IntegerField()
+    revenue = models.DecimalField(max_digits=12, decimal_places=2)  # line total
+    
+    class Meta:
+        verbose_name = 'Sales Fact'
+        verbose_name_plural = 'Sales Facts'
+        indexes = [
+            # Every report filters on a date range
+            models.Index(fields=['day'], name='salesfact_day_idx'),
+            # Per-product reports over a date range; a plain product index made SQLite walk the whole
+            # table in product order to skip the GROUP BY sort
+            models.Index(fields=['product', 'day'], name='salesfact_product_day_idx'),
+            models.Index(fields=['variation', 'day'], name='salesfact_variation_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} order {self.order_id} item {self.order_item_id}"
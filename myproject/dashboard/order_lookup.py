@@ -0,0 +1,102 @@
+"""
+Find an order by a scanned or typed code: order number, barcode or tracking
+number, in any case.
+
+    match = order_lookup.find(' ord-1001')
+    match.order_status, match.is_deleted
+    items = order_lookup.return_items(match)
+
+find() is one query. Order has an index on UPPER() of each of the three
+columns, so the OR is three index searches. It returns the status and
+deletion state with the columns the scan screens show, so a miss, a trashed
+order or an undelivered order can be told apart without another query.
+
+return_items() keeps the return screen's item list in a small per-process LRU
+(ORDER_LOOKUP_CACHE_SIZE orders) keyed by order id and stamped with
+updated_at. Repeated scans of the same parcel then cost the find() query only,
+and saving the order refreshes its entry.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Upper
+
+from .models import Order, OrderItem
+
+OrderMatch = namedtuple('OrderMatch', [
+    'id', 'order_number', 'order_status', 'is_deleted', 'updated_at', 'created_at',
+    'customer_name', 'customer_phone', 'customer_email', 'total_amount',
+])
+
+MAX_MATCHES = 10  # more orders sharing one code means bad data; the best of these wins
+
+_lock = threading.Lock()
+_items = OrderedDict()  # order id -> (updated_at, [item dicts]), least recently used first
+
+
+def normalize(code):
+    return (code or '').strip().upper()
+
+
+def candidates(code):
+    """Orders, trashed included, whose order number, barcode or tracking number is the normalized code."""
+    return Order.all_objects.alias(
+        number_code=Upper('order_number'), barcode_code=Upper('barcode'), tracking_code=Upper('tracking_number'),
+    ).filter(
+        Q(number_code=code) | Q(barcode_code=code) | Q(tracking_code=code),
+    ).order_by()
+
+
+def find(code):
+    """OrderMatch for the code, trashed orders included, or None."""
+    code = normalize(code)
+    if not code:
+        return None
+    matches = [OrderMatch(*row) for row in candidates(code).values_list(*OrderMatch._fields)[:MAX_MATCHES]]
+    if not matches:
+        return None
+    # Live before trashed, then an order number before a barcode / tracking number, then the newest
+    return min(matches, key=lambda match: (match.is_deleted, match.order_number.upper() != code, -match.id))
+
+
+def _load_items(order_id):
+    items = []
+    for item in OrderItem.objects.filter(order_id=order_id).select_related('product', 'product_variation').order_by('pk'):
+        variation = item.product_variation
+        product_barcode = item.product.barcode if item.product else ''
+        items.append({
+            'id': item.id,
+            'product_name': item.product_name,
+            'product_sku': item.product_sku or (variation.sku if variation else ''),
+            'product_barcode': (variation.barcode if variation else '') or product_barcode or '',
+            'price': str(item.price),
+            'quantity': item.quantity,
+            'product_variation': variation.sku if variation else None,
+        })
+    return items
+
+
+def return_items(match):
+    """The order's items as the return screen wants them, from the LRU while the order is unchanged."""
+    with _lock:
+        cached = _items.get(match.id)
+        if cached and cached[0] == match.updated_at:
+            _items.move_to_end(match.id)
+            return cached[1]
+
+    items = _load_items(match.id)
+    with _lock:
+        _items[match.id] = (match.updated_at, items)
+        _items.move_to_end(match.id)
+        while len(_items) > settings.ORDER_LOOKUP_CACHE_SIZE:
+            _items.popitem(last=False)
+    return items
+
+
+def clear():
+    """Empty this process's LRU (tests)."""
+    with _lock:
+        _items.clear()
@@ -0,0 +1,318 @@
+"""
+In-process request metrics used by PerformanceMiddleware.
+
+Each request gets a RequestStats collected through a DB execute_wrapper on
+every connection and an HTTP adapter hook for outbound NCM calls. Both find
+the request's stats through a ContextVar, so queries an async view runs in
+sync_to_async threads are counted too. Finished requests are folded into
+per-URL-name aggregates held in memory and written to RequestMetric every
+PERF_FLUSH_INTERVAL seconds, so the hot path never touches the database.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+# Upper bounds (ms) of the wall-time histogram buckets; the last bucket is open
+HISTOGRAM_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# A statement repeated this many times in one request is reported as N+1
+DUPLICATE_QUERY_THRESHOLD = 5
+
+_current = ContextVar('request_stats', default=None)
+
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def fingerprint(sql):
+    """Collapse literals and IN-lists so repeats of the same statement match."""
+    normalized = _IN_LIST_RE.sub('IN (...)', _NUMBER_RE.sub('?', sql))
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+class RequestStats:
+    """Counters for a single request."""
+
+    __slots__ = ('db_ms', 'queries', 'fingerprints', 'ncm_ms', 'ncm_calls')
+
+    def __init__(self):
+        self.db_ms = 0.0
+        self.queries = 0
+        self.fingerprints = {}
+        self.ncm_ms = 0.0
+        self.ncm_calls = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.fingerprints[sql] = self.fingerprints.get(sql, 0) + 1
+
+    def duplicates(self):
+        return {sql: n for sql, n in self.fingerprints.items() if n >= DUPLICATE_QUERY_THRESHOLD}
+
+
+def start_request():
+    stats = RequestStats()
+    token = _current.set(stats)
+    return stats, token
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def _add_db_hook(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install_db_hook():
+    """Count queries on every connection, whichever thread opens it."""
+    connection_created.connect(_add_db_hook, dispatch_uid='performance.db_hook')
+    for conn in connections.all(initialized_only=True):
+        _add_db_hook(connection=conn)
+
+
+class _Aggregate:
+    __slots__ = (
+        'requests', 'errors', 'wall_ms', 'wall_ms_max', 'db_ms', 'queries', 'queries_max',
+        'ncm_ms', 'ncm_calls', 'response_bytes', 'histogram', 'duplicates',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.wall_ms = 0.0
+        self.wall_ms_max = 0.0
+        self.db_ms = 0.0
+        self.queries = 0
+        self.queries_max = 0
+        self.ncm_ms = 0.0
+        self.ncm_calls = 0
+        self.response_bytes = 0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.duplicates = {}
+
+    def add(self, wall_ms, stats, status_code, response_bytes):
+        self.requests += 1
+        if status_code >= 500:
+            self.errors += 1
+        self.wall_ms += wall_ms
+        self.wall_ms_max = max(self.wall_ms_max, wall_ms)
+        self.db_ms += stats.db_ms
+        self.queries += stats.queries
+        self.queries_max = max(self.queries_max, stats.queries)
+        self.ncm_ms += stats.ncm_ms
+        self.ncm_calls += stats.ncm_calls
+        self.response_bytes += response_bytes
+
+        for i, bound in enumerate(HISTOGRAM_BUCKETS_MS):
+            if wall_ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+        for sql, count in stats.duplicates().items():
+            key, normalized = fingerprint(sql)
+            entry = self.duplicates.setdefault(key, {'sql': normalized[:500], 'max_repeats': 0, 'requests': 0})
+            entry['max_repeats'] = max(entry['max_repeats'], count)
+            entry['requests'] += 1
+
+    def as_dict(self):
+        return {
+            'request_count': self.requests,
+            'error_count': self.errors,
+            'wall_ms_total': round(self.wall_ms, 3),
+            'wall_ms_max': round(self.wall_ms_max, 3),
+            'db_ms_total': round(self.db_ms, 3),
+            'query_count_total': self.queries,
+            'query_count_max': self.queries_max,
+            'ncm_ms_total': round(self.ncm_ms, 3),
+            'ncm_calls': self.ncm_calls,
+            'response_bytes_total': self.response_bytes,
+            'histogram': self.histogram,
+            'duplicate_queries': self.duplicates,
+        }
+
+
+class MetricsCollector:
+    """Thread-safe per-process buffer of aggregates keyed by URL name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer = {}
+        self._window_start = timezone.now()
+        self._last_flush = time.monotonic()
+
+    def record(self, url_name, wall_ms, stats, status_code, response_bytes, flush=True):
+        """Fold a finished request in; flush=False leaves a due flush to the caller (async code)."""
+        with self._lock:
+            aggregate = self._buffer.get(url_name)
+            if aggregate is None:
+                aggregate = self._buffer[url_name] = _Aggregate()
+            aggregate.add(wall_ms, stats, status_code, response_bytes)
+
+        if flush and self.flush_due():
+            self.flush()
+
+    def flush_due(self):
+        return time.monotonic() - self._last_flush >= getattr(settings, 'PERF_FLUSH_INTERVAL', 60)
+
+    def snapshot(self):
+        """Unflushed aggregates for the current window."""
+        with self._lock:
+            return {name: agg.as_dict() for name, agg in self._buffer.items()}
+
+    def flush(self):
+        from .models import RequestMetric
+
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+            window_start, self._window_start = self._window_start, timezone.now()
+            self._last_flush = time.monotonic()
+
+        if not buffer:
+            return 0
+
+        window_end = timezone.now()
+        RequestMetric.objects.bulk_create([
+            RequestMetric(url_name=name, window_start=window_start, window_end=window_end, **agg.as_dict())
+            for name, agg in buffer.items()
+        ])
+        return len(buffer)
+
+
+collector = MetricsCollector()
+
+
+# ==================== OUTBOUND NCM HTTP ====================
+
+_http_hook_installed = False
+
+
+def install_http_hook():
+    """
+    Time outbound calls to the NCM API.
+
+    NCM is called through ``requests`` from several modules, so the adapter is
+    wrapped once instead of touching every call site.
+    """
+    global _http_hook_installed
+    if _http_hook_installed:
+        return
+
+    from requests.adapters import HTTPAdapter
+
+    ncm_hosts = tuple(
+        url.rstrip('/') for url in (
+            getattr(settings, 'NCM_API_BASE_URL', ''),
+            getattr(settings, 'NCM_API_BASE_URL_V2', ''),
+        ) if url
+    )
+    original_send = HTTPAdapter.send
+
+    def send(self, request, *args, **kwargs):
+        stats = _current.get()
+        if stats is None or not request.url.startswith(ncm_hosts):
+            return original_send(self, request, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original_send(self, request, *args, **kwargs)
+        finally:
+            stats.ncm_ms += (time.perf_counter() - started) * 1000
+            stats.ncm_calls += 1
+
+    HTTPAdapter.send = send
+    _http_hook_installed = True
+
+
+# ==================== REPORTING ====================
+
+def _percentile_from_histogram(histogram, fraction):
+    total = sum(histogram)
+    if not total:
+        return None
+    threshold = total * fraction
+    running = 0
+    for i, count in enumerate(histogram):
+        running += count
+        if running >= threshold:
+            return HISTOGRAM_BUCKETS_MS[i] if i < len(HISTOGRAM_BUCKETS_MS) else None
+    return None
+
+
+def summarize(since):
+    """
+    Merge flushed RequestMetric rows newer than ``since`` with this process's
+    unflushed buffer into one row per URL name, slowest (by total time) first.
+    """
+    from .models import RequestMetric
+
+    rows = RequestMetric.objects.filter(window_start__gte=since).values(
+        'url_name', 'request_count', 'error_count', 'wall_ms_total', 'wall_ms_max', 'db_ms_total',
+        'query_count_total', 'query_count_max', 'ncm_ms_total', 'ncm_calls', 'response_bytes_total',
+        'histogram', 'duplicate_queries',
+    )
+    pending = [dict(agg, url_name=name) for name, agg in collector.snapshot().items()]
+
+    merged = {}
+    for row in list(rows) + pending:
+        entry = merged.get(row['url_name'])
+        if entry is None:
+            entry = merged[row['url_name']] = {
+                'url_name': row['url_name'],
+                'request_count': 0, 'error_count': 0, 'wall_ms_total': 0.0, 'wall_ms_max': 0.0,
+                'db_ms_total': 0.0, 'query_count_total': 0, 'query_count_max': 0,
+                'ncm_ms_total': 0.0, 'ncm_calls': 0, 'response_bytes_total': 0,
+                'histogram': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1), 'duplicate_queries': {},
+            }
+        for key in ('request_count', 'error_count', 'wall_ms_total', 'db_ms_total',
+                    'query_count_total', 'ncm_ms_total', 'ncm_calls', 'response_bytes_total'):
+            entry[key] += row[key]
+        entry['wall_ms_max'] = max(entry['wall_ms_max'], row['wall_ms_max'])
+        entry['query_count_max'] = max(entry['query_count_max'], row['query_count_max'])
+        for i, count in enumerate(row['histogram'] or []):
+            if i < len(entry['histogram']):
+                entry['histogram'][i] += count
+        for key, dup in (row['duplicate_queries'] or {}).items():
+            seen = entry['duplicate_queries'].setdefault(key, {'sql': dup['sql'], 'max_repeats': 0, 'requests': 0})
+            seen['max_repeats'] = max(seen['max_repeats'], dup['max_repeats'])
+            seen['requests'] += dup['requests']
+
+    summary = []
+    for entry in merged.values():
+        n = entry['request_count'] or 1
+        entry['wall_ms_avg'] = round(entry['wall_ms_total'] / n, 1)
+        entry['db_ms_avg'] = round(entry['db_ms_total'] / n, 1)
+        entry['queries_avg'] = round(entry['query_count_total'] / n, 1)
+        entry['ncm_ms_avg'] = round(entry['ncm_ms_total'] / n, 1)
+        entry['response_kb_avg'] = round(entry['response_bytes_total'] / n / 1024, 1)
+        entry['wall_ms_p95'] = _percentile_from_histogram(entry['histogram'], 0.95)
+        entry['duplicate_queries'] = sorted(
+            entry['duplicate_queries'].values(), key=lambda d: d['max_repeats'], reverse=True
+        )[:5]
+        summary.append(entry)
+
+    summary.sort(key=lambda e: e['wall_ms_total'], reverse=True)
+    return summary
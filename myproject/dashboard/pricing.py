@@ -0,0 +1,104 @@
+"""
+Set-based bulk price changes with rollback.
+
+apply() changes the selected products, and optionally their variations, with
+one UPDATE ... SET price = ROUND(price * factor, 2) per table. Just before,
+the affected rows' old and new prices are copied into PriceChangeItem with a
+single INSERT ... SELECT, so no row is loaded into Python. rollback() puts
+the old prices back on rows that still carry the price the batch gave them.
+"""
+
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import PriceChangeBatch, PriceChangeItem, Product, ProductVariation
+
+DIRECTIONS = {'increase_price': 1, 'decrease_price': -1}
+
+
+def factor_for(action, percentage):
+    """Price multiplier; ValueError unless it keeps prices positive."""
+    if action not in DIRECTIONS:
+        raise ValueError(f'Unknown price action: {action}')
+    percentage = Decimal(percentage)
+    if percentage <= 0:
+        raise ValueError('Percentage must be greater than 0')
+    if action == 'decrease_price' and percentage >= 100:
+        raise ValueError('A decrease must be less than 100%')
+    return 1 + DIRECTIONS[action] * percentage / 100
+
+
+def scaled_price(factor):
+    """ROUND(price * factor, 2), evaluated by the database."""
+    return Round(
+        F('price') * Value(factor, output_field=DecimalField(max_digits=12, decimal_places=6)),
+        2,
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def _record(batch, queryset, field_name, new_price):
+    """INSERT INTO PriceChangeItem (batch, field_name, old_price, new_price) SELECT ... FROM queryset."""
+    rows = (
+        queryset.order_by()
+        .annotate(batch_ref=Value(batch.pk), next_price=new_price)
+        .values_list('batch_ref', 'pk', 'price', 'next_price')
+    )
+    select_sql, params = rows.query.sql_with_params()
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    meta = PriceChangeItem._meta
+    columns = ', '.join(
+        quote(meta.get_field(name).column) for name in ('batch', field_name, 'old_price', 'new_price')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(meta.db_table)} ({columns}) {select_sql}', params)
+        return cursor.rowcount
+
+
+def apply(products, action, percentage, include_variations=False, user=None):
+    """Change the price of every product in the queryset; returns the PriceChangeBatch."""
+    factor = factor_for(action, percentage)
+    new_price = scaled_price(factor)
+
+    with transaction.atomic():
+        batch = PriceChangeBatch.objects.create(
+            action=action, percentage=percentage, include_variations=include_variations, created_by=user,
+        )
+        batch.product_count = _record(batch, products, 'product', new_price)
+        products.update(price=new_price)
+
+        if include_variations:
+            variations = ProductVariation.objects.filter(product__in=products.values('pk'))
+            batch.variation_count = _record(batch, variations, 'variation', new_price)
+            variations.update(price=new_price, updated_at=timezone.now())
+
+        batch.save(update_fields=['product_count', 'variation_count'])
+    return batch
+
+
+def rollback(batch, user=None):
+    """
+    Restore the prices batch replaced, skipping rows whose price was changed
+    again since. Returns the number of products and variations restored.
+    """
+    if batch.rolled_back_at:
+        raise ValueError('This price change was already rolled back')
+
+    restored = 0
+    with transaction.atomic():
+        for queryset, field_name in ((Product.all_objects.all(), 'product'), (ProductVariation.objects.all(), 'variation')):
+            items = PriceChangeItem.objects.filter(batch=batch, **{field_name: OuterRef('pk')})
+            fields = {'price': Subquery(items.values('old_price')[:1])}
+            if queryset.model is ProductVariation:
+                fields['updated_at'] = timezone.now()
+            restored += queryset.filter(Exists(items.filter(new_price=OuterRef('price')))).update(**fields)
+
+        batch.rolled_back_at = timezone.now()
+        batch.rolled_back_by = user
+        batch.save(update_fields=['rolled_back_at', 'rolled_back_by'])
+    return restored
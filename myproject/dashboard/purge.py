@@ -0,0 +1,217 @@
+"""
+Permanent deletion of trashed rows in bounded chunks.
+
+QuerySet.delete() loads every object and its whole cascade into memory and
+removes it in one transaction, holding write locks for the duration. purge()
+instead walks the target ids in primary-key order, PURGE_CHUNK_SIZE rows at
+a time, and for each chunk issues raw DELETE / UPDATE statements child-first
+(the same cascade and SET_NULL behaviour as the model definitions), commits,
+and then removes media files that no remaining row references.
+
+sweep() is the retention job behind `manage.py purge_trash`: it purges
+everything that has sat in the trash for longer than TRASH_RETENTION_DAYS.
+Like the rest of the raw-delete path it sends no pre/post_delete signals;
+the only receivers on purged models (returns analytics) are invalidated
+directly.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import timedelta
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import images, returns_analytics
+
+logger = logging.getLogger(__name__)
+
+# Rows of model whose lookup matches the chunk ids; deleted, or set_null cleared
+CascadeStep = namedtuple('CascadeStep', 'model lookup set_null')
+# File fields to clean up for rows of model whose lookup matches the chunk ids
+FileSource = namedtuple('FileSource', 'model lookup fields')
+
+RETURN_IMAGES = ('return_image_1', 'return_image_2', 'return_image_3')
+
+
+def _plans():
+    from .models import (
+        Customer, Dispatch, DispatchItem, Order, OrderActivityLog, OrderItem, PriceChangeItem, Product, ProductImage,
+        ProductVariantOption, ProductVariation, ReturnActivityLog, ReturnItem, ReturnRequest, SalesFact, StockIn,
+        StockInItem, VariationAttributeValue,
+    )
+
+    return {
+        Order: (
+            [
+                CascadeStep(SalesFact, 'order_id__in', None),
+                CascadeStep(ReturnItem, 'return_request__order_id__in', None),
+                CascadeStep(ReturnItem, 'order_item__order_id__in', None),
+                CascadeStep(ReturnActivityLog, 'return_request__order_id__in', None),
+                CascadeStep(ReturnRequest, 'order_id__in', None),
+                CascadeStep(OrderActivityLog, 'order_id__in', None),
+                CascadeStep(DispatchItem, 'order_id__in', 'order'),
+                CascadeStep(OrderItem, 'order_id__in', None),
+            ],
+            [FileSource(ReturnRequest, 'order_id__in', RETURN_IMAGES)],
+        ),
+        Product: (
+            [
+                CascadeStep(SalesFact, 'variation__product_id__in', 'variation'),
+                CascadeStep(SalesFact, 'product_id__in', 'product'),
+                CascadeStep(PriceChangeItem, 'variation__product_id__in', None),
+                CascadeStep(PriceChangeItem, 'product_id__in', None),
+                CascadeStep(ReturnItem, 'product_id__in', None),
+                CascadeStep(ReturnItem, 'product_variation__product_id__in', 'product_variation'),
+                CascadeStep(StockInItem, 'product_id__in', None),
+                CascadeStep(StockInItem, 'product_variation__product_id__in', None),
+                CascadeStep(OrderItem, 'product_variation__product_id__in', 'product_variation'),
+                CascadeStep(OrderItem, 'product_id__in', 'product'),
+                CascadeStep(VariationAttributeValue, 'variation__product_id__in', None),
+                CascadeStep(ProductVariation, 'product_id__in', None),
+                CascadeStep(ProductImage, 'product_id__in', None),
+                CascadeStep(ProductVariantOption, 'product_id__in', None),
+            ],
+            [
+                FileSource(Product, 'id__in', ('image',)),
+                FileSource(ProductVariation, 'product_id__in', ('image',)),
+                FileSource(ProductImage, 'product_id__in', ('image',)),
+            ],
+        ),
+        ReturnRequest: (
+            [
+                CascadeStep(ReturnItem, 'return_request_id__in', None),
+                CascadeStep(ReturnActivityLog, 'return_request_id__in', None),
+            ],
+            [FileSource(ReturnRequest, 'id__in', RETURN_IMAGES)],
+        ),
+        Dispatch: (
+            [CascadeStep(DispatchItem, 'dispatch_id__in', None)],
+            [],
+        ),
+        Customer: (
+            [
+                CascadeStep(ReturnItem, 'return_request__customer_id__in', None),
+                CascadeStep(ReturnActivityLog, 'return_request__customer_id__in', None),
+                CascadeStep(ReturnRequest, 'customer_id__in', None),
+                CascadeStep(Order, 'customer_id__in', 'customer'),
+            ],
+            [FileSource(ReturnRequest, 'customer_id__in', RETURN_IMAGES)],
+        ),
+        StockIn: (
+            [CascadeStep(StockInItem, 'stock_in_id__in', None)],
+            [],
+        ),
+    }
+
+
+def _raw_delete(queryset):
+    # Plain DELETE ... WHERE, no collector
+    return queryset._raw_delete(queryset.db)
+
+
+def _collect_files(sources, ids):
+    found = set()
+    for source in sources:
+        rows = source.model._base_manager.filter(**{source.lookup: ids}).values_list(*source.fields)
+        for row in rows:
+            found.update(name for name in row if name)
+    return found
+
+
+def _file_fields():
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def remove_orphaned_files(names):
+    """
+    Delete media files (and their resized derivatives) no longer referenced by
+    any FileField; returns how many originals were removed.
+    """
+    names = set(names)
+    if not names:
+        return 0
+    storages = set()
+    for model, field in _file_fields():
+        storages.add(field.storage)
+        names.difference_update(
+            model._base_manager.filter(**{f'{field.name}__in': names}).values_list(field.name, flat=True)
+        )
+    removed = 0
+    for name in names:
+        for storage in storages:
+            try:
+                if storage.exists(name):
+                    storage.delete(name)
+                    images.delete(name, storage)
+                    removed += 1
+                    break
+            except OSError:
+                logger.warning('Could not delete orphaned media file %s', name, exc_info=True)
+    return removed
+
+
+def purge(queryset, chunk_size=None, remove_files=True):
+    """
+    Permanently delete every row in queryset (Order, Product, ReturnRequest,
+    Dispatch, Customer or StockIn) with its dependants. Returns the number of
+    root rows deleted.
+    """
+    model = queryset.model
+    plans = _plans()
+    if model not in plans:
+        raise ValueError(f'No purge plan for {model.__name__}')
+    steps, file_sources = plans[model]
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    total = 0
+    last_id = None
+    while True:
+        pending = ids if last_id is None else ids.filter(pk__gt=last_id)
+        chunk = list(pending[:chunk_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+
+        with transaction.atomic():
+            files = _collect_files(file_sources, chunk) if remove_files else set()
+            for step in steps:
+                related = step.model._base_manager.filter(**{step.lookup: chunk})
+                if step.set_null:
+                    related.update(**{step.set_null: None})
+                else:
+                    _raw_delete(related)
+            total += _raw_delete(model._base_manager.filter(pk__in=chunk))
+            if files:
+                transaction.on_commit(partial(remove_orphaned_files, files))
+
+    if total:
+        returns_analytics.invalidate()  # cheap, and order / product / return purges all reach returns
+        logger.info('Purged %d %s row(s)', total, model._meta.verbose_name)
+    return total
+
+
+def sweep(days=None, chunk_size=None, dry_run=False):
+    """
+    Purge everything trashed more than `days` ago (default TRASH_RETENTION_DAYS).
+
+    Returns {model verbose name: rows purged, or due when dry_run}.
+    """
+    from .models import Dispatch, Order, Product, ReturnRequest
+
+    days = settings.TRASH_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    results = {}
+    # Returns and dispatches first: purging an order cascades into its returns
+    for model in (ReturnRequest, Dispatch, Order, Product):
+        expired = model.trashed.filter(deleted_at__lt=cutoff)
+        name = str(model._meta.verbose_name_plural)
+        results[name] = expired.count() if dry_run else purge(expired, chunk_size)
+    return results
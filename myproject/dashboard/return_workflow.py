@@ -0,0 +1,194 @@
+"""
+Move many return requests through the same workflow step in one go.
+
+    result = return_workflow.apply('refund', request.user, rma_numbers=['RMA-20261019-0001', ...])
+    result.processed, result.skipped, result.restocked_units, result.outcomes
+
+One call is one transaction. The returns are locked and loaded with one query
+per LOOKUP_BATCH, and the ones in a status the step accepts get their new
+status with a bulk UPDATE. For restock / refund, their items that are not yet
+restocked are flagged with one UPDATE per batch, and the units are summed per
+product / variation so the stock goes up with one CASE UPDATE per model
+(stock_import.increment_stock). The activity log rows are bulk-created on
+commit (activity_log.collect).
+
+Returns that can't take the step are reported and left untouched: unknown
+RMA numbers, trashed returns and those in another status. Nothing is ever
+restocked twice.
+"""
+
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import activity_log, bulk, returns_analytics, stock_import
+from .models import ReturnItem, ReturnRequest
+
+LOOKUP_BATCH = 500
+
+# action: (label, statuses it applies to, new status or None to keep it)
+ACTIONS = {
+    'approve': ('Approve', ('pending',), 'approved'),
+    'reject': ('Reject', ('pending', 'approved'), 'rejected'),
+    'receive': ('Mark received', ('approved',), 'received'),
+    'restock': ('Restock items', ('received', 'inspecting', 'approved_refund', 'approved_exchange'), None),
+    'refund': ('Refund and restock', ('received', 'inspecting', 'approved_refund'), 'refunded'),
+}
+RESTOCKING = ('restock', 'refund')
+LOG_TYPES = {'approve': 'approved', 'reject': 'rejected', 'receive': 'received', 'restock': 'restocked',
+             'refund': 'refunded'}
+
+STATUS_LABELS = dict(ReturnRequest.RETURN_STATUS_CHOICES)
+
+
+class BatchResult:
+
+    def __init__(self, action):
+        self.action = action
+        self.outcomes = []  # (rma number or reference, 'done' / 'skipped' / 'not_found', message), as requested
+        self.processed = 0
+        self.skipped = 0
+        self.not_found = 0
+        self.restocked_units = 0
+        self.seconds = 0.0
+
+    @property
+    def rows(self):
+        return len(self.outcomes)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else self.rows
+
+
+def parse_references(text):
+    """'RMA-20261019-0001, 17' as scanned or pasted -> ([17], ['RMA-20261019-0001'])."""
+    references = text.replace(',', ' ').split()
+    return [int(ref) for ref in references if ref.isdigit()], [ref for ref in references if not ref.isdigit()]
+
+
+def _load(ids, rma_numbers):
+    """Live returns by id and by RMA number, locked for the transaction."""
+    fields = ('rma_number', 'return_status', 'total_amount', 'refund_amount', 'restocking_fee')
+    found = {}
+    for key, values in (('pk__in', ids), ('rma_number__in', rma_numbers)):
+        for start in range(0, len(values), LOOKUP_BATCH):
+            queryset = ReturnRequest.objects.select_for_update().filter(**{key: values[start:start + LOOKUP_BATCH]})
+            for return_request in queryset.only(*fields):
+                found.setdefault(return_request.pk, return_request)
+    return found
+
+
+def _restock(return_ids, user, now):
+    """Flag the unrestocked items of these returns and add their units to stock; {return id: units}."""
+    product_increments = defaultdict(int)
+    variation_increments = defaultdict(int)
+    units = defaultdict(int)
+    item_ids = []
+    for start in range(0, len(return_ids), LOOKUP_BATCH):
+        items = ReturnItem.objects.filter(
+            return_request_id__in=return_ids[start:start + LOOKUP_BATCH], restocked=False,
+        ).values_list('pk', 'return_request_id', 'product_id', 'product_variation_id', 'return_quantity')
+        for pk, return_id, product_id, variation_id, quantity in items:
+            item_ids.append(pk)
+            units[return_id] += quantity
+            if variation_id:
+                variation_increments[variation_id] += quantity
+            else:
+                product_increments[product_id] += quantity
+
+    for start in range(0, len(item_ids), LOOKUP_BATCH):
+        ReturnItem.objects.filter(pk__in=item_ids[start:start + LOOKUP_BATCH]).update(
+            restocked=True, restocked_at=now, restocked_by=user,
+        )
+    stock_import.increment_stock(product_increments, variation_increments)
+    return units
+
+
+def apply(action, user, ids=(), rma_numbers=(), rejection_reason=''):
+    """Apply one workflow step to many returns; returns a BatchResult. ValueError for an unknown action."""
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown return action "{action}"')
+    started = time.perf_counter()
+    label, statuses, new_status = ACTIONS[action]
+    result = BatchResult(action)
+    now = timezone.now()
+    ids = list(dict.fromkeys(int(pk) for pk in ids))
+    rma_numbers = list(dict.fromkeys(number.strip().upper() for number in rma_numbers if number.strip()))
+
+    with transaction.atomic(), activity_log.collect():
+        found = _load(ids, rma_numbers)
+        by_number = {return_request.rma_number: return_request for return_request in found.values()}
+
+        requested = [(str(pk), found.get(pk)) for pk in ids] + [(n, by_number.get(n)) for n in rma_numbers]
+        ready, seen, slots = [], set(), {}
+        for reference, return_request in requested:
+            if return_request is None:
+                result.not_found += 1
+                result.outcomes.append((reference, 'not_found', 'No such return, or it is in the trash'))
+                continue
+            if return_request.pk in seen:
+                continue  # listed twice
+            seen.add(return_request.pk)
+            if return_request.return_status not in statuses:
+                result.skipped += 1
+                result.outcomes.append((
+                    return_request.rma_number, 'skipped',
+                    f'{STATUS_LABELS.get(return_request.return_status, return_request.return_status)}; '
+                    f'"{label}" needs {" / ".join(STATUS_LABELS[status] for status in statuses)}',
+                ))
+                continue
+            ready.append(return_request)
+            slots[return_request.pk] = len(result.outcomes)
+            result.outcomes.append(None)  # filled in once written
+
+        ready_ids = [return_request.pk for return_request in ready]
+        changes = {'updated_at': now}
+        if new_status:
+            changes['return_status'] = new_status
+        if action in ('approve', 'reject'):
+            changes.update(approved_by=user, approved_at=now)
+        if action == 'reject' and rejection_reason:
+            changes['rejection_reason'] = rejection_reason
+        if action == 'refund':
+            changes['refunded_at'] = now
+        for start in range(0, len(ready_ids), LOOKUP_BATCH):
+            ReturnRequest.all_objects.filter(pk__in=ready_ids[start:start + LOOKUP_BATCH]).update(**changes)
+
+        if action == 'refund':
+            # Refund what was agreed, or the returned value less the restocking fee
+            unset = [return_request for return_request in ready if not return_request.refund_amount]
+            for return_request in unset:
+                return_request.refund_amount = max(return_request.total_amount - return_request.restocking_fee,
+                                                   Decimal('0.00'))
+            bulk.update_rows(ReturnRequest.all_objects.all(), unset, ['refund_amount'])
+
+        units = _restock(ready_ids, user, now) if action in RESTOCKING else {}
+
+        for return_request in ready:
+            message = STATUS_LABELS[new_status or return_request.return_status]
+            description = f'{label} (batch of {len(ready)}) by {user.username}'
+            if action == 'reject' and rejection_reason:
+                description += f': {rejection_reason}'
+            if action == 'refund':
+                message += f', Rs. {return_request.refund_amount}'
+                description += f', refund Rs. {return_request.refund_amount}'
+            if action in RESTOCKING:
+                message += f', {units.get(return_request.pk, 0)} unit(s) restocked'
+                description += f', {units.get(return_request.pk, 0)} unit(s) restocked'
+            activity_log.log_return(
+                return_request=return_request, user=user, action_type=LOG_TYPES[action], description=description,
+                field_name='return_status' if new_status else None,
+                old_value=return_request.return_status if new_status else None, new_value=new_status,
+            )
+            result.outcomes[slots[return_request.pk]] = (return_request.rma_number, 'done', message)
+        result.processed = len(ready)
+        result.restocked_units = sum(units.values())
+
+    if ready:
+        returns_analytics.invalidate()  # update() sends no post_save
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,153 @@
+"""
+Numbers behind the returns dashboard, cached per filter.
+
+    stats = returns_analytics.summary('last_30_days', status='')
+    stats['counts']['pending'], stats['refund_total'], stats['reasons'], stats['products']
+
+summary() runs four queries:
+- one conditional aggregate over ReturnRequest for the total, every status
+  count, the refund totals and the trash count
+- one grouped query over ReturnItem for reason x status
+- one grouped query over ReturnItem for the most returned products, and one
+  over OrderItem for their units sold in the same date range (return rate)
+
+The result is cached per date filter, status filter and day. The key
+carries a version stamp that is bumped whenever a ReturnRequest or
+ReturnItem is saved or deleted (signals.py). Bulk .update() / purge callers
+call invalidate() themselves. Units sold only refresh after
+RETURNS_ANALYTICS_CACHE_SECONDS.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from . import cache_versions
+from .models import OrderItem, ReturnItem, ReturnRequest
+
+VERSION_KEY = 'dashboard:returns_analytics:version'
+
+DATE_RANGES = ('all', 'today', 'yesterday', 'last_7_days', 'last_30_days', 'this_month')
+STATUSES = [value for value, _ in ReturnRequest.RETURN_STATUS_CHOICES]
+REASON_LABELS = dict(ReturnRequest.RETURN_REASON_CHOICES)
+
+PRODUCT_LIMIT = 10
+
+
+def date_range_q(date_filter, field='created_at', today=None):
+    """Q for the dashboard's date_range values; anything unknown means all time."""
+    today = today or timezone.now().date()
+    if date_filter == 'today':
+        return Q(**{f'{field}__date': today})
+    if date_filter == 'yesterday':
+        return Q(**{f'{field}__date': today - timedelta(days=1)})
+    if date_filter == 'last_7_days':
+        return Q(**{f'{field}__date__gte': today - timedelta(days=7)})
+    if date_filter == 'last_30_days':
+        return Q(**{f'{field}__date__gte': today - timedelta(days=30)})
+    if date_filter == 'this_month':
+        return Q(**{f'{field}__year': today.year, f'{field}__month': today.month})
+    return Q()
+
+
+def invalidate():
+    """Drop every cached summary."""
+    cache_versions.bump(VERSION_KEY)
+
+
+def _totals(live):
+    aggregates = {
+        'total': Count('pk', filter=live),
+        'trash_count': Count('pk', filter=Q(is_deleted=True)),
+        'returned_value': Sum('total_amount', filter=live),
+        'refund_total': Sum('refund_amount', filter=live & Q(return_status='refunded')),
+    }
+    for status in STATUSES:
+        aggregates[f'status_{status}'] = Count('pk', filter=live & Q(return_status=status))
+
+    row = ReturnRequest.all_objects.aggregate(**aggregates)
+    return {
+        'total': row['total'],
+        'trash_count': row['trash_count'],
+        'returned_value': row['returned_value'] or Decimal('0.00'),
+        'refund_total': row['refund_total'] or Decimal('0.00'),
+        'counts': {status: row[f'status_{status}'] for status in STATUSES},
+    }
+
+
+def _reasons(items):
+    """[{'return_reason', 'label', 'count', 'units', 'statuses': {status: count}}], most returns first."""
+    reasons = {}
+    rows = items.values('return_request__return_reason', 'return_request__return_status').annotate(
+        returns=Count('return_request', distinct=True), units=Sum('return_quantity'),
+    )
+    for row in rows:
+        reason = row['return_request__return_reason']
+        entry = reasons.setdefault(reason, {
+            'return_reason': reason, 'label': REASON_LABELS.get(reason, reason), 'count': 0, 'units': 0,
+            'statuses': {},
+        })
+        entry['count'] += row['returns']
+        entry['units'] += row['units'] or 0
+        entry['statuses'][row['return_request__return_status']] = row['returns']
+    return sorted(reasons.values(), key=lambda entry: (-entry['count'], entry['return_reason']))
+
+
+def _products(items, date_filter, today):
+    """Top PRODUCT_LIMIT products by units returned, with units sold in the same range and the rate."""
+    rows = list(items.values('product_id', 'product__name').annotate(
+        returned=Sum('return_quantity'), returns=Count('return_request', distinct=True),
+    ).order_by('-returned', 'product_id')[:PRODUCT_LIMIT])
+    if not rows:
+        return []
+
+    # Units sold only for the products shown; a correlated subquery would run for every returned product
+    sold = dict(
+        OrderItem.objects.filter(
+            date_range_q(date_filter, 'order__created_at', today),
+            product_id__in=[row['product_id'] for row in rows], order__is_deleted=False,
+        ).values('product_id').annotate(units=Sum('quantity')).values_list('product_id', 'units')
+    )
+    return [
+        {
+            'product_id': row['product_id'],
+            'name': row['product__name'],
+            'returned': row['returned'],
+            'returns': row['returns'],
+            'sold': sold.get(row['product_id'], 0),
+            'rate': round(100 * row['returned'] / sold[row['product_id']], 1) if sold.get(row['product_id']) else None,
+        }
+        for row in rows
+    ]
+
+
+def summary(date_filter='all', status=''):
+    """Totals and breakdowns for the returns dashboard (see the module docstring)."""
+    date_filter = date_filter if date_filter in DATE_RANGES else 'all'
+    status = status if status in STATUSES else ''
+    today = timezone.now().date()
+    key = f'dashboard:returns_analytics:{cache_versions.version(VERSION_KEY)}:{date_filter}:{status or "any"}:{today.isoformat()}'
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    live = Q(is_deleted=False) & date_range_q(date_filter, today=today)
+    item_filter = Q(return_request__is_deleted=False) & date_range_q(date_filter, 'return_request__created_at', today)
+    if status:
+        live &= Q(return_status=status)
+        item_filter &= Q(return_request__return_status=status)
+    items = ReturnItem.objects.filter(item_filter)
+
+    result = _totals(live)
+    result['reasons'] = _reasons(items)
+    # Reason x status table: only the statuses that occur, cells in that order
+    result['reason_statuses'] = [s for s in STATUSES if any(s in entry['statuses'] for entry in result['reasons'])]
+    for entry in result['reasons']:
+        entry['cells'] = [entry['statuses'].get(s, 0) for s in result['reason_statuses']]
+    result['products'] = _products(items, date_filter, today)
+    cache.set(key, result, settings.RETURNS_ANALYTICS_CACHE_SECONDS)
+    return result
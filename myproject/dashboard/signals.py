@@ -1,6 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Order, OrderActivityLog
+from django.conf import settings
+
+from .models import (
+    Order, OrderItem, Category, City, Product, ProductImage, ProductVariation, ReturnItem, ReturnRequest,
+)
+from . import activity_log, catalog, city_directory, images, returns_analytics, sales_facts
 
 @receiver(post_save, sender=Order)
 def log_order_creation(sender, instance, created, **kwargs):
@@ -10,9 +15,51 @@ def log_order_creation(sender, instance, created, **kwargs):
         if instance.is_partial_payment:
             description += f' | Partial Payment: रू {instance.partial_amount_paid} paid, रू {instance.remaining_amount} remaining'
         
-        OrderActivityLog.objects.create(
+        activity_log.log_order(
             order=instance,
             action_type='created',
             user=instance.created_by,
             description=description
         )
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def schedule_sales_facts(sender, instance, **kwargs):
+    """Recompute the order's sales facts once, when the transaction commits"""
+    sales_facts.schedule(instance.order_id if sender is OrderItem else instance.pk)
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_directory(sender, instance, **kwargs):
+    """Any City change makes every process reload its city directory"""
+    city_directory.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    catalog.invalidate_categories()
+
+
+@receiver(post_save, sender=ReturnRequest)
+@receiver(post_delete, sender=ReturnRequest)
+@receiver(post_save, sender=ReturnItem)
+@receiver(post_delete, sender=ReturnItem)
+def invalidate_returns_analytics(sender, instance, **kwargs):
+    returns_analytics.invalidate()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_save, sender=ProductImage)
+def schedule_image_derivatives(sender, instance, **kwargs):
+    """Thumbnail / medium / WebP copies are built after commit, off the request path"""
+    images.schedule(instance.image)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def schedule_profile_picture_derivatives(sender, instance, **kwargs):
+    images.schedule(instance.profile_picture)
@@ -0,0 +1,132 @@
+"""
+Fingerprinted, precompressed static files served by the app itself.
+
+`collectstatic` (with the STORAGES["staticfiles"] backend below) writes
+content-hashed copies of every asset, css/dashboard.css ->
+css/dashboard.3f2a9c81b7d4.css, and next to each text asset a .gz and,
+when the optional `brotli` package is installed, a .br variant.
+
+StaticAssetMiddleware serves STATIC_URL from STATIC_ROOT: it picks the
+best variant the client accepts, sends hashed names with a one year
+immutable Cache-Control and everything else with STATIC_MAX_AGE.
+"""
+
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml')
+MIN_COMPRESS_BYTES = 256
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+# ManifestStaticFilesStorage inserts a 12 character md5 prefix before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+# (Content-Encoding, file suffix), best first
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def compress(data):
+    """{suffix: compressed bytes} for the variants that are actually smaller."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return {suffix: body for suffix, body in variants.items() if len(body) < len(data) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz / .br copies of text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.update(n for n in (name, hashed_name) if n)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in sorted(names):
+                self._write_compressed(name)
+
+    def _write_compressed(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS) or not self.exists(name):
+            return
+        with self.open(name) as fh:
+            data = fh.read()
+        if len(data) < MIN_COMPRESS_BYTES:
+            return
+        for suffix, body in compress(data).items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(body))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Not collected yet (fresh checkout, test runs): fall back to the plain name
+            logger.debug('No manifest entry for static file %s', name)
+            return name
+
+
+def static_prefix():
+    prefix = settings.STATIC_URL or ''
+    if not prefix.startswith(('/', 'http://', 'https://')):
+        prefix = '/' + prefix
+    return prefix
+
+
+def find_file(name):
+    """Absolute path of name inside STATIC_ROOT, or None."""
+    if not settings.STATIC_ROOT or not name or name.endswith(('.gz', '.br')):
+        return None
+    try:
+        path = safe_join(settings.STATIC_ROOT, name)
+    except SuspiciousFileOperation:  # path traversal
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def accepted_encodings(request):
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_variant(path, request):
+    """(path to send, Content-Encoding or None)."""
+    accepted = accepted_encodings(request)
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+def cache_control(name):
+    if HASHED_NAME_RE.search(name):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.STATIC_MAX_AGE}'
+
+
+def content_type(name):
+    guessed, _ = mimetypes.guess_type(name)
+    return guessed or 'application/octet-stream'
@@ -0,0 +1,145 @@
+"""
+Row-at-a-time reading and writing of CSV, XLSX and JSON Lines files.
+
+    header, rows = tabular.read(upload)      # rows is a generator of lists
+    for chunk in tabular.chunked(rows, 1000):
+        ...
+
+    tabular.write_csv(header, rows)          # generators of encoded chunks,
+    tabular.write_jsonl(header, rows)        # for StreamingHttpResponse
+    tabular.write_xlsx(header, rows, path)
+
+Nothing here holds more than one row (or one chunk) in memory: CSV goes
+through csv.reader, XLSX through openpyxl's read-only / write-only modes and
+JSON Lines one json.loads per line. For JSON Lines the header is the keys of
+the first object.
+"""
+
+import csv
+import io
+import json
+import os
+from itertools import islice
+from zipfile import BadZipFile
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+FORMATS = ('csv', 'xlsx', 'jsonl')
+
+
+def file_format(name):
+    extension = os.path.splitext(name or '')[1].lower().lstrip('.')
+    if extension in ('csv', 'txt', ''):
+        return 'csv'
+    if extension in ('xlsx', 'xlsm'):
+        return 'xlsx'
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    raise ValueError('Upload a .csv, .xlsx or .jsonl file')
+
+
+def _xlsx_rows(upload):
+    try:
+        workbook = load_workbook(upload, read_only=True, data_only=True)
+    except (BadZipFile, InvalidFileException):
+        raise ValueError('Not a valid XLSX file')
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _text_lines(upload):
+    upload.seek(0)
+    text = io.TextIOWrapper(getattr(upload, 'file', upload), encoding='utf-8-sig', newline='')
+    try:
+        yield from text
+    finally:
+        text.detach()  # leave the upload open for Django to clean up
+
+
+def _jsonl_rows(upload):
+    header = None
+    for line in _text_lines(upload):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if header is None:
+            header = list(record)
+            yield header
+        yield [record.get(key) for key in header]
+
+
+def read(upload, kind=None):
+    """(header, rows) of the first sheet / the whole file; ValueError if it is empty."""
+    kind = kind or file_format(upload.name)
+    if kind == 'xlsx':
+        rows = _xlsx_rows(upload)
+    elif kind == 'jsonl':
+        rows = _jsonl_rows(upload)
+    else:
+        rows = csv.reader(_text_lines(upload))
+    header = next(rows, None)
+    if header is None:
+        raise ValueError('The file is empty')
+    return list(header), rows
+
+
+def column_map(header, columns, required=()):
+    """{key: index} for the columns whose header matches one of the accepted spellings."""
+    normalized = [str(cell or '').strip().lower().replace('_', ' ') for cell in header]
+    found = {}
+    for key, names in columns.items():
+        for index, name in enumerate(normalized):
+            if name in names:
+                found[key] = index
+                break
+    missing = [key for key in required if key not in found]
+    if missing:
+        raise ValueError(f'Missing column(s): {", ".join(missing)}')
+    return found
+
+
+def cell(row, index):
+    """The cell as a stripped string, '' when missing; 12.0 from a spreadsheet becomes '12'."""
+    if index is None or index >= len(row) or row[index] is None:
+        return ''
+    value = row[index]
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def write_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow(header)  # BOM so Excel picks UTF-8
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_jsonl(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def write_xlsx(header, rows, path):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
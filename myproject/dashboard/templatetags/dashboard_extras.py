@@ -1,6 +1,9 @@
 from django import template
+from django.utils.html import format_html
 from decimal import Decimal
 
+from dashboard.images import ImageVariants
+
 register = template.Library()
 
 @register.filter(name='order_badge')
@@ -177,3 +180,17 @@ def replace(value, arg):
         return str(value).replace(old, new)
     except (ValueError, AttributeError):
         return value
+
+
+@register.simple_tag
+def responsive_image(field_file, size='thumb', alt='', css_class=''):
+    """WebP derivative with a JPEG fallback; the original until the derivatives exist"""
+    variants = ImageVariants(field_file)
+    if not variants:
+        return ''
+    if not variants.ready:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy">', variants.original, alt, css_class)
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp"><img src="{}" alt="{}" class="{}" loading="lazy"></picture>',
+        variants.url(size, 'webp'), variants.url(size), alt, css_class,
+    )
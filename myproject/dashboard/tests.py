@@ -1,3 +1,1612 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from openpyxl import Workbook
+from PIL import Image
+
+from logistics.models import LogisticsOrder
+from ncm.views import _store_synced_status
+from services import ncm_tracking
+from . import (
+    activity_log, analytics_export, cache_versions, catalog, catalog_sync, city_directory, conditional, customer_import,
+    images, keyset, order_lookup, performance, pricing, purge, return_workflow, returns_analytics, sales_facts,
+    static_assets, stock_import, tabular, variation_matrix,
+)
+from .models import (
+    Category, City, Customer, Dispatch, DispatchItem, Order, OrderActivityLog, OrderItem, PriceChangeBatch, PriceChangeItem,
+    Product, ProductVariantOption, ProductVariation, RequestMetric, ReturnActivityLog, ReturnItem, ReturnRequest, SalesFact,
+    StockIn, StockInItem,
+    VariationAttributeValue,
+)
+from .views import _record_ncm_statuses
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'\bSCAN (\w+)(?!\w| USING)')
+
+
+def shared_cache():
+    """The Redis profile (settings.SHARED_CACHE): sessions, users and stamps served from the cache."""
+    return override_settings(
+        SHARED_CACHE=True, SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        AUTHENTICATION_BACKENDS=['accounts.backends.CachedModelBackend'],
+    )
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN checks are SQLite specific')
+class HotQueryPlanTests(TestCase):
+    """Fail if a hot view query falls back to a full table scan."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='planner', email='planner@example.com', password='x')
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        # SQLite < 3.36 prints 'SCAN TABLE x'
+        scans = FULL_SCAN.findall(plan.replace('SCAN TABLE ', 'SCAN '))
+        self.assertEqual(scans, [], f'Full table scan in query plan:\n{plan}\n\n{queryset.query}')
+
+    def test_orders_list(self):
+        live = Order.objects.select_related('customer', 'created_by')
+        self.assertUsesIndex(live.order_by('-created_at')[:25])
+        self.assertUsesIndex(live.filter(order_status='pending').order_by('-created_at')[:25])
+        self.assertUsesIndex(live.filter(payment_status='paid').order_by('-created_at')[:25])
+
+    def test_orders_trash(self):
+        self.assertUsesIndex(Order.trashed.order_by('-deleted_at'))
+
+    def test_order_by_customer_phone(self):
+        self.assertUsesIndex(Order.objects.filter(customer_phone='9800000000').order_by('-created_at')[:1])
+
+    def test_dispatch_scan_lookup(self):
+        code = 'ORD-1001'
+        self.assertUsesIndex(Order.objects.filter(Q(order_number=code) | Q(barcode=code))[:1])
+
+    def test_order_code_lookup(self):
+        self.assertUsesIndex(order_lookup.candidates('ORD-1001')[:10])
+
+    def test_ncm_orders_list(self):
+        self.assertUsesIndex(
+            Order.objects.filter(logistics='ncm', ncm_order_id__isnull=False)
+            .order_by('-ncm_created_at')[:25]
+        )
+        self.assertUsesIndex(Order.objects.filter(ncm_order_id__isnull=False, ncm_status='Delivered'))
+
+    def test_order_activity_logs(self):
+        self.assertUsesIndex(OrderActivityLog.objects.filter(order_id=1).order_by('-created_at')[:20])
+
+    def test_products_list(self):
+        live = Product.objects.select_related('category')
+        self.assertUsesIndex(live.order_by('-created_at', '-pk')[:51])
+        self.assertUsesIndex(
+            live.filter(Q(created_at__lt=timezone.now()) | Q(created_at=timezone.now(), pk__lt=100))
+            .order_by('-created_at', '-pk')[:51]
+        )
+        self.assertUsesIndex(Product.objects.filter(user=self.user, is_active=True))
+
+    def test_low_stock_products(self):
+        self.assertUsesIndex(
+            Product.objects.filter(stock__lte=10, stock__gt=0).order_by('stock')[:5]
+        )
+
+    def test_returns(self):
+        self.assertUsesIndex(ReturnRequest.objects.filter(return_status='pending'))
+        self.assertUsesIndex(ReturnRequest.objects.order_by('-created_at')[:10])
+        self.assertUsesIndex(ReturnRequest.trashed.order_by('-deleted_at'))
+
+    def test_dispatches(self):
+        self.assertUsesIndex(Dispatch.objects.prefetch_related('items').order_by('-created_at')[:25])
+        self.assertUsesIndex(Dispatch.trashed.order_by('-deleted_at'))
+
+    def test_users(self):
+        self.assertUsesIndex(User.objects.order_by('-date_joined'))
+        self.assertUsesIndex(User.objects.filter(role='sales'))
+        self.assertUsesIndex(User.trashed.order_by('-deleted_at'))
+
+    def test_logistics_order_lookup(self):
+        self.assertUsesIndex(LogisticsOrder.objects.filter(ncm_order_id='12345'))
+        self.assertUsesIndex(LogisticsOrder.objects.filter(order_reference='ORD-1001'))
+
+
+@override_settings(PERF_MONITORING_ENABLED=True, PERF_FLUSH_INTERVAL=0)
+class PerformanceMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            username='perfadmin', email='perfadmin@example.com', password='x', role='administrator'
+        )
+
+    def test_requests_are_aggregated_and_flushed(self):
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(reverse('api_performance_metrics'))
+        self.assertEqual(response.status_code, 200)
+
+        metric = RequestMetric.objects.get(url_name='api_performance_metrics')
+        self.assertEqual(metric.request_count, 1)
+        self.assertGreater(metric.query_count_total, 0)
+        self.assertEqual(sum(metric.histogram), 1)
+
+        page = client.get(reverse('performance_dashboard'))
+        self.assertContains(page, 'api_performance_metrics')
+
+    async def test_async_views_are_counted(self):
+        order = await Order.objects.acreate(
+            order_number='NCM-PERF', customer_name='Customer', customer_phone='9800000000',
+            shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=100,
+            logistics='ncm', ncm_order_id=6001,
+        )
+        # The test connection is older than the handler, so connection_created won't reach it
+        await sync_to_async(performance.install_db_hook)()
+        await self.async_client.aforce_login(self.admin)
+        ncm_reply = {'success': True, 'data': [{'status': 'Delivered'}]}
+        with mock.patch.object(ncm_tracking.ncm_service, 'get_order_status', return_value=ncm_reply):
+            await self.async_client.get(reverse('ncm_track_order', args=[order.id]))
+
+        metric = await RequestMetric.objects.aget(url_name='ncm_track_order')
+        self.assertGreater(metric.query_count_total, 0)
+        self.assertEqual(metric.ncm_calls, 0)  # mocked above the HTTP adapter
+
+    def test_repeated_queries_are_reported(self):
+        stats = performance.RequestStats()
+        with connection.execute_wrapper(stats):
+            for pk in range(performance.DUPLICATE_QUERY_THRESHOLD):
+                list(Order.objects.filter(pk=pk))
+        self.assertEqual(len(stats.duplicates()), 1)
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_and_purge(self):
+        out = StringIO()
+        call_command('generate_synthetic_data', scale=0.002, batch_size=50, stdout=out)
+        self.assertTrue(Order.objects.filter(order_number__startswith='SYN-').exists())
+        self.assertTrue(OrderActivityLog.objects.filter(order__order_number__startswith='SYN-').exists())
+        dispatched = Order.all_objects.filter(order_number__startswith='SYN-', dispatch_date__isnull=False).count()
+        self.assertEqual(DispatchItem.objects.filter(order__order_number__startswith='SYN-').count(), dispatched)
+        self.assertTrue(ReturnItem.objects.filter(return_request__rma_number__startswith='RMA-SYN-').exists())
+
+        call_command('generate_synthetic_data', purge=True, stdout=out)
+        self.assertFalse(Order.all_objects.filter(order_number__startswith='SYN-').exists())
+        self.assertFalse(Product.all_objects.filter(slug__startswith='syn-product-').exists())
+        self.assertFalse(Customer.objects.filter(email__endswith='@synthetic.test').exists())
+        self.assertFalse(ReturnRequest.all_objects.filter(rma_number__startswith='RMA-SYN-').exists())
+        self.assertFalse(StockInItem.objects.exists())
+
+
+class CityDirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cities', email='cities@example.com', password='x')
+        City.objects.bulk_create([
+            City(name='Kathmandu', valley_status='valley'),
+            City(name='Lalitpur', valley_status='valley'),
+            City(name='Madhyapur Thimi', valley_status='valley'),
+            City(name='Pokhara', valley_status='out_valley'),
+            City(name='Biratnagar', valley_status='out_valley'),
+            City(name='Birgunj', valley_status='out_valley', is_active=False),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_autocomplete_prefix_word_and_alias(self):
+        directory = city_directory.get_directory()
+        self.assertEqual([c.name for c in directory.autocomplete('bir')], ['Biratnagar'])
+        self.assertEqual([c.name for c in directory.autocomplete('thi')], ['Madhyapur Thimi'])
+        self.assertEqual([c.name for c in directory.autocomplete('pat')], ['Lalitpur'])
+
+    def test_classify_exact_alias_fuzzy_and_default(self):
+        directory = city_directory.get_directory()
+        self.assertEqual(directory.classify('KTM')['city'], 'Kathmandu')
+        self.assertEqual(directory.classify('KTM')['match_type'], 'alias')
+        # A typo or a prefix is not the city, only a suggestion
+        typo = directory.classify('pokahra')
+        self.assertEqual((typo['exists'], typo['city_id'], typo['match_type']), (False, None, 'default'))
+        self.assertEqual([entry.name for entry in typo['suggestions']], ['Pokhara'])
+        self.assertEqual([entry.name for entry in directory.classify('bira')['suggestions']], ['Biratnagar'])
+        self.assertFalse(directory.classify('bira')['exists'])
+        self.assertFalse(directory.classify('Birgunj')['exists'])  # inactive
+        unknown = directory.classify('Kirtipur')
+        self.assertFalse(unknown['exists'])
+        self.assertEqual(unknown['valley_status'], 'valley')
+
+    def test_reloads_from_table_stamp_without_shared_cache(self):
+        self.assertEqual(city_directory.get_directory().get('Pokhara').valley_status, 'out_valley')
+        # Changed by another process: its invalidate() never reaches this cache
+        City.objects.filter(name='Pokhara').update(valley_status='valley', updated_at=timezone.now())
+        self.assertEqual(city_directory.get_directory().get('Pokhara').valley_status, 'valley')
+
+    @shared_cache()
+    def test_lookup_endpoint_skips_database_when_warm(self):
+        self.client.force_login(self.user)
+        url = reverse('api_city_lookup') + '?q=lal'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            data = self.client.get(url).json()
+        self.assertEqual((data['suggestions'][0]['name'], data['suggestions'][0]['in_out']), ('Lalitpur', 'IN'))
+        self.assertFalse(data['match']['exists'])  # a prefix is only a suggestion
+
+    def test_city_change_invalidates_directory(self):
+        self.assertEqual(city_directory.get_directory().get('pokhara').valley_status, 'out_valley')
+        city = City.objects.get(name='Pokhara')
+        city.valley_status = 'valley'
+        city.save()
+        self.assertEqual(city_directory.get_directory().get('pokhara').valley_status, 'valley')
+
+    @shared_cache()
+    def test_ensure_city_writes_only_on_change(self):
+        city_directory.get_directory()
+        with self.assertNumQueries(0):
+            city_directory.ensure_city('kathmandu', 'valley')
+        city_directory.ensure_city('Dharan', 'out_valley')
+        self.assertTrue(City.objects.filter(name='Dharan', valley_status='out_valley').exists())
+
+
+class ActivityLogBatchingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='dispatcher', email='dispatcher@example.com', password='x', role='administrator'
+        )
+        cls.orders = [
+            Order.objects.create(
+                order_number=f'ACT-{i:03d}', customer_name='Customer', customer_phone='9800000000',
+                shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=100,
+            )
+            for i in range(20)
+        ]
+
+    def activity_inserts(self, queries):
+        return [q for q in queries if q['sql'].startswith('INSERT INTO "dashboard_orderactivitylog"')]
+
+    def test_bulk_dispatch_writes_logs_in_one_insert(self):
+        self.client.force_login(self.user)
+        order_ids = ','.join(o.order_number for o in self.orders)
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('dispatch_management'), {
+                'order_ids': order_ids, 'set_status': 'packed', 'logistics': 'ncm',
+            })
+
+        self.assertEqual(len(self.activity_inserts(ctx.captured_queries)), 1)
+        self.assertEqual(
+            OrderActivityLog.objects.filter(order__in=self.orders, action_type='status_changed').count(), 20
+        )
+
+    def test_logs_are_dropped_on_rollback(self):
+        order = self.orders[0]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic(), activity_log.collect():
+                    activity_log.log_order(order=order, action_type='updated', description='rolled back')
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertFalse(OrderActivityLog.objects.filter(description='rolled back').exists())
+
+    def test_outside_scope_writes_immediately(self):
+        entry = activity_log.log_order(order=self.orders[0], action_type='updated', description='direct')
+        self.assertIsNotNone(entry.pk)
+
+
+class SoftDeleteManagerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='trashadmin', email='trashadmin@example.com', password='x',
+            role='administrator', can_view_dispatch=True,
+        )
+        order_fields = dict(
+            customer_name='Customer', customer_phone='9800000000', shipping_address='Kathmandu',
+            order_from='website', payment_method='cod', total_amount=100,
+        )
+        cls.live = Order.objects.create(order_number='LIVE-001', **order_fields)
+        cls.trashed = Order.objects.create(order_number='TRASH-001', is_deleted=True, **order_fields)
+
+    def test_managers_split_live_and_trashed_rows(self):
+        self.assertEqual(list(Order.objects.values_list('order_number', flat=True)), ['LIVE-001'])
+        self.assertEqual(list(Order.trashed.values_list('order_number', flat=True)), ['TRASH-001'])
+        self.assertEqual(Order.all_objects.count(), 2)
+        # default manager keeps seeing trashed rows for admin, restore and unique checks
+        self.assertIs(Order._default_manager, Order.all_objects)
+
+    def test_dashboard_ignores_trashed_orders(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_orders'], 1)
+
+    def test_dispatch_skips_trashed_orders(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('dispatch_management'), {
+            'order_ids': 'TRASH-001', 'set_status': 'packed', 'logistics': 'ncm',
+        })
+        self.trashed.refresh_from_db()
+        self.assertEqual(self.trashed.order_status, 'processing')
+
+    def test_ncm_webhook_updates_trashed_orders(self):
+        Order.all_objects.filter(pk=self.trashed.pk).update(logistics='ncm', ncm_order_id=7001)
+        response = self.client.post(
+            reverse('ncm:webhook'), json.dumps({'event': 'status', 'status': 'Delivered', 'order_id': 7001}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.json()['updated_count'], 1)
+        self.trashed.refresh_from_db()
+        self.assertEqual(self.trashed.ncm_status, 'Delivered')
+
+
+class PurgeTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='purger', email='purger@example.com', password='x')
+        self.product = Product.objects.create(
+            user=self.user, name='Mug', slug='mug', description='Mug', price=100,
+        )
+        self.dispatch = Dispatch.objects.create(batch_number='DISPATCH-PURGE', logistics='ncm')
+
+    def make_trashed_order(self, number, days_ago=0):
+        order = Order.objects.create(
+            order_number=number, customer_name='Customer', customer_phone='9800000000',
+            shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=100,
+        )
+        item = OrderItem.objects.create(order=order, product=self.product, product_name='Mug', price=100)
+        DispatchItem.objects.create(dispatch=self.dispatch, scanned_order_id=number, order=order)
+        rma = ReturnRequest.objects.create(
+            order=order, customer_name='Customer', customer_phone='9800000000', return_reason='damaged',
+            return_image_1=ContentFile(b'img', name=f'{number}.jpg'),
+        )
+        ReturnItem.objects.create(
+            return_request=rma, order_item=item, product=self.product, product_name='Mug', price=100, total=100,
+        )
+        Order.all_objects.filter(pk=order.pk).update(
+            is_deleted=True, deleted_at=timezone.now() - timedelta(days=days_ago)
+        )
+        return order, rma.return_image_1.name
+
+    def test_purge_cascades_in_chunks_and_removes_media(self):
+        created = [self.make_trashed_order(f'PURGE-{i}') for i in range(3)]
+        image_names = [name for _, name in created]
+        self.assertTrue(all(default_storage.exists(name) for name in image_names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = purge.purge(Order.trashed.all(), chunk_size=2)
+
+        self.assertEqual(deleted, 3)
+        self.assertFalse(Order.all_objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(OrderActivityLog.objects.exists())
+        self.assertFalse(ReturnRequest.all_objects.exists())
+        self.assertFalse(ReturnItem.objects.exists())
+        # SET_NULL relations survive
+        self.assertEqual(DispatchItem.objects.filter(order__isnull=True).count(), 3)
+        self.assertTrue(Product.objects.filter(pk=self.product.pk).exists())
+        self.assertFalse(any(default_storage.exists(name) for name in image_names))
+
+    def test_retention_sweeper_only_purges_expired_items(self):
+        old, _ = self.make_trashed_order('PURGE-OLD', days_ago=45)
+        recent, _ = self.make_trashed_order('PURGE-NEW', days_ago=2)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('purge_trash', days=30, stdout=out)
+
+        self.assertFalse(Order.all_objects.filter(pk=old.pk).exists())
+        self.assertTrue(Order.trashed.filter(pk=recent.pk).exists())
+        self.assertIn('1 trashed item(s) older than 30 day(s) purged', out.getvalue())
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='photographer', email='photographer@example.com', password='x', role='administrator'
+        )
+
+    def make_upload(self, name='mug.png', size=(1600, 1200)):
+        buffer = BytesIO()
+        Image.effect_noise(size, 64).convert('RGB').save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue(), name=name)
+
+    def test_upload_generates_smaller_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                user=self.user, name='Mug', slug='mug', description='Mug', price=100, image=self.make_upload(),
+            )
+
+        name = product.image.name
+        for derivative in images.derivative_names(name):
+            self.assertTrue(default_storage.exists(derivative), derivative)
+        self.assertLess(
+            default_storage.size(images.derivative_name(name, 'thumb', 'webp')) * 20, default_storage.size(name)
+        )
+        with Image.open(default_storage.open(images.derivative_name(name, 'medium', 'jpg'))) as medium:
+            self.assertEqual(max(medium.size), images.SIZES['medium'])
+
+        self.assertTrue(product.image_variants.thumb_webp.endswith('__thumb.webp'))
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('api_search_products')).json()
+        self.assertEqual(data['products'][0]['image_thumb'], product.image_variants.thumb)
+        self.assertEqual(data['products'][0]['image'], product.image.url)
+
+    def test_derivatives_of_same_stem_do_not_collide(self):
+        self.assertEqual(images.derivative_name('products/mug.png', 'thumb', 'jpg'), 'products/mug.png__thumb.jpg')
+        self.assertFalse(set(images.derivative_names('products/mug.png')) & set(images.derivative_names('products/mug.jpg')))
+
+    def test_falls_back_to_original_until_generated(self):
+        product = Product.objects.create(
+            user=self.user, name='Cup', slug='cup', description='Cup', price=100, image=self.make_upload('cup.png'),
+        )
+        self.assertEqual(product.image_variants.thumb, product.image.url)
+
+        out = StringIO()
+        call_command('generate_image_derivatives', stdout=out)
+        cache.clear()
+
+        self.assertTrue(product.image_variants.thumb.endswith('__thumb.jpg'))
+        self.assertIn('4 derivative(s) written', out.getvalue())
+
+
+class StaticAssetTests(TestCase):
+
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        self.static_root = tempfile.mkdtemp()
+        for path in (source, self.static_root):
+            self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        self.css = b'.card { color: #333; padding: 4px; }\n' * 200
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as fh:
+            fh.write(self.css)
+
+        settings_override = override_settings(
+            STATIC_ROOT=self.static_root, STATICFILES_DIRS=[source], STATIC_SERVE=True, STATIC_MAX_AGE=60,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+
+    def test_collectstatic_fingerprints_and_precompresses(self):
+        url = staticfiles_storage.url('css/site.css')
+        self.assertRegex(url, r'/static/css/site\.[0-9a-f]{12}\.css$')
+        hashed_name = staticfiles_storage.stored_name('css/site.css')
+        self.assertTrue(staticfiles_storage.exists(hashed_name + '.gz'))
+        self.assertEqual(staticfiles_storage.exists(hashed_name + '.br'), static_assets.brotli is not None)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = b''.join(response.streaming_content)
+        self.assertLess(len(body), len(self.css) // 10)
+        self.assertEqual(gzip.decompress(body), self.css)
+
+    @override_settings(PERF_MONITORING_ENABLED=True, DEBUG=True)
+    def test_middleware_runs_natively_under_asgi(self):
+        # Adapting a middleware (logged under DEBUG) would run the async NCM views through async_to_sync
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    def test_plain_names_and_identity_encoding(self):
+        response = self.client.get('/static/css/site.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(b''.join(response.streaming_content), self.css)
+
+        response = self.client.get('/static/css/site.css', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+
+class ListRowFragmentCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='lister', email='lister@example.com', password='x', role='administrator'
+        )
+        cls.order = Order.objects.create(
+            order_number='ROW-1', customer_name='Customer', customer_phone='9800000000',
+            shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=100,
+            order_status='pending',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('orders_list') + '?date_range=all'
+
+    def row_status(self):
+        content = self.client.get(self.url).content.decode()
+        return re.search(r'class="order-status-(\w+)"', content).group(1)
+
+    def test_row_is_served_from_cache_until_updated_at_changes(self):
+        self.assertEqual(self.row_status(), 'pending')
+
+        # Same updated_at: the cached row is reused
+        Order.all_objects.filter(pk=self.order.pk).update(order_status='shipped', updated_at=self.order.updated_at)
+        self.assertEqual(self.row_status(), 'pending')
+
+        # Bulk update() bumps updated_at, so the row is rendered again
+        Order.objects.filter(pk=self.order.pk).update(order_status='delivered')
+        self.assertGreater(Order.objects.get(pk=self.order.pk).updated_at, self.order.updated_at)
+        self.assertEqual(self.row_status(), 'delivered')
+
+
+@shared_cache()
+class ConditionalApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cashier', email='cashier@example.com', password='x', role='administrator'
+        )
+        cls.product = Product.objects.create(
+            user=cls.user, name='Mug', slug='mug', description='Mug', price=100,
+        )
+        cls.customer = Customer.objects.create(name='Ram', phone='9800000001', city='Kathmandu', address='Baneshwor')
+        City.objects.create(name='Kathmandu', valley_status='valley')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertRevalidates(self, url, change, queries=1):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        # Only the stamp lookup: no payload queries, nothing serialised
+        with self.assertNumQueries(queries):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_product_revalidates_on_save(self):
+        def change():
+            self.product.price = 120
+            self.product.save()
+
+        response = self.assertRevalidates(reverse('api_get_product', args=[self.product.id]), change)
+        self.assertEqual(response.json()['product']['price'], '120.00')
+
+    def test_product_search_revalidates_on_bulk_update(self):
+        response = self.assertRevalidates(
+            reverse('api_search_products'), lambda: Product.objects.update(is_active=False)
+        )
+        self.assertEqual(response.json()['products'], [])
+
+    def test_customer_and_cities(self):
+        def change():
+            self.customer.city = 'Lalitpur'
+            self.customer.save()
+
+        self.assertRevalidates(reverse('api_get_customer', args=[self.customer.id]), change)
+
+        # The city directory's version stamp lives in the cache
+        self.assertRevalidates(reverse('api_get_cities'), city_directory.invalidate, queries=0)
+
+    def test_fast_json_encodes_decimals_and_datetimes(self):
+        moment = timezone.now()
+        response = conditional.FastJsonResponse({'price': Decimal('12.50'), 'at': moment, 'name': 'रू'})
+        data = json.loads(response.content)
+        self.assertEqual(data['price'], '12.50')
+        self.assertEqual(data['name'], 'रू')
+        self.assertEqual(data['at'], moment.isoformat())
+
+    def test_fast_json_int_keys_become_strings(self):
+        data = json.loads(conditional.dumps({1: {'price': Decimal('12.50')}, 'name': 'रू'}))
+        self.assertEqual(data, {'1': {'price': '12.50'}, 'name': 'रू'})
+
+
+class NcmTrackingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='tracker', email='tracker@example.com', password='x', role='administrator'
+        )
+        cls.orders = [
+            Order.objects.create(
+                order_number=f'NCM-{i}', customer_name='Customer', customer_phone='9800000000',
+                shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=100,
+                logistics='ncm', ncm_order_id=5000 + i, ncm_status='Pickup Order Created',
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def fake_status(self, ncm_order_id):
+        with self.lock:
+            self.calls.append(ncm_order_id)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+        return {'success': True, 'data': [{'status': 'Delivered'}, {'status': 'Dispatched'}]}
+
+    def test_batch_tracks_a_page_concurrently_and_caches(self):
+        url = reverse('ncm_track_orders_batch')
+        ids = [order.id for order in self.orders]
+        with mock.patch.object(ncm_tracking.ncm_service, 'get_order_status', side_effect=self.fake_status):
+            with self.captureOnCommitCallbacks(execute=True):
+                data = self.client.post(url, {'order_ids': ids}).json()
+            self.assertGreater(self.max_in_flight, 1)
+            self.assertEqual(len(self.calls), 4)
+
+            # Within NCM_TRACKING_CACHE_SECONDS nothing goes to NCM again
+            self.client.post(url, {'order_ids': ids})
+            self.assertEqual(len(self.calls), 4)
+
+        self.assertEqual(set(data['orders']), {str(i) for i in ids})
+        self.assertEqual({info['ncm_status'] for info in data['orders'].values()}, {'Delivered'})
+        self.assertTrue(all(info['changed'] for info in data['orders'].values()))
+        self.assertEqual(Order.objects.filter(ncm_status='Delivered').count(), 4)
+        self.assertEqual(OrderActivityLog.objects.filter(field_name='ncm_status').count(), 4)
+
+    def test_status_update_keeps_concurrent_edits(self):
+        orders = list(Order.objects.filter(logistics='ncm'))
+        # Edited while the NCM lookups were in flight
+        Order.objects.filter(pk=orders[0].pk).update(status='cancelled', shipping_address='Lalitpur')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            _record_ncm_statuses(orders, {order.ncm_order_id: 'Delivered' for order in orders}, self.user)
+
+        order = Order.objects.get(pk=orders[0].pk)
+        self.assertEqual((order.ncm_status, order.status, order.shipping_address), ('Delivered', 'cancelled', 'Lalitpur'))
+
+    def test_manual_sync_keeps_concurrent_edits(self):
+        order = Order.objects.get(pk=self.orders[1].pk)
+        Order.objects.filter(pk=order.pk).update(shipping_address='Lalitpur')
+
+        _store_synced_status(order, 'Delivered', self.user)
+
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual((order.ncm_status, order.shipping_address), ('Delivered', 'Lalitpur'))
+
+    def test_track_single_order(self):
+        order = self.orders[0]
+        with mock.patch.object(ncm_tracking.ncm_service, 'get_order_status', side_effect=self.fake_status):
+            response = self.client.get(reverse('ncm_track_order', args=[order.id]))
+
+        self.assertRedirects(response, reverse('ncm_order_detail', args=[order.id]), fetch_redirect_response=False)
+        order.refresh_from_db()
+        self.assertEqual(order.ncm_status, 'Delivered')
+
+
+class PriceChangeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='pricer', email='pricer@example.com', password='x', role='administrator'
+        )
+        cls.products = [
+            Product.objects.create(user=cls.user, name=f'Tee {n}', slug=f'tee-{n}', description='Tee', price=price)
+            for n, price in enumerate([Decimal('100.00'), Decimal('19.99'), Decimal('0.05')])
+        ]
+        cls.variation = ProductVariation.objects.create(product=cls.products[0], sku='TEE-0-L', price=Decimal('120.00'))
+
+    def prices(self):
+        return [Product.objects.get(pk=p.pk).price for p in self.products]
+
+    def test_update_is_set_based_and_rounded(self):
+        selection = Product.objects.filter(pk__in=[p.pk for p in self.products])
+        with CaptureQueriesContext(connection) as queries:
+            batch = pricing.apply(selection, 'increase_price', Decimal('12.5'), user=self.user)
+
+        # Batch row, INSERT ... SELECT, UPDATE, counts (+ savepoint) regardless of selection size
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual(self.prices(), [Decimal('112.50'), Decimal('22.49'), Decimal('0.06')])
+        self.assertEqual(batch.product_count, 3)
+        self.assertEqual(batch.variation_count, 0)
+        self.assertEqual(ProductVariation.objects.get(pk=self.variation.pk).price, Decimal('120.00'))
+        item = PriceChangeItem.objects.get(batch=batch, product=self.products[1])
+        self.assertEqual((item.old_price, item.new_price), (Decimal('19.99'), Decimal('22.49')))
+
+    def test_cascade_to_variations_and_rollback(self):
+        selection = Product.objects.filter(pk=self.products[0].pk)
+        batch = pricing.apply(selection, 'decrease_price', Decimal('10'), include_variations=True, user=self.user)
+        variation = ProductVariation.objects.get(pk=self.variation.pk)
+        self.assertEqual(variation.price, Decimal('108.00'))
+        self.assertGreater(variation.updated_at, self.variation.updated_at)
+        self.assertEqual(batch.variation_count, 1)
+
+        # A price edited after the batch is left alone by the rollback
+        ProductVariation.objects.filter(pk=self.variation.pk).update(price=Decimal('99.00'))
+        self.assertEqual(pricing.rollback(batch, user=self.user), 1)
+        self.assertEqual(self.prices()[0], Decimal('100.00'))
+        self.assertEqual(ProductVariation.objects.get(pk=self.variation.pk).price, Decimal('99.00'))
+        with self.assertRaises(ValueError):
+            pricing.rollback(batch)
+
+    def test_bulk_action_view_and_undo(self):
+        self.client.force_login(self.user)
+        ids = [p.pk for p in self.products]
+        self.client.post(reverse('products_bulk_action'), {
+            'product_ids': ids, 'bulk_action': 'increase_price', 'percentage': '10', 'include_variations': 'on',
+        })
+        self.assertEqual(self.prices()[0], Decimal('110.00'))
+        batch = PriceChangeBatch.objects.get()
+        self.assertContains(self.client.get(reverse('products')), reverse('price_change_rollback', args=[batch.pk]))
+
+        # Invalid percentages change nothing
+        for percentage in ('abc', '100', '-5'):
+            self.client.post(reverse('products_bulk_action'), {
+                'product_ids': ids, 'bulk_action': 'decrease_price', 'percentage': percentage,
+            })
+        self.assertEqual(PriceChangeBatch.objects.count(), 1)
+
+        self.client.post(reverse('price_change_rollback', args=[batch.pk]))
+        self.assertEqual(self.prices(), [Decimal('100.00'), Decimal('19.99'), Decimal('0.05')])
+        self.assertEqual(ProductVariation.objects.get(pk=self.variation.pk).price, Decimal('120.00'))
+
+
+class ProductListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='catalog', email='catalog@example.com', password='x', role='administrator'
+        )
+        cls.tees = Category.objects.create(name='Tees', slug='tees')
+        cls.products = Product.objects.bulk_create([
+            Product(user=cls.user, name=f'Item {n}', slug=f'item-{n}', description='', price=100,
+                    stock=[0, 5, 50][n % 3], is_active=n % 4 != 0, category=cls.tees if n % 2 else None)
+            for n in range(7)
+        ])
+        # Pairs share a timestamp so the id tiebreaker matters
+        created_at = timezone.now()
+        for n, product in enumerate(cls.products):
+            Product.all_objects.filter(pk=product.pk).update(created_at=created_at - timedelta(minutes=n // 2))
+        ProductVariation.objects.bulk_create([
+            ProductVariation(product=cls.products[0], sku=f'ITEM-0-{size}', price=100, stock=stock)
+            for size, stock in (('S', 3), ('M', 4))
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_keyset_pages_cover_every_row_once(self):
+        expected = list(Product.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        seen, params = [], {}
+        while True:
+            page = keyset.paginate(Product.objects.all(), params, per_page=3)
+            seen.extend(p.pk for p in page)
+            if not page.has_next:
+                break
+            params = {'after': page.next_cursor}
+        self.assertEqual(seen, expected)
+
+        # Walking back from the last page returns the same rows
+        back = keyset.paginate(Product.objects.all(), {'before': page.previous_cursor}, per_page=3)
+        self.assertEqual([p.pk for p in back], expected[3:6])
+        self.assertEqual(keyset.paginate(Product.objects.all(), {'after': 'garbage'}, 3).rows[0].pk, expected[0])
+
+    @shared_cache()
+    def test_facets_come_from_one_aggregate(self):
+        categories = catalog.categories()
+        with self.assertNumQueries(1):
+            facets = catalog.product_facets(categories)
+        self.assertEqual(facets['total'], 7)
+        self.assertEqual(facets['active'], 5)
+        self.assertEqual(facets['low_stock'], 2)
+        self.assertEqual(facets['out_of_stock'], 3)
+        self.assertEqual(facets['categories'], {self.tees.pk: 3})
+
+        # Cached until a category changes
+        with self.assertNumQueries(0):
+            catalog.categories()
+        Category.objects.create(name='Mugs', slug='mugs')
+        self.assertEqual(len(catalog.categories()), 2)
+
+    def test_view_query_count_does_not_grow_with_rows(self):
+        self.client.force_login(self.user)
+        url = reverse('products')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(url)
+        self.assertContains(response, '2 var. / 7 pcs')
+
+        Product.objects.bulk_create([
+            Product(user=self.user, name=f'Extra {n}', slug=f'extra-{n}', description='', price=10, category=self.tees)
+            for n in range(60)
+        ])
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(len(response.context['products']), 50)
+        self.assertEqual(response.context['product_total'], 67)
+        self.assertContains(response, 'after=')
+
+
+class VariationMatrixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='matrix', email='matrix@example.com', password='x', role='administrator'
+        )
+        cls.product = Product.objects.create(
+            user=cls.user, name='Hoodie', slug='hoodie', description='Hoodie', price=1000, product_type='variable',
+        )
+        for name, values in (
+            ('Color', 'Red, Blue, Green, Black, White'),
+            ('Size', 'XS, S, M, L, XL, XXL, 3XL, 4XL'),
+            ('Material', 'Cotton, Fleece, Wool, Linen, Silk, Denim'),
+        ):
+            ProductVariantOption.objects.create(product=cls.product, option_name=name, option_values=values)
+
+    def test_full_matrix_in_constant_queries(self):
+        rules = {'Size': {'XXL': {'price': Decimal('100')}, '4XL': {'stock': 2}}, 'Material': {'Silk': {'price': '250'}}}
+        with CaptureQueriesContext(connection) as queries:
+            result = variation_matrix.generate(self.product, Decimal('1000'), 10, rules)
+
+        self.assertEqual(result.created, 240)
+        # Lookups plus bulk INSERTs (SQLite splits those by its parameter limit), vs 240+ form posts
+        self.assertLessEqual(len(queries), 15)
+        variations = ProductVariation.objects.filter(product=self.product)
+        self.assertEqual(variations.count(), 240)
+        self.assertEqual(VariationAttributeValue.objects.filter(variation__product=self.product).count(), 720)
+
+        silk = variations.get(sku='HOODIE-RED-XXL-SILK')
+        self.assertEqual((silk.price, silk.stock, silk.variation_name), (Decimal('1350.00'), 10, 'Red / XXL / Silk'))
+        self.assertEqual(variations.get(sku='HOODIE-BLUE-4XL-COTTON').stock, 2)
+
+        # Re-running after adding a value only creates the new combinations
+        ProductVariantOption.objects.filter(product=self.product, option_name='Color').update(
+            option_values='Red, Blue, Green, Black, White, Navy'
+        )
+        self.assertEqual(variation_matrix.generate(self.product, Decimal('1000')).created, 48)
+
+    def test_sku_owned_by_another_product_aborts_the_batch(self):
+        other = Product.objects.create(user=self.user, name='Other', slug='other', description='', price=1)
+        ProductVariation.objects.create(product=other, sku='HOODIE-RED-M-WOOL', price=1)
+
+        with self.assertRaisesMessage(ValueError, 'HOODIE-RED-M-WOOL'):
+            variation_matrix.generate(self.product, Decimal('1000'))
+        self.assertFalse(ProductVariation.objects.filter(product=self.product).exists())
+
+    @override_settings(VARIATION_MATRIX_MAX=200)
+    def test_matrix_above_the_limit_is_refused(self):
+        with self.assertRaisesMessage(ValueError, '240 combinations is more than the limit of 200'):
+            variation_matrix.generate(self.product, Decimal('1000'))
+        self.assertFalse(ProductVariation.objects.filter(product=self.product).exists())
+
+        self.client.force_login(self.user)
+        self.assertContains(
+            self.client.get(reverse('product_variations', args=[self.product.pk])), 'Generate All (240 of max 200)'
+        )
+
+    def test_generate_from_variations_page(self):
+        self.client.force_login(self.user)
+        url = reverse('product_variations', args=[self.product.pk])
+        self.assertContains(self.client.get(url), 'Generate All (240)')
+
+        response = self.client.post(url, {
+            'action': 'generate_matrix', 'base_price': '900', 'base_stock': '3', 'price_0_1': '-100',
+        })
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(ProductVariation.objects.get(sku='HOODIE-BLUE-S-FLEECE').price, Decimal('800.00'))
+
+
+class StockImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='storekeeper', email='store@example.com', password='x', role='administrator'
+        )
+        cls.mug = Product.objects.create(
+            user=cls.user, name='Mug', slug='mug', description='', price=300, stock=0, stock_status='out_of_stock',
+            barcode='8900000000001',
+        )
+        cls.tee = Product.objects.create(
+            user=cls.user, name='Tee', slug='tee', description='', price=500, product_type='variable',
+        )
+        cls.tee_m = ProductVariation.objects.create(product=cls.tee, sku='TEE-M', price=500, stock=2)
+
+    def csv_file(self, *lines):
+        return SimpleUploadedFile('delivery.csv', '\n'.join(('SKU,Qty,Unit Cost,Notes',) + lines).encode())
+
+    def test_valid_file_is_applied_in_bulk(self):
+        upload = self.csv_file('mug,10,120.50,', '8900000000001,5,120.50,second box', 'TEE-M,7,210,', '', 'TEE-M,1,210,')
+        with CaptureQueriesContext(connection) as queries:
+            result = stock_import.import_file(upload, self.user, supplier_name='Acme')
+
+        self.assertEqual((result.rows, result.accepted, result.rejected), (4, 4, []))
+        self.assertLessEqual(len(queries), 12)
+        self.assertEqual(result.stock_in.total_quantity, 23)
+        self.assertEqual(StockIn.objects.get().total_cost, Decimal('3487.50'))
+        self.assertEqual(StockInItem.objects.filter(stock_in=result.stock_in).count(), 4)
+
+        mug = Product.objects.get(pk=self.mug.pk)
+        self.assertEqual((mug.stock, mug.stock_status), (15, 'in_stock'))
+        self.assertEqual(ProductVariation.objects.get(pk=self.tee_m.pk).stock, 10)
+
+    def test_rejected_lines_cancel_the_import_unless_skipped(self):
+        lines = ('mug,4,100,', 'NOPE,1,1,', 'TEE-M,0,1,', 'TEE-M,abc,1,', 'TEE-M,1.5,1,')
+        result = stock_import.import_file(self.csv_file(*lines), self.user)
+        self.assertIsNone(result.stock_in)
+        self.assertEqual([line for line, _, _ in result.rejected], [3, 4, 5, 6])
+        self.assertEqual(Product.objects.get(pk=self.mug.pk).stock, 0)
+
+        result = stock_import.import_file(self.csv_file(*lines), self.user, skip_invalid=True)
+        self.assertEqual(result.accepted, 1)
+        self.assertEqual(Product.objects.get(pk=self.mug.pk).stock, 4)
+
+    def test_xlsx_upload_through_view(self):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Barcode', 'Quantity', 'Cost'])
+        sheet.append(['TEE-M', 3, 199.99])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('stock_in_import'), {
+            'stock_in_type': 'purchase',
+            'file': SimpleUploadedFile('delivery.xlsx', buffer.getvalue()),
+        })
+        self.assertContains(response, 'rows/sec')
+        self.assertEqual(ProductVariation.objects.get(pk=self.tee_m.pk).stock, 5)
+        self.assertEqual(StockInItem.objects.get().unit_cost, Decimal('199.99'))
+
+    def test_corrupt_xlsx_is_reported_not_a_server_error(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('stock_in_import'), {
+            'stock_in_type': 'purchase',
+            'file': SimpleUploadedFile('delivery.xlsx', b'SKU,Qty\nmug,1\n'),
+        }, follow=True)
+        self.assertContains(response, 'Not a valid XLSX file')
+        self.assertFalse(StockIn.objects.exists())
+
+
+class CatalogSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='merchandiser', email='merch@example.com', password='x', role='administrator'
+        )
+        cls.mugs = Category.objects.create(name='Mugs', slug='mugs')
+        cls.products = [
+            Product.objects.create(
+                user=cls.user, name=f'Mug {i}', slug=f'mug-{i}', description='Stoneware', price=300 + i, stock=i,
+                category=cls.mugs, barcode=f'89000000000{i:02d}',
+            )
+            for i in range(10)
+        ]
+        cls.tee = Product.objects.create(
+            user=cls.user, name='Tee', slug='Tee', description='', price=500, product_type='variable',
+        )
+        cls.tee_m = ProductVariation.objects.create(product=cls.tee, sku='TEE-M', variation_name='M', price=500, stock=2)
+
+    def export_file(self, kind='csv'):
+        header, rows = catalog_sync.export_rows()
+        writer = tabular.write_csv if kind == 'csv' else tabular.write_jsonl
+        return SimpleUploadedFile(f'catalogue.{kind}', ''.join(writer(header, rows)).encode())
+
+    def test_reimporting_an_export_writes_nothing(self):
+        for kind in ('csv', 'jsonl'):
+            upload = self.export_file(kind)
+            with CaptureQueriesContext(connection) as queries:
+                result = catalog_sync.import_file(upload, self.user)
+            self.assertEqual((result.rows, result.unchanged, result.updated, result.created), (12, 12, 0, 0))
+            self.assertEqual(result.rejected, [])
+            self.assertFalse([q for q in queries if q['sql'].startswith(('UPDATE', 'INSERT'))])
+
+    def test_changed_rows_are_updated_in_bulk(self):
+        text = self.export_file().read().decode('utf-8-sig')
+        text = text.replace('Mug 3,,Mugs,303.00', 'Mug 3,,Mugs,399.00').replace('TEE-M,Tee,,M,,500.00', 'TEE-M,Tee,,M,,550.00')
+        with CaptureQueriesContext(connection) as queries:
+            result = catalog_sync.import_file(SimpleUploadedFile('catalogue.csv', text.encode()), self.user)
+
+        self.assertEqual((result.updated, result.unchanged), (2, 10))
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(Product.objects.get(pk=self.products[3].pk).price, Decimal('399.00'))
+        self.assertEqual(Product.objects.get(pk=self.products[4].pk).price, Decimal('304.00'))
+        self.assertEqual(ProductVariation.objects.get(pk=self.tee_m.pk).price, Decimal('550.00'))
+
+    def test_stock_is_only_overwritten_with_set_stock(self):
+        upload = self.export_file()
+        # Sold after the export was taken
+        Product.objects.filter(pk=self.products[5].pk).update(stock=1)
+        ProductVariation.objects.filter(pk=self.tee_m.pk).update(stock=0)
+
+        result = catalog_sync.import_file(upload, self.user)
+        self.assertEqual((result.updated, result.unchanged), (0, 12))
+        self.assertEqual(Product.objects.get(pk=self.products[5].pk).stock, 1)
+        self.assertEqual(ProductVariation.objects.get(pk=self.tee_m.pk).stock, 0)
+
+        upload.seek(0)
+        result = catalog_sync.import_file(upload, self.user, set_stock=True)
+        self.assertEqual((result.updated, result.unchanged), (2, 10))
+        self.assertEqual(Product.objects.get(pk=self.products[5].pk).stock, 5)
+        self.assertEqual(ProductVariation.objects.get(pk=self.tee_m.pk).stock, 2)
+
+    def test_partial_file_creates_and_matches_by_barcode(self):
+        upload = SimpleUploadedFile('prices.csv', b'\n'.join([
+            b'sku,parent_sku,name,category,price,barcode',
+            b'renamed,,,,350,8900000000001',          # existing product, matched by barcode
+            b'Travel Mug,,Travel Mug,Drinkware,899,', # new product and category
+            b'TEE-L,Tee,,,,',                         # new variation, parent's price
+            b'ghost,,,,10,',                          # new product without a name
+        ]))
+        result = catalog_sync.import_file(upload, self.user, chunk_size=2)
+
+        self.assertEqual((result.created, result.updated), (2, 1))
+        self.assertEqual([(line, reason) for line, _, reason in result.rejected],
+                         [(5, 'New product needs sku, name and price')])
+        mug = Product.objects.get(pk=self.products[1].pk)
+        self.assertEqual((mug.slug, mug.price, mug.name), ('mug-1', Decimal('350.00'), 'Mug 1'))
+        travel = Product.objects.get(slug='travel-mug')
+        self.assertEqual((travel.category.name, travel.user), ('Drinkware', self.user))
+        self.assertEqual(ProductVariation.objects.get(sku='TEE-L').price, Decimal('500.00'))
+
+    def test_export_and_import_views(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('catalog_export'), {'format': 'xlsx'})
+        upload = SimpleUploadedFile('catalogue.xlsx', b''.join(response.streaming_content))
+
+        response = self.client.post(reverse('catalog_import'), {'file': upload})
+        self.assertContains(response, '12 unchanged')
+
+
+class CustomerImportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='frontdesk', email='desk@example.com', password='x')
+        cls.sita = Customer.objects.create(
+            name='Sita', phone='+977-9841000001', city='Kathmandu', address='Baneshwor', notes='Prefers COD',
+        )
+        cls.ram = Customer.objects.create(name='Ram', phone='9841000002', city='Pokhara', address='Lakeside')
+
+    def csv_file(self, *lines):
+        return SimpleUploadedFile('contacts.csv', '\n'.join(('Name,Phone,City,Email,Notes',) + lines).encode())
+
+    def test_normalize_phone(self):
+        self.assertEqual(customer_import.normalize_phone('+977 984-1000001'), '9841000001')
+        self.assertEqual(customer_import.normalize_phone('00977 9841000001'), '9841000001')
+        self.assertEqual(customer_import.normalize_phone('+977-1-4412345'), '014412345')
+        self.assertEqual(customer_import.normalize_phone('n/a'), '')
+
+    def test_dedup_within_file_and_against_existing(self):
+        upload = self.csv_file(
+            'Sita Devi,9841000001,,sita@example.com,VIP since 2020',  # existing, stored as +977-…
+            'Hari,984 100 0003,Biratnagar,,',                        # new
+            'Hari K.,+9779841000003,,hari@example.com,',              # same as the row above
+            'Ram,9841000002,Pokhara,,',                              # nothing new
+            'Nobody,12,Butwal,,',                                    # not a phone
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = customer_import.import_file(upload, chunk_size=2)
+
+        self.assertEqual(
+            (result.rows, result.created, result.updated, result.unchanged, result.duplicates, result.rejected_count),
+            (5, 1, 2, 1, 1, 1),  # the duplicate Hari row is in the next chunk and adds an email
+        )
+        self.assertLessEqual(len(queries), 12)
+        sita = Customer.objects.get(pk=self.sita.pk)
+        self.assertEqual((sita.name, sita.email, sita.phone), ('Sita', 'sita@example.com', '+977-9841000001'))
+        self.assertEqual(sita.notes, 'Prefers COD\nVIP since 2020')
+        hari = Customer.objects.get(phone='9841000003')
+        self.assertEqual((hari.name, hari.email, hari.city), ('Hari', 'hari@example.com', 'Biratnagar'))
+
+        # Importing the same file again changes nothing
+        result = customer_import.import_file(upload)
+        self.assertEqual((result.created, result.updated), (0, 0))
+
+    def test_matches_phones_stored_with_separators(self):
+        dashed = Customer.objects.create(name='Maya', phone='984-1000005', city='Dharan', address='')
+        spaced = Customer.objects.create(name='Bina', phone='+977 (1) 441.2345', city='Patan', address='')
+        upload = self.csv_file('Maya,9841000005,,maya@example.com,', 'Bina,01-4412345,,bina@example.com,')
+
+        result = customer_import.import_file(upload)
+
+        self.assertEqual((result.created, result.updated), (0, 2))
+        self.assertEqual(Customer.objects.get(pk=dashed.pk).email, 'maya@example.com')
+        self.assertEqual(Customer.objects.get(pk=spaced.pk).email, 'bina@example.com')
+
+    def test_rules_and_dry_run(self):
+        upload = self.csv_file('Sita Sharma,9841000001,Lalitpur,,')
+        result = customer_import.import_file(upload, rules={'name': 'overwrite', 'city': 'keep'}, dry_run=True)
+        self.assertEqual(result.changes, [(2, '9841000001', 'update', ['name'])])
+        self.assertEqual(Customer.objects.get(pk=self.sita.pk).name, 'Sita')
+
+        customer_import.import_file(upload, rules={'name': 'overwrite', 'city': 'keep'})
+        sita = Customer.objects.get(pk=self.sita.pk)
+        self.assertEqual((sita.name, sita.city), ('Sita Sharma', 'Kathmandu'))
+
+        with self.assertRaises(ValueError):
+            customer_import.import_file(upload, rules={'name': 'replace'})
+
+    def test_xlsx_dry_run_through_view(self):
+        workbook = Workbook()
+        workbook.active.append(['Customer Name', 'Mobile', 'District'])
+        workbook.active.append(['Gita', 9851000004, 'Dharan'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('customer_import'), {
+            'file': SimpleUploadedFile('contacts.xlsx', buffer.getvalue()), 'dry_run': 'on',
+        })
+        self.assertContains(response, 'Dry Run Report')
+        self.assertContains(response, '1 created')
+        self.assertFalse(Customer.objects.filter(phone='9851000004').exists())
+
+
+class ReturnsAnalyticsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='returnsdesk', email='returns@example.com', password='x', role='administrator'
+        )
+        cls.mug = Product.objects.create(user=cls.user, name='Mug', slug='mug', description='', price=100)
+        cls.tee = Product.objects.create(user=cls.user, name='Tee', slug='tee', description='', price=500)
+        order = Order.objects.create(
+            order_number='RET-001', customer_name='Customer', customer_phone='9800000000',
+            shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=1000,
+        )
+        cls.mug_line = OrderItem.objects.create(order=order, product=cls.mug, product_name='Mug', price=100, quantity=8)
+        cls.tee_line = OrderItem.objects.create(order=order, product=cls.tee, product_name='Tee', price=500, quantity=4)
+        for reason, status, refund, lines in [
+            ('defective', 'refunded', 200, [(cls.mug_line, 2)]),
+            ('defective', 'pending', 0, [(cls.mug_line, 1), (cls.tee_line, 1)]),
+            ('size_issue', 'approved', 0, [(cls.tee_line, 2)]),
+        ]:
+            rma = ReturnRequest.objects.create(
+                order=order, customer_name='Customer', customer_phone='9800000000', return_reason=reason,
+                return_status=status, refund_amount=refund,
+            )
+            for line, quantity in lines:
+                ReturnItem.objects.create(
+                    return_request=rma, order_item=line, product=line.product, product_name=line.product_name,
+                    price=line.price, total=line.price * quantity, return_quantity=quantity,
+                )
+        ReturnRequest.objects.filter(return_reason='size_issue').get().soft_delete(cls.user)
+        ReturnRequest.objects.create(
+            order=order, customer_name='Customer', customer_phone='9800000000', return_reason='other',
+            return_status='pending',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_summary_in_four_cached_queries(self):
+        with self.assertNumQueries(4):
+            stats = returns_analytics.summary('last_7_days')
+        with self.assertNumQueries(0):
+            self.assertEqual(returns_analytics.summary('last_7_days'), stats)
+
+        self.assertEqual((stats['total'], stats['trash_count']), (3, 1))
+        self.assertEqual((stats['counts']['pending'], stats['counts']['refunded']), (2, 1))
+        self.assertEqual(stats['refund_total'], Decimal('200.00'))
+
+        defective = stats['reasons'][0]
+        self.assertEqual((defective['return_reason'], defective['count'], defective['units']), ('defective', 2, 4))
+        self.assertEqual(defective['statuses'], {'refunded': 1, 'pending': 1})
+        self.assertEqual(
+            [(p['name'], p['returned'], p['sold'], p['rate']) for p in stats['products']],
+            [('Mug', 3, 8, 37.5), ('Tee', 1, 4, 25.0)],
+        )
+
+    def test_return_changes_invalidate_the_cache(self):
+        returns_analytics.summary()
+        rma = ReturnRequest.objects.filter(return_status='pending').first()
+        rma.return_status = 'approved'
+        rma.save()
+        self.assertEqual(returns_analytics.summary()['counts']['approved'], 1)
+
+        ReturnRequest.objects.filter(pk=rma.pk).update(return_status='rejected')
+        self.assertEqual(returns_analytics.summary()['counts']['rejected'], 0)  # update() sends no signal
+        returns_analytics.invalidate()
+        self.assertEqual(returns_analytics.summary()['counts']['rejected'], 1)
+
+    @shared_cache()
+    def test_dashboard_view(self):
+        self.client.force_login(self.user)
+        with self.assertNumQueries(6):  # user, 4 for the analytics, recent returns
+            response = self.client.get(reverse('returns_dashboard'), {'date_range': 'this_month'})
+        self.assertContains(response, 'Reasons by Status')
+        self.assertContains(response, '37.5%')
+        with self.assertNumQueries(1):  # user and analytics come from the cache
+            self.client.get(reverse('returns_dashboard'), {'date_range': 'this_month'})
+
+
+class ReturnWorkflowTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='returnsbatch', email='batch@example.com', password='x', role='administrator'
+        )
+        cls.mug = Product.objects.create(user=cls.user, name='Mug', slug='mug', description='', price=100)
+        cls.tee = Product.objects.create(user=cls.user, name='Tee', slug='tee', description='', price=500)
+        cls.tee_m = ProductVariation.objects.create(product=cls.tee, sku='TEE-M', price=500, stock=2)
+        order = Order.objects.create(
+            order_number='BATCH-001', customer_name='Customer', customer_phone='9800000000',
+            shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount=1000,
+        )
+        mug_line = OrderItem.objects.create(order=order, product=cls.mug, product_name='Mug', price=100, quantity=8)
+        tee_line = OrderItem.objects.create(
+            order=order, product=cls.tee, product_variation=cls.tee_m, product_name='Tee', price=500, quantity=2,
+        )
+        cls.rmas = []
+        for status, fee, lines in [
+            ('received', 50, [(mug_line, 2), (tee_line, 1)]),
+            ('inspecting', 0, [(mug_line, 3)]),
+            ('pending', 0, [(mug_line, 1)]),
+            ('received', 0, [(mug_line, 1)]),
+        ]:
+            rma = ReturnRequest.objects.create(
+                order=order, customer_name='Customer', customer_phone='9800000000', return_reason='defective',
+                return_status=status, restocking_fee=fee,
+                total_amount=sum(line.price * quantity for line, quantity in lines),
+            )
+            for line, quantity in lines:
+                ReturnItem.objects.create(
+                    return_request=rma, order_item=line, product=line.product, product_variation=line.product_variation,
+                    product_name=line.product_name, price=line.price, total=line.price * quantity,
+                    return_quantity=quantity,
+                )
+            cls.rmas.append(rma)
+        cls.rmas[3].soft_delete(cls.user)
+
+    def test_refund_restocks_per_sku_once(self):
+        numbers = [rma.rma_number for rma in self.rmas] + ['RMA-00000000-0000']
+        with self.captureOnCommitCallbacks(execute=True):
+            result = return_workflow.apply('refund', self.user, rma_numbers=numbers)
+
+        self.assertEqual((result.processed, result.skipped, result.not_found), (2, 1, 2))
+        self.assertEqual([outcome for _, outcome, _ in result.outcomes], ['done', 'done', 'skipped', 'not_found',
+                                                                         'not_found'])
+        self.assertEqual(result.restocked_units, 6)
+        self.mug.refresh_from_db()
+        self.tee_m.refresh_from_db()
+        self.assertEqual((self.mug.stock, self.tee_m.stock), (5, 3))
+        first = ReturnRequest.objects.get(pk=self.rmas[0].pk)
+        self.assertEqual((first.return_status, first.refund_amount), ('refunded', Decimal('650.00')))
+        self.assertFalse(ReturnItem.objects.filter(return_request__in=self.rmas[:2], restocked=False).exists())
+        self.assertEqual(ReturnActivityLog.objects.filter(action_type='refunded', old_value='received').count(), 1)
+        self.assertEqual(ReturnActivityLog.objects.filter(action_type='refunded').count(), 2)
+
+        # Already refunded: skipped, nothing restocked twice
+        result = return_workflow.apply('restock', self.user, ids=[self.rmas[0].pk])
+        self.assertEqual((result.processed, result.skipped), (0, 1))
+        self.mug.refresh_from_db()
+        self.assertEqual(self.mug.stock, 5)
+
+        with self.assertRaises(ValueError):
+            return_workflow.apply('ship', self.user, ids=[self.rmas[0].pk])
+
+    def test_restock_reaches_trashed_products(self):
+        Product.objects.filter(pk=self.mug.pk).update(is_deleted=True, deleted_at=timezone.now())
+        result = return_workflow.apply('restock', self.user, ids=[self.rmas[1].pk])
+
+        self.assertEqual((result.processed, result.restocked_units), (1, 3))
+        self.assertEqual(Product.all_objects.get(pk=self.mug.pk).stock, 3)
+
+    def test_batch_view(self):
+        self.client.force_login(self.user)
+        pending = self.rmas[2]
+        response = self.client.post(reverse('returns_batch'), {
+            'action': 'approve', 'references': f'{pending.rma_number.lower()}, {self.rmas[0].rma_number}',
+        })
+        self.assertContains(response, 'Approved')
+        self.assertContains(response, 'Skipped')
+        pending.refresh_from_db()
+        self.assertEqual((pending.return_status, pending.approved_by), ('approved', self.user))
+
+
+class OrderLookupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='scanner', email='scanner@example.com', password='x', role='administrator'
+        )
+        product = Product.objects.create(user=cls.user, name='Mug', slug='mug', description='', price=100,
+                                         barcode='8800001')
+        orders = {}
+        for number, status, barcode, tracking in [
+            ('ORD-1001', 'delivered', 'BC-1001', 'NCM-555'),
+            ('ORD-1002', 'shipped', None, None),
+            ('ORD-1003', 'delivered', None, None),
+        ]:
+            orders[number] = Order.objects.create(
+                order_number=number, order_status=status, barcode=barcode, tracking_number=tracking,
+                customer_name='Customer', customer_phone='9800000000', shipping_address='Kathmandu',
+                order_from='website', payment_method='cod', total_amount=200,
+            )
+            OrderItem.objects.create(order=orders[number], product=product, product_name='Mug', price=100, quantity=2)
+        orders['ORD-1003'].is_deleted = True
+        orders['ORD-1003'].save()
+        cls.order = orders['ORD-1001']
+
+    def setUp(self):
+        order_lookup.clear()
+
+    def scan(self, code):
+        return self.client.get(reverse('api_get_order_by_barcode'), {'barcode': code}).json()
+
+    def test_find_by_any_code_in_one_query(self):
+        for code in ('ord-1001', ' BC-1001 ', 'ncm-555'):
+            with self.assertNumQueries(1):
+                match = order_lookup.find(code)
+            self.assertEqual((match.id, match.order_status, match.is_deleted), (self.order.pk, 'delivered', False))
+        self.assertTrue(order_lookup.find('ORD-1003').is_deleted)
+        self.assertIsNone(order_lookup.find('ORD-9999'))
+
+    @shared_cache()
+    def test_scan_endpoint(self):
+        self.client.force_login(self.user)
+        self.assertIn('in trash', self.scan('ORD-1003')['error'])
+        self.assertIn('not delivered', self.scan('ord-1002')['error'])
+        self.assertIn('not found', self.scan('ORD-9999')['error'])
+
+        with self.assertNumQueries(2):  # find + items (user cached)
+            data = self.scan('bc-1001')
+        self.assertEqual(data['order']['order_number'], 'ORD-1001')
+        self.assertEqual(data['order']['items'][0]['product_barcode'], '8800001')
+        with self.assertNumQueries(1):  # repeat scan: items from the LRU
+            self.assertEqual(self.scan('ORD-1001'), data)
+
+        OrderItem.objects.filter(order=self.order).update(quantity=1)
+        self.order.save()  # saving the order refreshes its cached items
+        self.assertEqual(self.scan('ORD-1001')['order']['items'][0]['quantity'], 1)
+
+
+class SalesFactsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='salesdesk', email='sales@example.com', password='x', role='administrator'
+        )
+        mugs = Category.objects.create(name='Mugs', slug='mugs')
+        cls.mug = Product.objects.create(user=cls.user, name='Mug', slug='mug', description='', price=100,
+                                         category=mugs)
+        cls.tee = Product.objects.create(user=cls.user, name='Tee', slug='tee', description='', price=500)
+        cls.tee_m = ProductVariation.objects.create(product=cls.tee, sku='TEE-M', price=500)
+        cls.orders = []
+        for number, order_from, city, status, lines in [
+            ('SF-1', 'website', 'Kathmandu', 'delivered', [(cls.mug, None, 2), (cls.tee, cls.tee_m, 1)]),
+            ('SF-2', 'facebook', 'Pokhara', 'processing', [(cls.mug, None, 3)]),
+            ('SF-3', 'website', 'Kathmandu', 'cancelled', [(cls.mug, None, 5)]),
+        ]:
+            order = Order.objects.create(
+                order_number=number, order_from=order_from, branch_city=city, order_status=status,
+                created_by=cls.user, customer_name='Customer', customer_phone='9800000000',
+                shipping_address=city, payment_method='cod', total_amount=1000,
+            )
+            for product, variation, quantity in lines:
+                OrderItem.objects.create(order=order, product=product, product_variation=variation,
+                                         product_name=product.name, price=product.price, quantity=quantity)
+            cls.orders.append(order)
+        sales_facts.rebuild()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_order_changes_refresh_facts_on_commit(self):
+        order = self.orders[1]
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            order.order_status = 'shipped'
+            order.save()
+            line = OrderItem.objects.create(order=order, product=self.tee, product_variation=self.tee_m,
+                                            product_name='Tee', price=500, quantity=1)
+        self.assertEqual(len(callbacks), 2)
+        facts = SalesFact.objects.filter(order=order)
+        self.assertEqual(sorted(facts.values_list('order_status', 'quantity', 'revenue')),
+                         [('shipped', 1, Decimal('500.00')), ('shipped', 3, Decimal('300.00'))])
+        fact = facts.get(order_item=line)
+        self.assertEqual((fact.variation, fact.week.weekday(), fact.month.day), (self.tee_m, 0, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+            # update() sends no post_save
+            Order.objects.filter(pk=order.pk).update(is_deleted=True)
+            sales_facts.schedule(order.pk)
+        self.assertFalse(SalesFact.objects.filter(order=order).exists())
+
+    def test_report_groups_filters_and_caches(self):
+        with self.assertNumQueries(4):  # totals, grouped rows, product and category labels
+            report = sales_facts.report(['channel', 'product', 'category'])
+        self.assertEqual(report['totals']['lines'], 3)  # cancelled order left out
+        self.assertEqual(report['totals']['revenue'], Decimal('1000.00'))
+        self.assertEqual(
+            [(row['channel'], row['product_label'], row['category_label'], row['units']) for row in report['rows']],
+            [('website', 'Tee', '', 1), ('facebook', 'Mug', 'Mugs', 3), ('website', 'Mug', 'Mugs', 2)],
+        )
+        with self.assertNumQueries(0):
+            sales_facts.report(['channel', 'product', 'category'])
+
+        today = timezone.localdate()
+        rows = sales_facts.report(['day', 'city'], date_from=today, date_to=today, status='cancelled')['rows']
+        self.assertEqual([(row['day'], row['city'], row['units'], row['orders']) for row in rows],
+                         [(today, 'Kathmandu', 5, 1)])
+        self.assertEqual(sales_facts.report(date_to=today - timedelta(days=1))['rows'], [])
+        with self.assertRaises(ValueError):
+            sales_facts.report(['colour'])
+
+        # Rebuilding reproduces the incremental facts and drops the cached reports
+        expected = sorted(SalesFact.objects.values_list('order_item_id', 'day', 'order_status', 'revenue'))
+        result = sales_facts.rebuild()
+        self.assertEqual((result.orders, result.rows), (3, 4))
+        self.assertEqual(sorted(SalesFact.objects.values_list('order_item_id', 'day', 'order_status', 'revenue')),
+                         expected)
+        with self.assertNumQueries(4):
+            sales_facts.report(['channel', 'product', 'category'])
+
+    def test_report_views(self):
+        self.client.force_login(self.user)
+        data = self.client.get(reverse('api_sales_report'), {'group_by': 'staff,in_out', 'channel': 'website'}).json()
+        self.assertEqual(data['rows'], [{
+            'staff': self.user.pk, 'in_out': 'in', 'units': 3, 'revenue': '700.00', 'orders': 1, 'lines': 2,
+            'staff_label': 'salesdesk',
+        }])
+        response = self.client.get(reverse('api_sales_report'), {'group_by': 'colour'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('sales_report'), {'group_by': ['product', 'variation']})
+        self.assertContains(response, 'TEE-M')
+        self.assertContains(response, 'रू 1,000.00')
+        self.assertContains(self.client.get(reverse('sales_report')), 'Sales Reports')
+
+
+class AnalyticsExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='analyst', email='analyst@example.com', password='x', role='administrator'
+        )
+        mug = Product.objects.create(user=cls.user, name='Mug', slug='mug', description='', price=100)
+        cls.orders = {}
+        for number, created, trashed in [
+            ('AX-AUG', '2026-08-10', False), ('AX-OCT', '2026-10-05', False), ('AX-OCT-2', '2026-10-06', True),
+        ]:
+            order = Order.objects.create(
+                order_number=number, customer_name='Customer', customer_phone='9800000000',
+                shipping_address='Kathmandu', order_from='website', payment_method='cod', total_amount='250.50',
+            )
+            OrderItem.objects.create(order=order, product=mug, product_name='Mug', price=Decimal('125.25'),
+                                     quantity=2)
+            # Base manager: no updated_at bump
+            stamp = timezone.make_aware(datetime.fromisoformat(f'{created}T12:00'))
+            Order._base_manager.filter(pk=order.pk).update(created_at=stamp, updated_at=stamp, is_deleted=trashed)
+            cls.orders[number] = order
+        stock_in = StockIn.objects.create(stock_in_type='purchase', supplier_name='Potter', created_by=cls.user)
+        StockInItem.objects.create(stock_in=stock_in, product=mug, quantity=5, unit_cost=60, total_cost=300)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def read(self, dataset):
+        rows = analytics_export.pq.read_table(os.path.join(self.directory, dataset)).to_pylist()
+        return sorted(rows, key=lambda row: row['id'])
+
+    def test_full_export_is_partitioned_by_month(self):
+        result = analytics_export.export(self.directory, datasets=['orders', 'order_items', 'stock_movements'])
+        self.assertEqual({name: entry['rows'] for name, entry in result.datasets.items()},
+                         {'orders': 3, 'order_items': 3, 'stock_movements': 1})
+        self.assertEqual(sorted(os.listdir(os.path.join(self.directory, 'orders'))), ['month=2026-08', 'month=2026-10'])
+
+        orders = self.read('orders')
+        self.assertEqual([(o['order_number'], str(o['month']), o['is_deleted']) for o in orders],
+                         [('AX-AUG', '2026-08', False), ('AX-OCT', '2026-10', False), ('AX-OCT-2', '2026-10', True)])
+        self.assertEqual(orders[0]['total_amount'], Decimal('250.50'))
+        self.assertEqual(orders[0]['created_at'], Order.all_objects.get(order_number='AX-AUG').created_at)
+        self.assertEqual(self.read('order_items')[0]['total'], Decimal('250.50'))
+        movement = self.read('stock_movements')[0]
+        self.assertEqual((movement['supplier_name'], movement['quantity']), ('Potter', 5))
+        self.assertTrue(movement['reference_number'])
+
+        with self.assertRaises(ValueError):
+            analytics_export.export(self.directory, datasets=['customers'])
+
+    def test_incremental_export_rewrites_changed_months(self):
+        datasets = ['orders', 'order_items']
+        analytics_export.export(self.directory, datasets=datasets)
+        self.assertEqual(analytics_export.export(self.directory, datasets=datasets).rows, 0)
+
+        order = self.orders['AX-OCT']
+        order.order_status = 'delivered'
+        order.save()
+        result = analytics_export.export(self.directory, datasets=datasets)
+        self.assertEqual({name: (entry['months'], entry['rows']) for name, entry in result.datasets.items()},
+                         {'orders': (1, 2), 'order_items': (1, 2)})
+        self.assertEqual([o['order_status'] for o in self.read('orders')], ['processing', 'delivered', 'processing'])
+
+        # Purged orders only leave the files with a full export
+        Order.all_objects.filter(order_number='AX-AUG').delete()
+        self.assertEqual(len(self.read('orders')), 3)
+        analytics_export.export(self.directory, datasets=datasets, full=True)
+        self.assertEqual([o['order_number'] for o in self.read('orders')], ['AX-OCT', 'AX-OCT-2'])
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'order_items')), ['month=2026-10'])
+
+
+class CacheVersionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_and_eviction_give_new_stamps(self):
+        key = 'tests:cache_versions'
+        first = cache_versions.version(key)
+        self.assertEqual(cache_versions.version(key), first)
+
+        cache_versions.bump(key)
+        bumped = cache_versions.version(key)
+        self.assertNotEqual(bumped, first)
+
+        # Evicted: a fresh stamp, never one an older entry could carry
+        cache.delete(key)
+        self.assertNotIn(cache_versions.version(key), (first, bumped))
+        cache.delete(key)
+        cache_versions.bump(key)
+        self.assertGreater(cache_versions.version(key), bumped)
@@ -15,6 +15,9 @@ urlpatterns = [
     path('products/trash/bulk-action/', views.products_trash_bulk_action, name='products_trash_bulk_action'),
     path('products/trash/empty/', views.empty_trash, name='empty_trash'),    
     path('products/bulk-action/', views.products_bulk_action, name='products_bulk_action'),
+    path('products/price-changes/<int:batch_id>/rollback/', views.price_change_rollback, name='price_change_rollback'),
+    path('products/catalog/export/', views.catalog_export, name='catalog_export'),
+    path('products/catalog/import/', views.catalog_import, name='catalog_import'),
     path('products/add/', views.product_add, name='product_add'),
     path('products/<int:product_id>/', views.product_detail, name='product_detail'),
     path('products/<int:product_id>/edit/', views.product_edit, name='product_edit'),
@@ -44,6 +47,7 @@ urlpatterns = [
       # Customers
     path('customers/', views.customers_list, name='customers_list'),
     path('customers/add/', views.customer_add, name='customer_add'),
+    path('customers/import/', views.customer_import_view, name='customer_import'),
     path('customers/<int:customer_id>/', views.customer_detail, name='customer_detail'),
     path('customers/<int:customer_id>/edit/', views.customer_edit, name='customer_edit'),
     path('customers/<int:customer_id>/delete/', views.customer_delete, name='customer_delete'),
@@ -113,6 +117,7 @@ urlpatterns = [
     path('inventory-dashboard/', views.inventory_dashboard, name='inventory_dashboard'),
     # Stock In URLs
     path('inventory/stock-in/create/', views.stock_in_create, name='stock_in_create'),
+    path('inventory/stock-in/import/', views.stock_in_import, name='stock_in_import'),
     path('inventory/stock-in/<int:stock_in_id>/', views.stock_in_detail, name='stock_in_detail'),       # API for Stock In
     path('api/product/<int:product_id>/stock-in/', views.api_get_product_for_stockin, name='api_get_product_for_stockin'),
     
@@ -125,6 +130,7 @@ urlpatterns = [
     path('api/cities/bulk_add/', views.city_bulk_add, name='city_bulk_add'),
     path('api/cities/', views.api_get_cities, name='api_get_cities'),
     path('api/cities/get-valley-status/', views.api_get_city_valley_status, name='get_city_valley_status'),
+    path('api/cities/lookup/', views.api_city_lookup, name='api_city_lookup'),
     
     
        # ==================== 🆕 RETURN MANAGEMENT ====================
@@ -146,6 +152,7 @@ urlpatterns = [
     
     # Bulk Actions
     path('returns/bulk-action/', views.returns_bulk_action, name='returns_bulk_action'),
+    path('returns/batch/', views.returns_batch, name='returns_batch'),
     
     # API Endpoint to search customer by phone number
     path('api/search-customer-by-phone/', views.search_customer_by_phone, name='search_customer_by_phone'),
@@ -157,6 +164,7 @@ urlpatterns = [
     path('ncm-orders/', views.ncm_orders_list, name='ncm_orders_list'),
     path('ncm-orders/<int:order_id>/', views.ncm_order_detail, name='ncm_order_detail'),
     path('ncm-orders/track/<int:order_id>/', views.ncm_track_order, name='ncm_track_order'),
+    path('ncm-orders/track/batch/', views.ncm_track_orders_batch, name='ncm_track_orders_batch'),
     path('ncm-orders/sync-all/', views.ncm_sync_all_statuses, name='ncm_sync_all_statuses'),
     
     # ✅ NCM TRASH MANAGEMENT (NEW - ADD THESE)
@@ -170,6 +178,14 @@ urlpatterns = [
     # ✅ NCM API ENDPOINTS
     path('api/ncm-branches/', views.ncm_branches_json, name='ncm_branches_json'),
 
+    # Performance monitoring (admin only)
+    path('performance/', views.performance_dashboard, name='performance_dashboard'),
+    path('api/performance/', views.api_performance_metrics, name='api_performance_metrics'),
+
+    # Sales reports
+    path('reports/sales/', views.sales_report, name='sales_report'),
+    path('api/reports/sales/', views.api_sales_report, name='api_sales_report'),
+
 
 ]
     
\ No newline at end of file
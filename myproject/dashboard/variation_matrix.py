@@ -0,0 +1,168 @@
+"""
+Generate every variation of a variable product from its option lists.
+
+    axes = variation_matrix.axes(product)          # [('Size', ['S', 'M', 'L']), ...]
+    result = variation_matrix.generate(product, base_price, base_stock, rules)
+
+The Cartesian product of the ProductVariantOption value lists becomes one
+ProductVariation per combination, linked to ProductAttribute /
+ProductAttributeValue rows through VariationAttributeValue. Everything is
+read and written in bulk, so the number of queries does not depend on the
+size of the matrix: one lookup each for attributes, attribute values and
+SKUs, then bulk_create for whatever is missing.
+
+rules adjust single axis values: {'Size': {'XL': {'price': Decimal('50'),
+'stock': 5}}}. Price adjustments of all values in a combination are added to
+base_price; when several values set stock, the smallest wins.
+
+Combinations whose SKU already belongs to this product are left alone, so
+the generator can be re-run after adding option values. A SKU taken by
+another product aborts the whole batch with ValueError, and so does a
+matrix of more than VARIATION_MATRIX_MAX combinations, before any of them
+is built.
+"""
+
+from collections import Counter
+from decimal import Decimal
+from itertools import product as cartesian
+from math import prod
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import ProductAttribute, ProductAttributeValue, ProductVariation, VariationAttributeValue
+
+SKU_MAX_LENGTH = ProductVariation._meta.get_field('sku').max_length
+
+
+class MatrixResult:
+
+    def __init__(self, created, skipped):
+        self.created = created
+        self.skipped = skipped
+
+
+def axes(product):
+    """[(option_name, [values])] for the product's non-empty option lists."""
+    result = []
+    for option in product.variant_options.order_by('id'):
+        values = list(dict.fromkeys(option.get_values_list()))
+        if values:
+            result.append((option.option_name, values))
+    return result
+
+
+def size(option_axes):
+    """Number of combinations of the axes; 0 without any."""
+    return prod(len(values) for _, values in option_axes) if option_axes else 0
+
+
+def make_sku(product, values):
+    suffix = '-'.join(slugify(value).upper() or 'X' for value in values)
+    base = (slugify(product.slug) or str(product.pk)).upper()
+    return f'{base[:max(SKU_MAX_LENGTH - len(suffix) - 1, 1)]}-{suffix}'[:SKU_MAX_LENGTH]
+
+
+def plan(product, base_price, base_stock=0, rules=None, option_axes=None):
+    """[(sku, name, price, stock, [(axis, value)])] for every combination, nothing written."""
+    rules = rules or {}
+    option_axes = axes(product) if option_axes is None else option_axes
+    if not option_axes:
+        return []
+    combinations, limit = size(option_axes), settings.VARIATION_MATRIX_MAX
+    if combinations > limit:
+        raise ValueError(f'{combinations} combinations is more than the limit of {limit}; split the options')
+
+    rows = []
+    names = [name for name, _ in option_axes]
+    for values in cartesian(*(values for _, values in option_axes)):
+        price = Decimal(base_price)
+        stocks = []
+        for name, value in zip(names, values):
+            rule = rules.get(name, {}).get(value, {})
+            price += Decimal(rule.get('price') or 0)
+            if rule.get('stock') is not None:
+                stocks.append(int(rule['stock']))
+        if price < 0:
+            raise ValueError(f'Price rules make {" / ".join(values)} negative')
+        rows.append((
+            make_sku(product, values),
+            ' / '.join(values),
+            price,
+            min(stocks) if stocks else int(base_stock),
+            list(zip(names, values)),
+        ))
+    return rows
+
+
+def _attribute_values(pairs):
+    """{(axis, value): ProductAttributeValue}, creating missing attributes and values in bulk."""
+    axis_names = {axis for axis, _ in pairs}
+    attributes = {}
+    for attribute in ProductAttribute.objects.filter(name__in=axis_names).order_by('id'):
+        attributes.setdefault(attribute.name, attribute)
+    missing = [ProductAttribute(name=name) for name in axis_names if name not in attributes]
+    for attribute in ProductAttribute.objects.bulk_create(missing):
+        attributes[attribute.name] = attribute
+
+    found = {}
+    existing = ProductAttributeValue.objects.filter(
+        attribute__in=attributes.values(), value__in={value for _, value in pairs}
+    ).select_related('attribute').order_by('id')
+    for attribute_value in existing:
+        found.setdefault((attribute_value.attribute.name, attribute_value.value), attribute_value)
+    missing = [
+        ProductAttributeValue(attribute=attributes[axis], value=value)
+        for axis, value in pairs if (axis, value) not in found
+    ]
+    for attribute_value in ProductAttributeValue.objects.bulk_create(missing):
+        found[(attribute_value.attribute.name, attribute_value.value)] = attribute_value
+    return found
+
+
+def generate(product, base_price, base_stock=0, rules=None):
+    """Create the missing variations of product's option matrix; returns a MatrixResult."""
+    rows = plan(product, base_price, base_stock, rules)
+    if not rows:
+        raise ValueError('This product has no option values to combine')
+
+    skus = [row[0] for row in rows]
+    duplicates = [sku for sku, count in Counter(skus).items() if count > 1]
+    if duplicates:
+        raise ValueError(f'Option values produce the same SKU: {", ".join(sorted(duplicates))}')
+
+    taken = dict(ProductVariation.objects.filter(sku__in=skus).values_list('sku', 'product_id'))
+    conflicts = sorted(sku for sku, product_id in taken.items() if product_id != product.pk)
+    if conflicts:
+        shown = ', '.join(conflicts[:5]) + (' …' if len(conflicts) > 5 else '')
+        raise ValueError(f'SKU already used by another product: {shown}')
+
+    new_rows = [row for row in rows if row[0] not in taken]
+    if not new_rows:
+        return MatrixResult(created=0, skipped=len(rows))
+
+    with transaction.atomic():
+        attribute_values = _attribute_values({pair for row in new_rows for pair in row[4]})
+        variations = ProductVariation.objects.bulk_create(
+            [
+                ProductVariation(product=product, sku=sku, variation_name=name, price=price, stock=stock)
+                for sku, name, price, stock, _ in new_rows
+            ],
+            batch_size=500,
+        )
+        if variations[0].pk is None:
+            # Backends that can't return ids from a bulk INSERT
+            by_sku = ProductVariation.objects.filter(
+                product=product, sku__in=[row[0] for row in new_rows]
+            ).in_bulk(field_name='sku')
+            variations = [by_sku[row[0]] for row in new_rows]
+        VariationAttributeValue.objects.bulk_create(
+            [
+                VariationAttributeValue(variation=variation, attribute_value=attribute_values[pair])
+                for variation, row in zip(variations, new_rows)
+                for pair in row[4]
+            ],
+            batch_size=500,
+        )
+    return MatrixResult(created=len(new_rows), skipped=len(rows) - len(new_rows))
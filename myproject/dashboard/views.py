@@ -1,35 +1,46 @@
 from urllib import request
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.views.decorators.http import require_POST, require_http_methods
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from django.contrib import messages
-from django.db.models import Sum, Count, Q, F, Prefetch
-from django.http import JsonResponse, HttpResponse, Http404
+from django.db.models import Sum, Count, Q, F, Max, Prefetch, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse, FileResponse
 from django.core.paginator import Paginator
 from datetime import datetime, timedelta
 
 import requests
 from .models import (Product, Order, OrderItem, Category, Customer, 
                      ProductVariation, ProductImage, ProductVariantOption,
-                     OrderActivityLog, StockIn, City, StockInItem)
+                     OrderActivityLog, StockIn, City, StockInItem, PriceChangeBatch)
 from decimal import Decimal, InvalidOperation
 import json
 from .forms import ProductForm, ProductVariationForm, ProductVariationFormSet, CustomerForm, OrderForm
 from django.db import IntegrityError, transaction, connection
 from django.utils import timezone
+import time
 import traceback
 import uuid, os
+import tempfile
 from django.core.files.storage import default_storage
 from django.core.files.base import File
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_date
 from django.utils.text import slugify
-from .models import ReturnRequest, ReturnItem, ReturnActivityLog, Dispatch, DispatchItem
+from .models import ReturnRequest, ReturnItem, Dispatch, DispatchItem
+from . import (
+    activity_log, catalog, catalog_sync, city_directory, conditional, customer_import, images, keyset, order_lookup,
+    pricing, purge, return_workflow, returns_analytics, sales_facts, stock_import, tabular, variation_matrix,
+)
 
 # ✅ IMPORT DECORATORS
 from accounts.decorators import permission_required, admin_only
+from services import ncm_tracking
 
 # ✅ GET CUSTOM USER MODEL
 User = get_user_model()
@@ -94,7 +105,7 @@ def logout_view(request):
 @login_required
 def dashboard_view(request):
     # System-wide product and order data (show counts to staff like warehouse)
-    products = Product.objects.filter(is_deleted=False)
+    products = Product.objects.all()
     orders = Order.objects.all()
     
     # Statistics
@@ -151,6 +162,11 @@ def dashboard_view(request):
     }
     
     return render(request, 'dashboard.html', context)
+
+
+PRODUCTS_PER_PAGE = 50
+
+
 @login_required
 @permission_required('can_view_products')
 def products_view(request):
@@ -159,9 +175,7 @@ def products_view(request):
     # attach to request for template access
     request.clear_product_draft = clear_product_draft
     """Products list with search, filters, and date range"""
-    products = Product.objects.filter(
-        is_deleted=False
-    ).select_related('category').order_by('-created_at')    
+    products = Product.objects.select_related('category').order_by('-created_at')    
     # Search functionality
     search_query = request.GET.get("search", "")
     if search_query:
@@ -239,16 +253,25 @@ def products_view(request):
             except ValueError:
                 pass
     
-    # Calculate statistics (on all user products, not filtered)
-    all_products = Product.objects.filter(is_deleted=False)
-    active_count = all_products.filter(is_active=True).count()
-    low_stock_count = all_products.filter(stock__lte=10, stock__gt=0).count()
-    out_of_stock_count = all_products.filter(stock=0).count()
-    
-    categories = Category.objects.all()
+    # Stat cards and category counts over the whole live catalogue, one query
+    categories = catalog.categories()
+    facets = catalog.product_facets(categories)
+    for category in categories:
+        category.product_count = facets['categories'].get(category.pk, 0)
+    filtered = any([search_query, category_filter, status_filter, stock_filter, date_filter])
+    product_total = products.count() if filtered else facets['total']
+    
+    # Variation totals per row as correlated subqueries, only for the rows shown
+    variations = ProductVariation.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    products = products.annotate(
+        variation_count=Coalesce(Subquery(variations.annotate(n=Count('pk')).values('n')), 0),
+        variation_stock=Coalesce(Subquery(variations.annotate(total=Sum('stock')).values('total')), 0),
+    )
+    page = keyset.paginate(products, request.GET, PRODUCTS_PER_PAGE)
     
     context = {
-        "products": products,
+        "products": page,
+        "product_total": product_total,
         "categories": categories,
         "search_query": search_query,
         "category_filter": category_filter,
@@ -257,10 +280,14 @@ def products_view(request):
         "date_filter": date_filter,
         "start_date": request.GET.get("start_date", ""),
         "end_date": request.GET.get("end_date", ""),
-        "active_count": active_count,
-        "low_stock_count": low_stock_count,
-        "out_of_stock_count": out_of_stock_count,
+        "active_count": facets['active'],
+        "low_stock_count": facets['low_stock'],
+        "out_of_stock_count": facets['out_of_stock'],
         "clear_product_draft": getattr(request, 'clear_product_draft', False),
+        # Offered as "Undo" on the page until rolled back
+        "last_price_batch": PriceChangeBatch.objects.filter(
+            created_by=request.user, rolled_back_at__isnull=True
+        ).first(),
     }
     
     return render(request, "products.html", context)
@@ -281,8 +308,7 @@ def products_bulk_action(request):
         try:
             # ✅ UPDATED: Remove user filter - show all products
             products = Product.objects.filter(
-                id__in=product_ids,
-                is_deleted=False
+                id__in=product_ids
             )
             count = products.count()
             
@@ -302,33 +328,23 @@ def products_bulk_action(request):
                 products.update(is_active=False)
                 messages.success(request, f'{count} product(s) deactivated!')
                 
-            elif action == 'increase_price':
-                percentage = request.POST.get('percentage')
-                if percentage:
-                    try:
-                        percentage = Decimal(percentage) / 100
-                        for product in products:
-                            product.price = product.price * (1 + percentage)
-                            product.save()
-                        messages.success(request, f'Price increased by {float(percentage)*100}% for {count} product(s)!')
-                    except (ValueError, TypeError):
-                        messages.error(request, 'Invalid percentage value!')
-                else:
-                    messages.error(request, 'Please provide a percentage!')
-                    
-            elif action == 'decrease_price':
+            elif action in ('increase_price', 'decrease_price'):
                 percentage = request.POST.get('percentage')
                 if percentage:
+                    # One UPDATE per table, rounded in SQL, recorded for rollback
+                    include_variations = request.POST.get('include_variations') == 'on'
                     try:
-                        percentage = Decimal(percentage) / 100
-                        for product in products:
-                            new_price = product.price * (1 - percentage)
-                            if new_price > 0:
-                                product.price = new_price
-                                product.save()
-                        messages.success(request, f'Price decreased by {float(percentage)*100}% for {count} product(s)!')
-                    except (ValueError, TypeError):
+                        batch = pricing.apply(products, action, Decimal(percentage),
+                                              include_variations=include_variations, user=request.user)
+                        direction = 'increased' if action == 'increase_price' else 'decreased'
+                        message = f'Price {direction} by {batch.percentage}% for {batch.product_count} product(s)'
+                        if include_variations:
+                            message += f' and {batch.variation_count} variation(s)'
+                        messages.success(request, f'{message}!')
+                    except InvalidOperation:
                         messages.error(request, 'Invalid percentage value!')
+                    except ValueError as e:
+                        messages.error(request, f'Invalid percentage value! {e}')
                 else:
                     messages.error(request, 'Please provide a percentage!')
                     
@@ -340,6 +356,78 @@ def products_bulk_action(request):
     
     return redirect('products')
 
+
+@login_required
+@permission_required('can_delete_products')
+@require_POST
+def price_change_rollback(request, batch_id):
+    """Undo a bulk price change on the rows it still applies to"""
+    batch = get_object_or_404(PriceChangeBatch, id=batch_id)
+    try:
+        restored = pricing.rollback(batch, user=request.user)
+        messages.success(request, f'✅ Price change undone for {restored} product(s)/variation(s)!')
+    except ValueError as e:
+        messages.error(request, str(e))
+    return redirect('products')
+
+@login_required
+@permission_required('can_export_data')
+@require_http_methods(["GET"])
+def catalog_export(request):
+    """Download the whole catalogue (products + variations) as CSV, JSON Lines or XLSX"""
+    kind = request.GET.get('format', 'csv')
+    if kind not in tabular.FORMATS:
+        kind = 'csv'
+    header, rows = catalog_sync.export_rows()
+    filename = f"catalogue_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{kind}"
+    
+    if kind == 'xlsx':
+        # openpyxl needs a seekable file; spool to disk instead of memory
+        spool = tempfile.TemporaryFile()
+        tabular.write_xlsx(header, rows, spool)
+        spool.seek(0)
+        return FileResponse(spool, as_attachment=True, filename=filename)
+    
+    chunks = tabular.write_csv(header, rows) if kind == 'csv' else tabular.write_jsonl(header, rows)
+    content_type = 'text/csv; charset=utf-8' if kind == 'csv' else 'application/x-ndjson; charset=utf-8'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@login_required
+@permission_required('can_edit_products')
+def catalog_import(request):
+    """Upsert products and variations from a CSV/XLSX/JSONL catalogue file"""
+    context = {'columns': catalog_sync.HEADER}
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV, XLSX or JSONL file')
+            return redirect('catalog_import')
+        
+        try:
+            result = catalog_sync.import_file(upload, request.user, set_stock=request.POST.get('set_stock') == 'on')
+        except ValueError as e:
+            messages.error(request, f'Could not read file: {e}')
+            return redirect('catalog_import')
+        
+        if result.created or result.updated:
+            messages.success(
+                request,
+                f'✅ Catalogue imported! {result.created} created, {result.updated} updated, '
+                f'{result.unchanged} unchanged ({result.rows_per_second} rows/sec)'
+            )
+        elif result.unchanged:
+            messages.success(request, f'✅ Catalogue is up to date, {result.unchanged} row(s) unchanged')
+        elif not result.rejected:
+            messages.error(request, 'The file has no catalogue rows')
+        if result.rejected:
+            messages.error(request, f'{len(result.rejected)} row(s) rejected')
+        context['result'] = result
+    
+    return render(request, 'catalog_import.html', context)
+
 @login_required
 @permission_required('can_create_products')
 
@@ -497,7 +585,7 @@ def product_add(request):
     })
 @permission_required('can_edit_products')
 def product_edit(request, product_id):
-    product = get_object_or_404(Product, pk=product_id, is_deleted=False)
+    product = get_object_or_404(Product.objects, pk=product_id)
     
     # Get existing variant options
     variant_option = product.variant_options.filter(option_name='Variant').first()
@@ -711,13 +799,10 @@ def product_detail(request, product_id):
 def products_trash(request):
     """View trashed products"""
     if request.user.is_superuser or request.user.role == 'admin':
-        trashed_products = Product.objects.filter(
-            is_deleted=True
-        ).select_related('category').order_by('-deleted_at')
+        trashed_products = Product.trashed.select_related('category').order_by('-deleted_at')
     else:
-        trashed_products = Product.objects.filter(
-            user=request.user,
-            is_deleted=True
+        trashed_products = Product.trashed.filter(
+            user=request.user
         ).select_related('category').order_by('-deleted_at')
 
     # Search functionality
@@ -750,7 +835,7 @@ def products_trash(request):
 @permission_required('can_delete_products')
 def product_move_to_trash(request, product_id):
     """Move product to trash (soft delete)"""
-    product = get_object_or_404(Product, id=product_id, is_deleted=False)
+    product = get_object_or_404(Product.objects, id=product_id)
     
     if request.method == 'POST':
         product_name = product.name
@@ -768,7 +853,7 @@ def product_move_to_trash(request, product_id):
 @permission_required('can_delete_products')
 def product_restore(request, product_id):
     """Restore product from trash"""
-    product = get_object_or_404(Product, id=product_id, user=request.user, is_deleted=True)
+    product = get_object_or_404(Product.trashed, id=product_id, user=request.user)
     
     if request.method == 'POST':
         product_name = product.name
@@ -786,7 +871,7 @@ def product_restore(request, product_id):
 @permission_required('can_delete_products')
 def product_permanent_delete(request, product_id):
     """Permanently delete product"""
-    product = get_object_or_404(Product, id=product_id, user=request.user, is_deleted=True)
+    product = get_object_or_404(Product.trashed, id=product_id, user=request.user)
     
     if request.method == 'POST':
         product_name = product.name
@@ -811,10 +896,9 @@ def products_trash_bulk_action(request):
             return redirect('products_trash')
         
         try:
-            products = Product.objects.filter(
+            products = Product.trashed.filter(
                 id__in=product_ids, 
-                user=request.user, 
-                is_deleted=True
+                user=request.user
             )
             count = products.count()
             
@@ -827,7 +911,7 @@ def products_trash_bulk_action(request):
                 messages.success(request, f"✅ {count} product(s) restored successfully!")
                 
             elif action == "permanent_delete":
-                products.delete()
+                purge.purge(products)
                 messages.success(request, f"✅ {count} product(s) permanently deleted!")
                 
             else:
@@ -844,11 +928,11 @@ def products_trash_bulk_action(request):
 def empty_trash(request):
     """Empty all trashed products"""
     if request.method == 'POST':
-        trashed_products = Product.objects.filter(user=request.user, is_deleted=True)
+        trashed_products = Product.trashed.filter(user=request.user)
         count = trashed_products.count()
         
         if count > 0:
-            trashed_products.delete()
+            purge.purge(trashed_products)
             messages.success(request, f'✅ Trash emptied! {count} product(s) permanently deleted.')
         else:
             messages.info(request, 'Trash is already empty.')
@@ -1264,10 +1348,45 @@ def product_variations(request, product_id):
             except Exception as e:
                 messages.error(request, f'Error creating variation: {str(e)}')
                 return redirect('product_variations', product_id=product.id)
+        
+        elif action == 'generate_matrix':
+            # Every combination of the option lists in one go
+            option_axes = variation_matrix.axes(product)
+            try:
+                base_price = Decimal(request.POST.get('base_price') or product.price)
+                base_stock = int(request.POST.get('base_stock') or 0)
+                rules = {}
+                for i, (axis, values) in enumerate(option_axes):
+                    for j, value in enumerate(values):
+                        price = request.POST.get(f'price_{i}_{j}', '').strip()
+                        stock = request.POST.get(f'stock_{i}_{j}', '').strip()
+                        if price or stock:
+                            rules.setdefault(axis, {})[value] = {
+                                'price': Decimal(price) if price else None,
+                                'stock': int(stock) if stock else None,
+                            }
+                result = variation_matrix.generate(product, base_price, base_stock, rules)
+            except InvalidOperation:
+                messages.error(request, 'Invalid price value!')
+                return redirect('product_variations', product_id=product.id)
+            except ValueError as e:
+                messages.error(request, f'Could not generate variations: {e}')
+                return redirect('product_variations', product_id=product.id)
+            
+            message = f'✅ {result.created} variation(s) generated'
+            if result.skipped:
+                message += f', {result.skipped} already existed'
+            messages.success(request, f'{message}!')
+            return redirect('product_variations', product_id=product.id)
+    
+    matrix_axes = variation_matrix.axes(product)
     
     context = {
         'product': product,
         'variations': variations,
+        'matrix_axes': matrix_axes,
+        'matrix_size': variation_matrix.size(matrix_axes),
+        'matrix_limit': settings.VARIATION_MATRIX_MAX,
     }
     return render(request, 'product_variations.html', context) 
 
@@ -1326,6 +1445,50 @@ def customers_list(request):
     return render(request, 'customers_list.html', context)
 
 
+@login_required
+@permission_required('can_edit_customers')
+def customer_import_view(request):
+    """Create/update customers from a CSV/XLSX/JSONL file, deduplicated by phone"""
+    def rule_rows(rules):
+        return [(field, Customer._meta.get_field(field).verbose_name, rule) for field, rule in rules.items()]
+    
+    context = {'rules': rule_rows(customer_import.resolve_rules()), 'strategies': customer_import.STRATEGIES}
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV, XLSX or JSONL file')
+            return redirect('customer_import')
+        
+        rules = {
+            field: request.POST[f'rule_{field}']
+            for field in customer_import.FIELDS if f'rule_{field}' in request.POST
+        }
+        dry_run = request.POST.get('dry_run') == 'on'
+        try:
+            result = customer_import.import_file(upload, rules=rules, dry_run=dry_run)
+        except ValueError as e:
+            messages.error(request, f'Could not import file: {e}')
+            return redirect('customer_import')
+        
+        if dry_run:
+            messages.info(request, 'Dry run: nothing was saved')
+        elif result.created or result.updated:
+            messages.success(
+                request,
+                f'✅ Customers imported! {result.created} created, {result.updated} updated '
+                f'({result.rows_per_second} rows/sec)'
+            )
+        elif not result.rejected_count:
+            messages.success(request, f'✅ Customers are up to date, {result.unchanged} row(s) unchanged')
+        if result.rejected_count:
+            messages.error(request, f'{result.rejected_count} row(s) rejected')
+        context['result'] = result
+        context['rules'] = rule_rows(customer_import.resolve_rules(rules))
+    
+    return render(request, 'customer_import.html', context)
+
+
 @login_required
 @permission_required('can_create_customers')
 def customer_add(request):
@@ -1418,9 +1581,7 @@ def orders_list(request):
     from decimal import Decimal, InvalidOperation
     
     # Get all orders initially
-    orders = Order.objects.select_related('customer', 'created_by').filter(
-        is_deleted=False
-    ).order_by('-created_at')
+    orders = Order.objects.select_related('customer', 'created_by').order_by('-created_at')
     
     # GET FILTER PARAMETERS - DEFAULT TO 'today'
     date_filter = request.GET.get('date_range', 'today')
@@ -1596,22 +1757,8 @@ def order_create(request):
 
                 created_by = get_object_or_404(User, id=created_by_id)
 
-                # ✅ Get or create city from City model
-                city, city_created = City.objects.get_or_create(
-                    name=branch_city_name,
-                    defaults={
-                        'valley_status': 'valley' if in_out.lower() == 'in' else 'out_valley',
-                        'is_active': True
-                    }
-                )
-                
-                # Update city valley status if needed
-                if not city_created and in_out.lower() == 'in' and city.valley_status != 'valley':
-                    city.valley_status = 'valley'
-                    city.save()
-                elif not city_created and in_out.lower() == 'out' and city.valley_status != 'out_valley':
-                    city.valley_status = 'out_valley'
-                    city.save()
+                # ✅ Make sure the city exists with this valley status (no DB write if unchanged)
+                city_directory.ensure_city(branch_city_name, 'valley' if in_out.lower() == 'in' else 'out_valley')
 
                 customer, created = Customer.objects.get_or_create(
                     phone=customer_phone,
@@ -1630,7 +1777,7 @@ def order_create(request):
                 customer.landmark = landmark
                 customer.save()
 
-                last_order = Order.objects.order_by("-id").first()
+                last_order = Order.all_objects.order_by("-id").first()
                 if last_order and last_order.order_number.startswith("ORD"):
                     try:
                         n = int(last_order.order_number.replace("ORD", ""))
@@ -1709,7 +1856,7 @@ def order_create(request):
 
                 # ✅ ADD CITY DETECTION LOG (Order creation is logged via signals.py)
                 valley_status = "Valley" if in_out.lower() == 'in' else "Out Valley"
-                OrderActivityLog.objects.create(
+                activity_log.log_order(
                     order=order,
                     action_type='city_detected',
                     user=created_by,
@@ -1731,7 +1878,7 @@ def order_create(request):
 
     # ✅ GET REQUEST - SHOW FORM
     users = User.objects.filter(is_active=True).order_by("username")
-    recent_orders = Order.objects.filter(is_deleted=False).order_by("-created_at")[:6]
+    recent_orders = Order.objects.order_by("-created_at")[:6]
     
     # ✅ GET CITIES FROM DATABASE
     cities = City.objects.filter(is_active=True).order_by('name')
@@ -1751,6 +1898,7 @@ def order_create(request):
     )
 @login_required
 @permission_required('can_view_orders')
+@activity_log.collect_activity
 def order_detail(request, order_id):
     """View order details with partial payment info and status updates"""
     order = get_object_or_404(Order, id=order_id)
@@ -1798,7 +1946,7 @@ def order_detail(request, order_id):
                         order.remaining_amount = order.total_amount
                     
                     # Create activity log for enabling partial payment
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='payment_changed',
                         user=request.user,
@@ -1813,7 +1961,7 @@ def order_detail(request, order_id):
                     order.is_partial_payment = False
                     
                     # Create activity log for clearing partial payment
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='payment_changed',
                         user=request.user,
@@ -1833,7 +1981,7 @@ def order_detail(request, order_id):
                 # ✅ ADD IN/OUT FIELD UPDATE SUPPORT (if provided)
                 new_in_out = request.POST.get('in_out')
                 if new_in_out and new_in_out in ['in', 'out'] and order.in_out != new_in_out:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='updated',
                         user=request.user,
@@ -1855,7 +2003,7 @@ def order_detail(request, order_id):
                 
                 # Order status changed
                 if old_order_status != order.order_status:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='status_changed',
                         user=request.user,
@@ -1868,7 +2016,7 @@ def order_detail(request, order_id):
                 
                 # Payment status changed
                 if old_payment_status != order.payment_status:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='payment_changed',
                         user=request.user,
@@ -1892,7 +2040,7 @@ def order_detail(request, order_id):
                     old_display = logistics_display.get(old_logistics, old_logistics or 'None')
                     new_display = logistics_display.get(new_logistics, new_logistics or 'None')
                     
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='updated',
                         user=request.user,
@@ -1906,7 +2054,7 @@ def order_detail(request, order_id):
                 # Tracking number added or updated
                 if old_tracking != new_tracking:
                     if old_tracking == '':
-                        OrderActivityLog.objects.create(
+                        activity_log.log_order(
                             order=order,
                             action_type='tracking_added',
                             user=request.user,
@@ -1916,7 +2064,7 @@ def order_detail(request, order_id):
                         )
                         changes_made.append('Tracking Number Added')
                     else:
-                        OrderActivityLog.objects.create(
+                        activity_log.log_order(
                             order=order,
                             action_type='tracking_updated',
                             user=request.user,
@@ -1930,7 +2078,7 @@ def order_detail(request, order_id):
                 # Admin notes added or updated
                 if old_admin_notes != new_admin_notes:
                     if old_admin_notes == '':
-                        OrderActivityLog.objects.create(
+                        activity_log.log_order(
                             order=order,
                             action_type='notes_added',
                             user=request.user,
@@ -1940,7 +2088,7 @@ def order_detail(request, order_id):
                         )
                         changes_made.append('Admin Notes Added')
                     else:
-                        OrderActivityLog.objects.create(
+                        activity_log.log_order(
                             order=order,
                             action_type='notes_updated',
                             user=request.user,
@@ -2074,21 +2222,7 @@ def order_edit(request, order_id):
 
                 # ✅ Get or create city from City model
                 if branch_city_name:
-                    city, city_created = City.objects.get_or_create(
-                        name=branch_city_name,
-                        defaults={
-                            'valley_status': 'valley' if in_out.lower() == 'in' else 'out_valley',
-                            'is_active': True
-                        }
-                    )
-                    
-                    # Update city valley status if needed
-                    if not city_created and in_out.lower() == 'in' and city.valley_status != 'valley':
-                        city.valley_status = 'valley'
-                        city.save()
-                    elif not city_created and in_out.lower() == 'out' and city.valley_status != 'out_valley':
-                        city.valley_status = 'out_valley'
-                        city.save()
+                    city_directory.ensure_city(branch_city_name, 'valley' if in_out.lower() == 'in' else 'out_valley')
                     
                     order.branch_city = branch_city_name
                 
@@ -2164,7 +2298,7 @@ def order_edit(request, order_id):
                 if old_in_out != in_out:
                     description += f" | IN/OUT changed from {old_in_out.upper()} to {in_out.upper()}"
                 
-                OrderActivityLog.objects.create(
+                activity_log.log_order(
                     order=order,
                     action_type='updated',
                     user=request.user,
@@ -2264,9 +2398,7 @@ def order_delete(request, order_id):
 def orders_trash(request):
     """View trashed orders"""
     # ✅ Show all trashed orders (removed user filter)
-    trashed_orders = Order.objects.filter(
-        is_deleted=True
-    ).order_by('-deleted_at')
+    trashed_orders = Order.trashed.order_by('-deleted_at')
     
     # Search functionality
     search_query = request.GET.get("search", "")
@@ -2296,7 +2428,7 @@ def orders_trash(request):
 def order_move_to_trash(request, order_id):
     """Move order to trash (soft delete)"""
     # ✅ Removed user filter
-    order = get_object_or_404(Order, id=order_id, is_deleted=False)
+    order = get_object_or_404(Order.objects, id=order_id)
     
     if request.method == 'POST':
         order_number = order.order_number
@@ -2305,7 +2437,7 @@ def order_move_to_trash(request, order_id):
         order.save()
         
         # Log activity
-        OrderActivityLog.objects.create(
+        activity_log.log_order(
             order=order,
             user=request.user,
             action_type='deleted',
@@ -2323,7 +2455,7 @@ def order_move_to_trash(request, order_id):
 def order_restore(request, order_id):
     """Restore order from trash"""
     # ✅ Removed user filter
-    order = get_object_or_404(Order, id=order_id, is_deleted=True)
+    order = get_object_or_404(Order.trashed, id=order_id)
     
     if request.method == 'POST':
         order_number = order.order_number
@@ -2332,7 +2464,7 @@ def order_restore(request, order_id):
         order.save()
         
         # Log activity
-        OrderActivityLog.objects.create(
+        activity_log.log_order(
             order=order,
             user=request.user,
             action_type='restored',
@@ -2350,7 +2482,7 @@ def order_restore(request, order_id):
 def order_permanent_delete(request, order_id):
     """Permanently delete order"""
     # ✅ Removed user filter
-    order = get_object_or_404(Order, id=order_id, is_deleted=True)
+    order = get_object_or_404(Order.trashed, id=order_id)
     
     if request.method == 'POST':
         order_number = order.order_number
@@ -2364,6 +2496,7 @@ def order_permanent_delete(request, order_id):
 
 @login_required
 @permission_required('can_delete_orders')
+@activity_log.collect_activity
 def orders_trash_bulk_action(request):
     """Handle bulk actions on trashed orders"""
     if request.method == "POST":
@@ -2376,9 +2509,8 @@ def orders_trash_bulk_action(request):
         
         try:
             # ✅ Removed user filter
-            orders = Order.objects.filter(
-                id__in=order_ids,
-                is_deleted=True
+            orders = Order.trashed.filter(
+                id__in=order_ids
             )
             count = orders.count()
             
@@ -2388,10 +2520,11 @@ def orders_trash_bulk_action(request):
             
             if action == "restore":
                 orders.update(is_deleted=False, deleted_at=None)
+                sales_facts.schedule(*order_ids)  # update() sends no post_save
                 
                 # ✅ Log activity for each restored order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='restored',
@@ -2401,7 +2534,7 @@ def orders_trash_bulk_action(request):
                 messages.success(request, f"✅ {count} order(s) restored successfully!")
                 
             elif action == "permanent_delete":
-                orders.delete()
+                purge.purge(orders)
                 messages.success(request, f"✅ {count} order(s) permanently deleted!")
                 
             else:
@@ -2419,11 +2552,11 @@ def empty_orders_trash(request):
     """Empty all trashed orders"""
     if request.method == 'POST':
         # ✅ Removed user filter - empty ALL trashed orders
-        trashed_orders = Order.objects.filter(is_deleted=True)
+        trashed_orders = Order.trashed.all()
         count = trashed_orders.count()
         
         if count > 0:
-            trashed_orders.delete()
+            purge.purge(trashed_orders)
             messages.success(request, f'✅ Trash emptied! {count} order(s) permanently deleted.')
         else:
             messages.info(request, 'Trash is already empty.')
@@ -2446,11 +2579,41 @@ def order_invoice(request, order_id):
 
 
 # API Endpoints for AJAX
+# ETag parts for conditional.etag_json: whatever the payload is built from,
+# fetched without building it
+
+def _customer_etag(request, customer_id):
+    return Customer.objects.filter(id=customer_id).values_list('updated_at', flat=True).first()
+
+
+def _visible_products(user):
+    # Role-aware access shared by the POS product APIs
+    if user.is_superuser or getattr(user, 'role', None) in ['administrator', 'warehouse']:
+        return Product.objects.all()
+    return Product.objects.filter(user=user)
+
+
+def _product_etag(request, product_id):
+    stamp = (
+        _visible_products(request.user).filter(id=product_id)
+        .annotate(variations_updated=Max('variations__updated_at'), variations_count=Count('variations'))
+        .values_list('updated_at', 'category__name', 'variations_updated', 'variations_count')
+        .first()
+    )
+    return stamp and (stamp, images.version())
+
+
+def _product_search_etag(request):
+    stamp = _visible_products(request.user).filter(is_active=True).aggregate(Max('updated_at'), Count('id'))
+    return stamp, images.version()
+
+
 @login_required
+@conditional.etag_json(_customer_etag)
 def api_get_customer(request, customer_id):
     """Get customer details via AJAX"""
     customer = get_object_or_404(Customer, id=customer_id)
-    return JsonResponse({
+    return conditional.FastJsonResponse({
         'name': customer.name,
         'email': customer.email,
         'phone': customer.phone,
@@ -2464,14 +2627,11 @@ def api_get_customer(request, customer_id):
 # ✅ SINGLE PRODUCT API (used by order edit/create modals)
 @login_required
 @require_http_methods(["GET"])
+@conditional.etag_json(_product_etag)
 def api_get_product(request, product_id):
     """Return product details (non-variation) for POS modals"""
     try:
-        # Role-aware access
-        if request.user.is_superuser or getattr(request.user, 'role', None) in ['administrator', 'warehouse']:
-            product = get_object_or_404(Product, id=product_id, is_deleted=False)
-        else:
-            product = get_object_or_404(Product, id=product_id, is_deleted=False, user=request.user)
+        product = get_object_or_404(_visible_products(request.user), id=product_id)
 
         data = {
             'id': product.id,
@@ -2484,22 +2644,23 @@ def api_get_product(request, product_id):
                 'name': product.category.name
             } if getattr(product, 'category', None) else None,
             'description': product.description or '',
-            'image': product.image.url if getattr(product, 'image', None) else None,
+            **product.image_variants.as_dict(),
             'product_type': getattr(product, 'product_type', 'simple'),
             'stock': getattr(product, 'stock_quantity', getattr(product, 'stock', 0)),
         }
 
-        return JsonResponse({'success': True, 'product': data})
+        return conditional.FastJsonResponse({'success': True, 'product': data})
 
     except Http404:
-        return JsonResponse({'success': False, 'message': 'Product not found'}, status=404)
+        return conditional.FastJsonResponse({'success': False, 'message': 'Product not found'}, status=404)
     except Exception as e:
         import traceback
         print(f"❌ Error in api_get_product: {str(e)}")
         traceback.print_exc()
-        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+        return conditional.FastJsonResponse({'success': False, 'error': str(e)}, status=500)
 
 @login_required
+@conditional.etag_json(_product_search_etag)
 def api_search_products(request):
     """
     Returns products for POS modal grid.
@@ -2510,10 +2671,7 @@ def api_search_products(request):
 
         # Role-aware visibility: administrators and warehouse users can see all products.
         # Other users (e.g., sales) will only see products they created.
-        if request.user.is_superuser or getattr(request.user, 'role', None) in ['administrator', 'warehouse']:
-            qs = Product.objects.filter(is_active=True, is_deleted=False).order_by("name")
-        else:
-            qs = Product.objects.filter(is_active=True, is_deleted=False, user=request.user).order_by("name")
+        qs = _visible_products(request.user).filter(is_active=True).order_by("name")
 
         if q:
             qs = qs.filter(Q(name__icontains=q) | Q(sku__icontains=q) | Q(slug__icontains=q))
@@ -2540,11 +2698,11 @@ def api_search_products(request):
                 "price": str(p.price) if p.price else "0",
                 "stock": stock,
                 "product_type": p.product_type,
-                "image": p.image.url if p.image else None,
+                **p.image_variants.as_dict(),
                 "sku": sku,
             })
 
-        return JsonResponse({
+        return conditional.FastJsonResponse({
             "success": True,
             "products": data,
             "count": len(data)
@@ -2555,7 +2713,7 @@ def api_search_products(request):
         print(f"❌ Error in api_search_products: {str(e)}")
         traceback.print_exc()
         
-        return JsonResponse({
+        return conditional.FastJsonResponse({
             "success": False,
             "error": str(e),
             "products": []
@@ -2565,6 +2723,7 @@ def api_search_products(request):
 # varialble product variations API
 @login_required
 @require_http_methods(["GET"])
+@conditional.etag_json(_product_etag)
 def api_get_product_variations(request, product_id):
     """
     Returns variations for a variable product.
@@ -2572,14 +2731,11 @@ def api_get_product_variations(request, product_id):
     """
     try:
         # Role-based product access
-        if request.user.is_superuser or getattr(request.user, 'role', None) in ['administrator', 'warehouse']:
-            product = get_object_or_404(Product, id=product_id, is_deleted=False)
-        else:
-            product = get_object_or_404(Product, id=product_id, is_deleted=False, user=request.user)
+        product = get_object_or_404(_visible_products(request.user), id=product_id)
 
         # Check if variable product
         if product.product_type != "variable":
-            return JsonResponse({
+            return conditional.FastJsonResponse({
                 "success": False,
                 "message": "This product is not a variable product",
                 "variations": []
@@ -2593,7 +2749,7 @@ def api_get_product_variations(request, product_id):
         )
 
         if not variations.exists():
-            return JsonResponse({
+            return conditional.FastJsonResponse({
                 "success": True,
                 "variations": [],
                 "total": 0,
@@ -2622,14 +2778,14 @@ def api_get_product_variations(request, product_id):
                 "price": str(v.price),
                 "stock": v.stock,
                 "is_active": v.is_active,
-                "image": v.image.url if v.image else None,
+                **v.image_variants.as_dict(),
                 "category": {
                     "id": product.category.id,
                     "name": product.category.name
                 } if getattr(product, 'category', None) else None,
             })
 
-        return JsonResponse({
+        return conditional.FastJsonResponse({
             "success": True,
             "variations": out,
             "total": len(out)
@@ -2640,7 +2796,7 @@ def api_get_product_variations(request, product_id):
         print(f"❌ Error in api_get_product_variations: {str(e)}")
         traceback.print_exc()
         
-        return JsonResponse({
+        return conditional.FastJsonResponse({
             "success": False,
             "error": str(e),
             "variations": []
@@ -3073,6 +3229,7 @@ def variation_delete(request, variation_id):
 
 @login_required
 @permission_required('can_delete_orders')
+@activity_log.collect_activity
 def orders_bulk_action(request):
     """Handle bulk actions on orders including NCM bulk sending"""
     if request.method == 'POST':
@@ -3086,8 +3243,7 @@ def orders_bulk_action(request):
         try:
             # ✅ Removed user filter - show all orders
             orders = Order.objects.filter(
-                id__in=order_ids, 
-                is_deleted=False
+                id__in=order_ids
             )
             count = orders.count()
             
@@ -3117,7 +3273,7 @@ def orders_bulk_action(request):
                                 item.product.save()
                     
                     # Log activity
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='deleted',
@@ -3126,14 +3282,16 @@ def orders_bulk_action(request):
                 
                 # ✅ Soft delete instead of permanent delete
                 orders.update(is_deleted=True, deleted_at=timezone.now())
+                sales_facts.schedule(*order_ids)  # update() sends no post_save
                 messages.success(request, f'✅ {count} order(s) moved to trash successfully!')
                 
             elif action == 'mark_delivered':
                 orders.update(order_status='delivered')
+                sales_facts.schedule(*order_ids)
                 
                 # Log activity for each order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='status_changed',
@@ -3144,10 +3302,11 @@ def orders_bulk_action(request):
                 
             elif action == 'mark_cancelled':
                 orders.update(order_status='cancelled')
+                sales_facts.schedule(*order_ids)
                 
                 # Log activity for each order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='status_changed',
@@ -3158,10 +3317,11 @@ def orders_bulk_action(request):
                 
             elif action == 'mark_processing':
                 orders.update(order_status='processing')
+                sales_facts.schedule(*order_ids)
                 
                 # Log activity for each order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='status_changed',
@@ -3172,10 +3332,11 @@ def orders_bulk_action(request):
             
             elif action == 'mark_shipped':
                 orders.update(order_status='shipped')
+                sales_facts.schedule(*order_ids)
                 
                 # Log activity for each order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='status_changed',
@@ -3189,7 +3350,7 @@ def orders_bulk_action(request):
                 
                 # Log activity for each order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='payment_changed',
@@ -3203,7 +3364,7 @@ def orders_bulk_action(request):
                 
                 # Log activity for each order
                 for order in orders:
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='payment_changed',
@@ -3223,6 +3384,7 @@ def orders_bulk_action(request):
 
 @login_required
 @permission_required('can_delete_orders')
+@activity_log.collect_activity
 def orders_bulk_ncm_send(request):
     """
     Handle Bulk Sending to NCM Logistics
@@ -3250,7 +3412,7 @@ def orders_bulk_ncm_send(request):
         return redirect('orders_list')
 
     # 2. Get Orders
-    orders = Order.objects.filter(id__in=order_ids, is_deleted=False)
+    orders = Order.objects.filter(id__in=order_ids)
     count = orders.count()
 
     if count == 0:
@@ -3427,7 +3589,7 @@ def send_single_order_to_ncm(request, order, from_branch='TINKUNE', delivery_typ
                 order.save()
 
                 # Log Activity
-                OrderActivityLog.objects.create(
+                activity_log.log_order(
                     order=order,
                     user=request.user,
                     action_type='updated',
@@ -3482,7 +3644,7 @@ def dispatch_management(request):
             return redirect('dispatch_management')
         
         try:
-            with transaction.atomic():
+            with transaction.atomic(), activity_log.collect():
                 # Generate batch number
                 batch_number = f"DISPATCH-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
                 
@@ -3569,7 +3731,7 @@ def dispatch_management(request):
                         ).update(order=order)
                         
                         # Create activity log
-                        OrderActivityLog.objects.create(
+                        activity_log.log_order(
                             order=order,
                             action_type='status_changed',
                             user=request.user,
@@ -3617,7 +3779,7 @@ def dispatch_management(request):
 @permission_required('can_view_dispatch')
 def dispatch_list(request):
     """List all dispatches (not trashed)"""
-    dispatches = Dispatch.objects.filter(is_deleted=False).prefetch_related('items').order_by('-created_at')
+    dispatches = Dispatch.objects.prefetch_related('items').order_by('-created_at')
     
     # Filters
     logistics_filter = request.GET.get('logistics')
@@ -3654,8 +3816,7 @@ def dispatch_detail(request, pk):
     """View single dispatch details"""
     dispatch = get_object_or_404(
         Dispatch.objects.prefetch_related('items__order'),
-        pk=pk,
-        is_deleted=False
+        pk=pk
     )
     
     context = {
@@ -3671,7 +3832,7 @@ def dispatch_detail(request, pk):
 @permission_required('can_delete_dispatch')
 def dispatch_move_to_trash(request, pk):
     """Move dispatch to trash (soft delete)"""
-    dispatch = get_object_or_404(Dispatch, pk=pk, is_deleted=False)
+    dispatch = get_object_or_404(Dispatch.objects, pk=pk)
     
     if request.method == 'POST':
         batch_number = dispatch.batch_number
@@ -3690,9 +3851,7 @@ def dispatch_move_to_trash(request, pk):
 @permission_required('can_view_dispatch')
 def dispatch_trash(request):
     """View trashed dispatches"""
-    trashed_dispatches = Dispatch.objects.filter(
-        is_deleted=True
-    ).select_related('created_by', 'deleted_by').prefetch_related('items').order_by('-deleted_at')
+    trashed_dispatches = Dispatch.trashed.select_related('created_by', 'deleted_by').prefetch_related('items').order_by('-deleted_at')
     
     # Search functionality
     search_query = request.GET.get('search', '')
@@ -3721,7 +3880,7 @@ def dispatch_trash(request):
 @permission_required('can_delete_dispatch')
 def dispatch_restore(request, pk):
     """Restore dispatch from trash"""
-    dispatch = get_object_or_404(Dispatch, pk=pk, is_deleted=True)
+    dispatch = get_object_or_404(Dispatch.trashed, pk=pk)
     
     if request.method == 'POST':
         batch_number = dispatch.batch_number
@@ -3740,7 +3899,7 @@ def dispatch_restore(request, pk):
 @permission_required('can_delete_dispatch')
 def dispatch_permanent_delete(request, pk):
     """Permanently delete dispatch"""
-    dispatch = get_object_or_404(Dispatch, pk=pk, is_deleted=True)
+    dispatch = get_object_or_404(Dispatch.trashed, pk=pk)
     
     if request.method == 'POST':
         batch_number = dispatch.batch_number
@@ -3765,9 +3924,8 @@ def dispatch_trash_bulk_action(request):
             return redirect('dispatch_trash')
         
         try:
-            dispatches = Dispatch.objects.filter(
-                id__in=dispatch_ids,
-                is_deleted=True
+            dispatches = Dispatch.trashed.filter(
+                id__in=dispatch_ids
             )
             count = dispatches.count()
             
@@ -3780,7 +3938,7 @@ def dispatch_trash_bulk_action(request):
                 messages.success(request, f'✅ {count} dispatch(es) restored successfully!')
                 
             elif action == 'permanent_delete':
-                dispatches.delete()
+                purge.purge(dispatches)
                 messages.success(request, f'✅ {count} dispatch(es) permanently deleted!')
                 
             else:
@@ -3797,11 +3955,11 @@ def dispatch_trash_bulk_action(request):
 def empty_dispatch_trash(request):
     """Empty all trashed dispatches"""
     if request.method == 'POST':
-        trashed_dispatches = Dispatch.objects.filter(is_deleted=True)
+        trashed_dispatches = Dispatch.trashed.all()
         count = trashed_dispatches.count()
         
         if count > 0:
-            trashed_dispatches.delete()
+            purge.purge(trashed_dispatches)
             messages.success(request, f'✅ Trash emptied! {count} dispatch(es) permanently deleted.')
         else:
             messages.info(request, 'Trash is already empty.')
@@ -3814,7 +3972,7 @@ def empty_dispatch_trash(request):
 @permission_required('can_view_dispatch')
 def dispatch_list(request):
     """List all dispatches (not trashed)"""
-    dispatches = Dispatch.objects.filter(is_deleted=False).prefetch_related('items').order_by('-created_at')
+    dispatches = Dispatch.objects.prefetch_related('items').order_by('-created_at')
     
     # Filters
     logistics_filter = request.GET.get('logistics')
@@ -3896,7 +4054,7 @@ def dispatch_bulk_action(request):
             return redirect('dispatch_list')
         
         try:
-            dispatches = Dispatch.objects.filter(id__in=dispatch_ids, is_deleted=False)
+            dispatches = Dispatch.objects.filter(id__in=dispatch_ids)
             count = dispatches.count()
             
             if count == 0:
@@ -4282,6 +4440,46 @@ def stock_in_create(request):
     products = Product.objects.filter(user=request.user, is_active=True).order_by('name')
     return render(request, 'stock_in_create.html', {'products': products})
 
+@login_required
+@permission_required('can_manage_inventory')
+def stock_in_import(request):
+    """Stock in from a supplier CSV/XLSX file, validated up front and applied in bulk"""
+    context = {'stock_in_types': StockIn.STOCK_IN_TYPES}
+    
+    if request.method == 'POST':
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, 'Please choose a CSV or XLSX file')
+            return redirect('stock_in_import')
+        
+        try:
+            result = stock_import.import_file(
+                upload,
+                request.user,
+                stock_in_type=request.POST.get('stock_in_type', 'purchase'),
+                supplier_name=request.POST.get('supplier_name', '').strip(),
+                notes=request.POST.get('notes', '').strip(),
+                skip_invalid=request.POST.get('skip_invalid') == 'on',
+            )
+        except ValueError as e:
+            messages.error(request, f'Could not read file: {e}')
+            return redirect('stock_in_import')
+        
+        if result.stock_in:
+            messages.success(
+                request,
+                f'✅ Stock In {result.stock_in.reference_number} imported! '
+                f'{result.accepted} line(s), {result.total_quantity} units worth Rs {result.total_cost:.2f} '
+                f'({result.rows_per_second} rows/sec)'
+            )
+        elif result.rejected:
+            messages.error(request, f'{len(result.rejected)} line(s) rejected, nothing was imported')
+        else:
+            messages.error(request, 'The file has no stock lines')
+        context['result'] = result
+    
+    return render(request, 'stock_in_import.html', context)
+
 @login_required
 def stock_in_detail(request, stock_in_id):
     """View stock in transaction details - COMPLETE FIXED VERSION"""
@@ -4331,7 +4529,7 @@ def stock_in_detail(request, stock_in_id):
             
             # Get created_by user
             try:
-                stock_in.created_by = User.objects.get(id=stock_in.created_by_id)
+                stock_in.created_by = User.all_objects.get(id=stock_in.created_by_id)
             except User.DoesNotExist:
                 stock_in.created_by = type('obj', (object,), {'username': 'Unknown'})()
         
@@ -4575,15 +4773,18 @@ def city_management(request):
                     messages.success(request, f'✅ {count} city(s) deleted successfully!')
                     
                 elif action in ['valley', 'out_valley']:
-                    cities_to_update.update(valley_status=action)
+                    cities_to_update.update(valley_status=action, updated_at=timezone.now())
+                    city_directory.invalidate()
                     messages.success(request, f'✅ {cities_to_update.count()} city(s) updated to {action.replace("_", " ").title()}!')
                     
                 elif action == 'activate':
-                    cities_to_update.update(is_active=True)
+                    cities_to_update.update(is_active=True, updated_at=timezone.now())
+                    city_directory.invalidate()
                     messages.success(request, f'✅ {cities_to_update.count()} city(s) activated!')
                     
                 elif action == 'deactivate':
-                    cities_to_update.update(is_active=False)
+                    cities_to_update.update(is_active=False, updated_at=timezone.now())
+                    city_directory.invalidate()
                     messages.success(request, f'✅ {cities_to_update.count()} city(s) deactivated!')
     
     # Get statistics
@@ -4779,31 +4980,35 @@ def city_bulk_add(request):
     return JsonResponse({'success': False, 'message': 'Invalid request'})
 
 
+def _cities_etag(request):
+    return city_directory.get_directory().version
+
+
 @login_required
 @require_http_methods(["GET"])
+@conditional.etag_json(_cities_etag)
 def api_get_cities(request):
     """API to get all cities for dropdown in order create"""
     try:
-        cities = City.objects.filter(is_active=True).order_by('name')
-        
-        city_list = []
-        for city in cities:
-            city_list.append({
+        city_list = [
+            {
                 'id': city.id,
                 'name': city.name,
                 'valley_status': city.valley_status,
-                'display_status': city.get_valley_status_display(),
+                'display_status': 'Valley' if city.valley_status == 'valley' else 'Out Valley',
                 'in_out': 'IN' if city.valley_status == 'valley' else 'OUT'
-            })
+            }
+            for city in city_directory.get_directory().active_cities()
+        ]
         
-        return JsonResponse({
+        return conditional.FastJsonResponse({
             'success': True, 
             'cities': city_list,
             'count': len(city_list)
         })
         
     except Exception as e:
-        return JsonResponse({
+        return conditional.FastJsonResponse({
             'success': False,
             'message': f'Error loading cities: {str(e)}',
             'cities': []
@@ -4813,76 +5018,36 @@ def api_get_cities(request):
 @require_http_methods(["GET"])
 def api_get_city_valley_status(request):
     """API to get valley status for a city (for IN/OUT field in order create)"""
-    city_name = request.GET.get('city', '').strip().title()
+    city_name = request.GET.get('city', '').strip()
     
     if not city_name:
         return JsonResponse({'success': False, 'message': 'City name required'})
     
     try:
-        # Try exact match first, then case-insensitive match
-        city = City.objects.filter(
-            Q(name=city_name) | Q(name__iexact=city_name),
-            is_active=True
-        ).first()
+        result = city_directory.get_directory().classify(city_name)
+        is_valley = result['valley_status'] == 'valley'
         
-        if city:
-            return JsonResponse({
-                'success': True,
-                'city': city.name,
-                'valley_status': city.valley_status,
-                'display_status': city.get_valley_status_display(),
-                'in_out': 'IN' if city.valley_status == 'valley' else 'OUT',
-                'exists': True,
-                'city_id': city.id
-            })
+        response = {
+            'success': True,
+            'city': result['city'],
+            'valley_status': result['valley_status'],
+            'display_status': 'Valley' if is_valley else 'Out Valley',
+            'in_out': 'IN' if is_valley else 'OUT',
+            'exists': result['exists'],
+            'match_type': result['match_type'],
+        }
+        if result['exists']:
+            response['city_id'] = result['city_id']
         else:
-            # Check if it's in default valley cities
-            default_valley_cities = [
-                'Kathmandu', 'Lalitpur', 'Bhaktapur', 'Kirtipur', 
-                'Thimi', 'Tokha', 'Budhanilkantha', 'Gokarneshwor'
-            ]
-            
-            if city_name in default_valley_cities:
-                return JsonResponse({
-                    'success': True,
-                    'city': city_name,
-                    'valley_status': 'valley',
-                    'display_status': 'Valley (Inside)',
-                    'in_out': 'IN',
-                    'exists': False,
-                    'is_default': True,
-                    'message': f'City "{city_name}" is a default Valley city'
-                })
-            else:
-                # Check common Out Valley cities
-                common_out_valley_cities = [
-                    'Pokhara', 'Biratnagar', 'Birgunj', 'Dharan', 'Hetauda', 
-                    'Butwal', 'Nepalgunj', 'Dhankuta', 'Janakpur', 'Dhangadhi'
-                ]
-                
-                if city_name in common_out_valley_cities:
-                    return JsonResponse({
-                        'success': True,
-                        'city': city_name,
-                        'valley_status': 'out_valley',
-                        'display_status': 'Out Valley (Outside)',
-                        'in_out': 'OUT',
-                        'exists': False,
-                        'is_default': True,
-                        'message': f'City "{city_name}" is a common Out Valley city'
-                    })
-                else:
-                    # Default to Out Valley for unknown cities
-                    return JsonResponse({
-                        'success': True,
-                        'city': city_name,
-                        'valley_status': 'out_valley',
-                        'display_status': 'Out Valley (Outside)',
-                        'in_out': 'OUT',
-                        'exists': False,
-                        'is_default': True,
-                        'message': f'City "{city_name}" not found in database. Marked as Out Valley by default.'
-                    })
+            response['is_default'] = True
+            response['suggestions'] = [entry.name for entry in result['suggestions']]
+            response['message'] = (
+                f'City "{result["city"]}" not found in database. '
+                f'Marked as {"Valley" if is_valley else "Out Valley"} by default.'
+            )
+            if response['suggestions']:
+                response['message'] += f' Did you mean {" or ".join(response["suggestions"][:3])}?'
+        return JsonResponse(response)
                     
     except Exception as e:
         return JsonResponse({
@@ -4895,7 +5060,7 @@ def api_get_city_valley_status(request):
 @login_required
 @require_http_methods(["GET"])
 def get_valley_status(request):
-    """API endpoint to detect if a city is in valley or out valley - FIXED VERSION"""
+    """API endpoint to detect if a city is in valley or out valley"""
     city_name = request.GET.get('city', '').strip()
     
     if not city_name:
@@ -4905,64 +5070,20 @@ def get_valley_status(request):
         })
     
     try:
-        # Try to find the city in database (case-insensitive)
-        city = City.objects.filter(
-            Q(name__iexact=city_name) | Q(name__iexact=city_name.title())
-        ).first()
+        result = city_directory.get_directory().classify(city_name)
+        is_valley = result['valley_status'] == 'valley'
+        display = 'Valley' if is_valley else 'Out Valley'
+        if not result['exists']:
+            display += ' (Default)'
         
-        if city:
-            return JsonResponse({
-                'success': True,
-                'valley_status': city.valley_status,
-                'display_status': city.get_valley_status_display(),
-                'exists': True,
-                'city': city.name,
-                'in_out': 'in' if city.valley_status == 'valley' else 'out'
-            })
-        else:
-            # If city not found, check patterns
-            city_lower = city_name.lower()
-            
-            # Valley city patterns
-            valley_patterns = [
-                'kathmandu', 'lalitpur', 'bhaktapur', 'kirtipur', 'patan',
-                'thamel', 'ktm', 'kath', 'mandu', 'valley'
-            ]
-            
-            # Out-valley city patterns
-            out_valley_patterns = [
-                'birgunj', 'pokhara', 'dharan', 'biratnagar', 'dumla',
-                'butwal', 'bhairahawa', 'nepalgunj', 'dhangadhi',
-                'hetauda', 'janakpur', 'dhankuta', 'outside', 'out'
-            ]
-            
-            # Check patterns
-            is_valley = any(pattern in city_lower for pattern in valley_patterns)
-            is_out_valley = any(pattern in city_lower for pattern in out_valley_patterns)
-            
-            if is_valley and not is_out_valley:
-                status = 'valley'
-                display = 'Valley (Pattern Match)'
-                in_out = 'in'
-            elif is_out_valley and not is_valley:
-                status = 'out_valley'
-                display = 'Out Valley (Pattern Match)'
-                in_out = 'out'
-            else:
-                # Default to OUT for unknown cities (safer assumption)
-                status = 'out_valley'
-                display = 'Out Valley (Default)'
-                in_out = 'out'
-            
-            return JsonResponse({
-                'success': True,
-                'valley_status': status,
-                'display_status': display,
-                'exists': False,
-                'city': city_name,
-                'in_out': in_out,
-                'message': f'City detected via pattern matching as {display}'
-            })
+        return JsonResponse({
+            'success': True,
+            'valley_status': result['valley_status'],
+            'display_status': display,
+            'exists': result['exists'],
+            'city': result['city'],
+            'in_out': 'in' if is_valley else 'out',
+        })
             
     except Exception as e:
         print(f"Error in get_valley_status: {e}")
@@ -4970,6 +5091,53 @@ def get_valley_status(request):
             'success': False,
             'message': f'Error detecting valley status: {str(e)}'
         })
+
+
+@login_required
+@require_http_methods(["GET"])
+def api_city_lookup(request):
+    """
+    Autocomplete + valley classification for the order form in one call.
+    Served from the in-memory city directory; no database queries.
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+    except ValueError:
+        limit = 10
+    
+    if not query:
+        return JsonResponse({'success': False, 'message': 'Query is required', 'suggestions': []})
+    
+    directory = city_directory.get_directory()
+    suggestions = directory.autocomplete(query, limit=limit)
+    if not suggestions:
+        suggestions = [entry for entry, _ in directory.fuzzy(query, limit=limit) if entry.is_active]
+    
+    result = directory.classify(query)
+    is_valley = result['valley_status'] == 'valley'
+    
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'match': {
+            'city': result['city'],
+            'city_id': result['city_id'],
+            'valley_status': result['valley_status'],
+            'in_out': 'IN' if is_valley else 'OUT',
+            'exists': result['exists'],
+            'match_type': result['match_type'],
+        },
+        'suggestions': [
+            {
+                'id': entry.id,
+                'name': entry.name,
+                'valley_status': entry.valley_status,
+                'in_out': 'IN' if entry.valley_status == 'valley' else 'OUT',
+            }
+            for entry in suggestions
+        ],
+    })
         
         
 # ==================== RETURN MANAGEMENT VIEWS (WITH TRASH) ====================
@@ -4983,67 +5151,37 @@ def returns_dashboard(request):
     date_filter = request.GET.get('date_range', 'all')
     status_filter = request.GET.get('status', '')
     
-    # Base queryset - exclude deleted
-    returns = ReturnRequest.objects.filter(is_deleted=False).select_related('order', 'customer', 'created_by').all()
-    
-    # Apply date filter
-    today = timezone.now().date()
-    if date_filter == 'today':
-        returns = returns.filter(created_at__date=today)
-    elif date_filter == 'yesterday':
-        yesterday = today - timedelta(days=1)
-        returns = returns.filter(created_at__date=yesterday)
-    elif date_filter == 'last_7_days':
-        start = today - timedelta(days=7)
-        returns = returns.filter(created_at__date__gte=start)
-    elif date_filter == 'last_30_days':
-        start = today - timedelta(days=30)
-        returns = returns.filter(created_at__date__gte=start)
-    elif date_filter == 'this_month':
-        returns = returns.filter(created_at__year=today.year, created_at__month=today.month)
-    
-    # Apply status filter
-    if status_filter:
-        returns = returns.filter(return_status=status_filter)
-    
-    # Statistics
-    total_returns = returns.count()
-    pending_returns = returns.filter(return_status='pending').count()
-    approved_returns = returns.filter(return_status='approved').count()
-    received_returns = returns.filter(return_status='received').count()
-    inspecting_returns = returns.filter(return_status='inspecting').count()
-    refunded_returns = returns.filter(return_status='refunded').count()
-    rejected_returns = returns.filter(return_status='rejected').count()
-    
-    total_refund_amount = returns.filter(
-        return_status='refunded'
-    ).aggregate(total=Sum('refund_amount'))['total'] or Decimal('0.00')
-    
-    # Return reasons breakdown
-    reason_stats = returns.values('return_reason').annotate(
-        count=Count('id')
-    ).order_by('-count')[:5]
+    # Counts, refund totals and breakdowns: one aggregate + two grouped queries, cached
+    stats = returns_analytics.summary(date_filter, status_filter)
     
     # Recent returns
-    recent_returns = returns.order_by('-created_at')[:10]
-    
-    # Trash count
-    trash_count = ReturnRequest.objects.filter(is_deleted=True).count()
+    recent_returns = ReturnRequest.objects.select_related('order', 'customer', 'created_by').filter(
+        returns_analytics.date_range_q(date_filter)
+    )
+    if status_filter:
+        recent_returns = recent_returns.filter(return_status=status_filter)
+    recent_returns = recent_returns.order_by('-created_at')[:10]
     
+    counts = stats['counts']
     context = {
         'returns': recent_returns,
-        'total_returns': total_returns,
-        'pending_returns': pending_returns,
-        'approved_returns': approved_returns,
-        'received_returns': received_returns,
-        'inspecting_returns': inspecting_returns,
-        'refunded_returns': refunded_returns,
-        'rejected_returns': rejected_returns,
-        'total_refund_amount': total_refund_amount,
-        'reason_stats': reason_stats,
+        'total_returns': stats['total'],
+        'pending_returns': counts['pending'],
+        'approved_returns': counts['approved'],
+        'received_returns': counts['received'],
+        'inspecting_returns': counts['inspecting'],
+        'refunded_returns': counts['refunded'],
+        'rejected_returns': counts['rejected'],
+        'total_refund_amount': stats['refund_total'],
+        'reason_stats': stats['reasons'][:5],
+        'reason_breakdown': stats['reasons'],
+        'reason_statuses': [
+            (status, dict(ReturnRequest.RETURN_STATUS_CHOICES)[status]) for status in stats['reason_statuses']
+        ],
+        'product_return_rates': stats['products'],
         'date_filter': date_filter,
         'status_filter': status_filter,
-        'trash_count': trash_count,
+        'trash_count': stats['trash_count'],
     }
     
     return render(request, 'returns/dashboard.html', context)
@@ -5054,7 +5192,7 @@ def returns_dashboard(request):
 def returns_list(request):
     """List all return requests with filters (excluding trash)"""
     
-    returns = ReturnRequest.objects.filter(is_deleted=False).select_related(
+    returns = ReturnRequest.objects.select_related(
         'order', 'customer', 'created_by', 'approved_by'
     ).prefetch_related('items').all().order_by('-created_at')
     
@@ -5188,7 +5326,7 @@ def return_create(request):
                     )
                 
                 # Log activity
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='created',
@@ -5208,8 +5346,7 @@ def return_create(request):
     # GET request
     # Get recent delivered orders for scanning
     recent_orders = Order.objects.filter(
-        order_status='delivered',
-        is_deleted=False
+        order_status='delivered'
     ).select_related('customer', 'created_by').prefetch_related(
         'items__product',
         'items__product_variation'
@@ -5247,38 +5384,21 @@ def api_get_order_by_barcode(request):
         return JsonResponse({'success': False, 'error': 'No barcode provided'})
     
     try:
-        # Build query - search by order number
-        order = Order.objects.select_related('customer', 'created_by').prefetch_related(
-            'items__product',
-            'items__product_variation'
-        ).filter(
-            order_number__iexact=barcode,  # Case-insensitive match
-            is_deleted=False
-        ).first()
-        
-        # If not found, return helpful error
+        # One indexed query over order number / barcode / tracking number, status and trash state included
+        order = order_lookup.find(barcode)
+        
         if not order:
-            # Check if order exists but is deleted
-            deleted_order = Order.objects.filter(order_number__iexact=barcode, is_deleted=True).first()
-            if deleted_order:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Order "{barcode}" is in trash'
-                })
-            
-            # Check if order exists but not delivered
-            pending_order = Order.objects.filter(order_number__iexact=barcode, is_deleted=False).exclude(order_status='delivered').first()
-            if pending_order:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Order "{barcode}" is not delivered yet (Status: {pending_order.order_status})'
-                })
-            
             return JsonResponse({
                 'success': False,
                 'error': f'Order "{barcode}" not found'
             })
         
+        if order.is_deleted:
+            return JsonResponse({
+                'success': False,
+                'error': f'Order "{barcode}" is in trash'
+            })
+        
         # Check if delivered
         if order.order_status != 'delivered':
             return JsonResponse({
@@ -5286,35 +5406,6 @@ def api_get_order_by_barcode(request):
                 'error': f'Order "{barcode}" is not delivered (Status: {order.order_status}). Only delivered orders can be returned.'
             })
         
-        # Prepare order items
-        items = []
-        for item in order.items.all():
-            # Get SKU and barcode
-            sku = item.product_sku or ''
-            barcode_val = ''
-            
-            # Try to get barcode from variation or product
-            if item.product_variation:
-                if hasattr(item.product_variation, 'barcode'):
-                    barcode_val = item.product_variation.barcode or ''
-                if not barcode_val and hasattr(item.product, 'barcode'):
-                    barcode_val = item.product.barcode or ''
-                if not sku:
-                    sku = item.product_variation.sku
-            else:
-                if hasattr(item.product, 'barcode'):
-                    barcode_val = item.product.barcode or ''
-            
-            items.append({
-                'id': item.id,
-                'product_name': item.product_name,
-                'product_sku': sku,
-                'product_barcode': barcode_val,
-                'price': str(item.price),
-                'quantity': item.quantity,
-                'product_variation': item.product_variation.sku if item.product_variation else None
-            })
-        
         return JsonResponse({
             'success': True,
             'order': {
@@ -5325,7 +5416,7 @@ def api_get_order_by_barcode(request):
                 'customer_email': order.customer_email or '',
                 'created_at': order.created_at.strftime('%b %d, %Y'),
                 'total_amount': str(order.total_amount),
-                'items': items
+                'items': order_lookup.return_items(order),  # per-process LRU for repeated scans
             }
         })
         
@@ -5347,8 +5438,7 @@ def return_detail(request, return_id):
         ReturnRequest.objects.select_related(
             'order', 'customer', 'created_by', 'approved_by', 'quality_checked_by'
         ).prefetch_related('items', 'activity_logs'),
-        id=return_id,
-        is_deleted=False  # ✅ Only show non-deleted returns
+        id=return_id  # ✅ Only show non-deleted returns (live manager)
     )
     
     if request.method == 'POST':
@@ -5361,7 +5451,7 @@ def return_detail(request, return_id):
                 return_request.approved_at = timezone.now()
                 return_request.save()
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='approved',
@@ -5378,7 +5468,7 @@ def return_detail(request, return_id):
                 return_request.approved_at = timezone.now()
                 return_request.save()
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='rejected',
@@ -5391,7 +5481,7 @@ def return_detail(request, return_id):
                 return_request.return_status = 'received'
                 return_request.save()
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='received',
@@ -5411,7 +5501,7 @@ def return_detail(request, return_id):
                 return_request.quality_checked_at = timezone.now()
                 return_request.save()
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='quality_checked',
@@ -5444,7 +5534,7 @@ def return_detail(request, return_id):
                     item.restocked_by = request.user
                     item.save()
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='refunded',
@@ -5458,7 +5548,7 @@ def return_detail(request, return_id):
                 return_request.admin_notes = admin_notes
                 return_request.save()
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='notes_updated',
@@ -5492,12 +5582,12 @@ def return_detail(request, return_id):
 @permission_required('can_delete_returns')
 def return_trash(request, return_id):
     """Move return to trash (soft delete)"""
-    return_request = get_object_or_404(ReturnRequest, id=return_id, is_deleted=False)
+    return_request = get_object_or_404(ReturnRequest.objects, id=return_id)
     
     if request.method == 'POST':
         return_request.soft_delete(request.user)
         
-        ReturnActivityLog.objects.create(
+        activity_log.log_return(
             return_request=return_request,
             user=request.user,
             action_type='trashed',
@@ -5516,7 +5606,7 @@ def return_trash(request, return_id):
 def returns_trash_list(request):
     """View all trashed returns"""
     
-    trashed_returns = ReturnRequest.objects.filter(is_deleted=True).select_related(
+    trashed_returns = ReturnRequest.trashed.select_related(
         'order', 'customer', 'created_by', 'deleted_by'
     ).order_by('-deleted_at')
     
@@ -5547,12 +5637,12 @@ def returns_trash_list(request):
 @permission_required('can_delete_returns')
 def return_restore(request, return_id):
     """Restore return from trash"""
-    return_request = get_object_or_404(ReturnRequest, id=return_id, is_deleted=True)
+    return_request = get_object_or_404(ReturnRequest.trashed, id=return_id)
     
     if request.method == 'POST':
         return_request.restore()
         
-        ReturnActivityLog.objects.create(
+        activity_log.log_return(
             return_request=return_request,
             user=request.user,
             action_type='restored',
@@ -5570,7 +5660,7 @@ def return_restore(request, return_id):
 @admin_only
 def return_permanent_delete(request, return_id):
     """Permanently delete return (Admin only)"""
-    return_request = get_object_or_404(ReturnRequest, id=return_id, is_deleted=True)
+    return_request = get_object_or_404(ReturnRequest.trashed, id=return_id)
     
     if request.method == 'POST':
         rma_number = return_request.rma_number
@@ -5589,13 +5679,12 @@ def returns_empty_trash(request):
     """Empty trash - permanently delete all trashed returns (Admin only)"""
     
     if request.method == 'POST':
-        trashed_count = ReturnRequest.objects.filter(is_deleted=True).count()
-        ReturnRequest.objects.filter(is_deleted=True).delete()
+        trashed_count = purge.purge(ReturnRequest.trashed.all())
         
         messages.success(request, f'✅ {trashed_count} return(s) permanently deleted from trash!')
         return redirect('returns_trash_list')
     
-    trashed_count = ReturnRequest.objects.filter(is_deleted=True).count()
+    trashed_count = ReturnRequest.trashed.count()
     context = {'trashed_count': trashed_count}
     return render(request, 'returns/empty_trash_confirm.html', context)
 
@@ -5604,6 +5693,7 @@ def returns_empty_trash(request):
 
 @login_required
 @permission_required('can_delete_returns')
+@activity_log.collect_activity
 def returns_bulk_action(request):
     """Handle bulk actions on returns"""
     
@@ -5615,14 +5705,14 @@ def returns_bulk_action(request):
             messages.error(request, '❌ No returns selected!')
             return redirect('returns_list')
         
-        returns = ReturnRequest.objects.filter(id__in=return_ids, is_deleted=False)
+        returns = ReturnRequest.objects.filter(id__in=return_ids)
         count = returns.count()
         
         if action == 'trash':
             for return_request in returns:
                 return_request.soft_delete(request.user)
                 
-                ReturnActivityLog.objects.create(
+                activity_log.log_return(
                     return_request=return_request,
                     user=request.user,
                     action_type='trashed',
@@ -5637,6 +5727,7 @@ def returns_bulk_action(request):
                 approved_by=request.user,
                 approved_at=timezone.now()
             )
+            returns_analytics.invalidate()  # update() sends no post_save
             messages.success(request, f'✅ {count} return(s) approved!')
             
         elif action == 'reject':
@@ -5645,12 +5736,109 @@ def returns_bulk_action(request):
                 approved_by=request.user,
                 approved_at=timezone.now()
             )
+            returns_analytics.invalidate()
             messages.success(request, f'✅ {count} return(s) rejected!')
         
         return redirect('returns_list')
     
     return redirect('returns_list')
 
+
+@login_required
+@permission_required('can_approve_returns')
+def returns_batch(request):
+    """Approve / receive / restock / refund many returns at once, e.g. a courier's return sack"""
+    context = {
+        'actions': [(action, label) for action, (label, _, _) in return_workflow.ACTIONS.items()],
+        'references': request.GET.get('references', ''),
+    }
+    
+    if request.method == 'POST':
+        action = request.POST.get('action', '')
+        context['references'] = request.POST.get('references', '')
+        ids, rma_numbers = return_workflow.parse_references(context['references'])
+        ids += [int(pk) for pk in request.POST.getlist('return_ids') if pk.isdigit()]
+        if not ids and not rma_numbers:
+            messages.error(request, '❌ No returns selected!')
+            return render(request, 'returns/batch.html', context)
+        
+        try:
+            result = return_workflow.apply(
+                action, request.user, ids=ids, rma_numbers=rma_numbers,
+                rejection_reason=request.POST.get('rejection_reason', '').strip(),
+            )
+        except ValueError as e:
+            messages.error(request, f'❌ {e}')
+            return render(request, 'returns/batch.html', context)
+        
+        if result.processed:
+            message = f'✅ {result.processed} return(s) processed in {result.seconds:.2f}s'
+            if result.restocked_units:
+                message += f', {result.restocked_units} unit(s) restocked'
+            messages.success(request, message)
+        if result.skipped or result.not_found:
+            messages.warning(request, f'⚠️ {result.skipped} skipped, {result.not_found} not found')
+        context['result'] = result
+        context['action'] = action
+    
+    return render(request, 'returns/batch.html', context)
+
+
+def _sales_report_params(request):
+    """sales_facts.report() kwargs from GET: group_by=week,channel&date_from=2026-01-01&city=Kathmandu"""
+    params = {
+        # Comma-separated, or repeated as the page's checkboxes send it
+        'group_by': [name.strip() for name in ','.join(request.GET.getlist('group_by')).split(',') if name.strip()],
+        'date_from': parse_date(request.GET.get('date_from', '')),
+        'date_to': parse_date(request.GET.get('date_to', '')),
+    }
+    for name in sales_facts.FILTERS:
+        if request.GET.get(name, '').strip():
+            params[name] = request.GET[name].strip()
+    return params
+
+
+@login_required
+@permission_required('can_view_sales_reports')
+def sales_report(request):
+    """Units and revenue grouped by date bucket, product, category, channel, city, in/out valley and staff"""
+    today = timezone.localdate()
+    # Default view: the last 30 days by day
+    params = {'group_by': ['day'], 'date_from': today - timedelta(days=30), 'date_to': today}
+    report = {'rows': [], 'totals': {}, 'truncated': False}
+    try:
+        if request.GET:
+            params = _sales_report_params(request)
+        report = sales_facts.report(**params)
+    except ValueError as e:
+        messages.error(request, f'❌ {e}')
+    if report['truncated']:
+        messages.warning(request, f'⚠️ Showing the first {sales_facts.REPORT_LIMIT} rows, narrow the filters to see the rest')
+    
+    group_by = list(dict.fromkeys(params['group_by']))
+    context = {
+        'report': report,
+        'params': params,
+        'group_by': group_by,
+        # Names instead of ids where report() labelled them
+        'table': [([row.get(f'{name}_label') or row[name] for name in group_by], row) for row in report['rows']],
+        'dimensions': list(sales_facts.DIMENSIONS),
+        'filters': [(name, params.get(name, '')) for name in sales_facts.FILTERS],
+    }
+    return render(request, 'sales_report.html', context)
+
+
+@login_required
+@permission_required('can_view_sales_reports')
+def api_sales_report(request):
+    """JSON version of the sales report, same GET parameters"""
+    try:
+        report = sales_facts.report(**_sales_report_params(request))
+    except ValueError as e:  # unknown dimension, or a date like 2026-02-30
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': True, **report})
+
+
 # phone search API
 @login_required
 @require_http_methods(["GET"])
@@ -5763,7 +5951,7 @@ def create_custom_product(request):
         base_slug = slugify(sku)
         slug = base_slug
         counter = 1
-        while Product.objects.filter(slug=slug).exists():
+        while Product.all_objects.filter(slug=slug).exists():
             slug = f'{base_slug}-{counter}'
             counter += 1
         
@@ -5824,7 +6012,6 @@ def ncm_orders_list(request):
     """
     # Get all NCM orders (orders with ncm_order_id)
     orders = Order.objects.select_related('customer', 'created_by').filter(
-        is_deleted=False,
         logistics='ncm',
         ncm_order_id__isnull=False
     ).order_by('-ncm_created_at')
@@ -5871,7 +6058,6 @@ def ncm_orders_list(request):
     
     # Get unique branches and statuses for filter dropdowns
     branches = Order.objects.filter(
-        is_deleted=False,
         logistics='ncm'
     ).exclude(
         ncm_from_branch__isnull=True
@@ -5880,7 +6066,6 @@ def ncm_orders_list(request):
     ).values_list('ncm_from_branch', flat=True).distinct().order_by('ncm_from_branch')
     
     statuses = Order.objects.filter(
-        is_deleted=False,
         logistics='ncm'
     ).exclude(
         ncm_status__isnull=True
@@ -5908,8 +6093,6 @@ def ncm_orders_list(request):
     # ✅ GET ACTIVITY LOGS FOR PAGINATED ORDERS
     activity_logs = {}
     try:
-        from dashboard.models import OrderActivityLog
-        
         order_ids = [order.id for order in orders_page]
         all_logs = OrderActivityLog.objects.filter(
             order_id__in=order_ids
@@ -5950,7 +6133,7 @@ def ncm_order_detail(request, order_id):
     """
     View detailed information about NCM order with activity logs
     """
-    order = get_object_or_404(Order, id=order_id, is_deleted=False)
+    order = get_object_or_404(Order.objects, id=order_id)
     
     # Check if order has NCM ID
     if not order.ncm_order_id:
@@ -5965,7 +6148,6 @@ def ncm_order_detail(request, order_id):
     # Get activity logs
     activity_logs = []
     try:
-        from dashboard.models import OrderActivityLog
         activity_logs = OrderActivityLog.objects.filter(
             order=order
         ).select_related('user').order_by('-created_at')[:50]
@@ -5982,179 +6164,120 @@ def ncm_order_detail(request, order_id):
     return render(request, 'ncm_order_detail.html', context)
 
 
+def _record_ncm_status(order, new_status, user):
+    """Store a changed NCM status with an activity log entry; True if it changed."""
+    old_status = order.ncm_status
+    if not new_status or new_status == old_status:
+        return False
+    order.ncm_status = new_status
+    # The instance may predate the NCM lookups; leave other columns alone
+    order.save(update_fields=['ncm_status', 'updated_at'])
+    activity_log.log_order(
+        order=order,
+        user=user,
+        action_type='status_changed',
+        description=f'NCM status updated from "{old_status}" to "{new_status}"',
+        field_name='ncm_status',
+        old_value=old_status or 'N/A',
+        new_value=new_status
+    )
+    return True
+
+
+def _record_ncm_statuses(orders, statuses, user):
+    """Apply {ncm_order_id: status} to orders in one transaction; ids of changed orders."""
+    with transaction.atomic(), activity_log.collect():
+        return {
+            order.id for order in orders
+            if _record_ncm_status(order, statuses.get(order.ncm_order_id), user)
+        }
+
+
+async def _ncm_orders(queryset):
+    return [order async for order in queryset.filter(ncm_order_id__isnull=False)]
+
+
 @login_required
-def ncm_track_order(request, order_id):
+async def ncm_track_order(request, order_id):
     """
     Track NCM order status from NCM API and update local database
     """
-    try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=False)
-        
-        # Check if order has NCM ID
-        if not order.ncm_order_id:
-            messages.error(request, f'❌ Order {order.order_number} has not been sent to NCM yet.')
-            return redirect('ncm_orders_list')
-        
-        # Get NCM API settings
-        base_url = getattr(settings, 'NCM_API_BASE_URL', None)
-        api_key = getattr(settings, 'NCM_API_KEY', None)
-        
-        if not base_url or not api_key:
-            messages.error(request, '❌ NCM API credentials not configured in settings.')
-            return redirect('ncm_order_detail', order_id=order_id)
-        
-        # Build API URL
-        api_url = f"{base_url.rstrip('/')}/orderstatus"
-        
-        print(f"\n{'='*70}")
-        print(f"🔍 Tracking NCM Order: {order.order_number}")
-        print(f"📍 NCM Order ID: {order.ncm_order_id}")
-        print(f"🌐 API URL: {api_url}")
-        print(f"{'='*70}\n")
-        
-        # Call NCM tracking API
-        response = requests.get(
-            api_url,
-            params={'id': order.ncm_order_id},
-            headers={
-                'Authorization': f'Token {api_key}',
-                'Content-Type': 'application/json'
-            },
-            timeout=15
-        )
-        
-        print(f"📥 Response Status: {response.status_code}")
-        print(f"📄 Response Body: {response.text}\n")
-        
-        if response.status_code == 200:
-            try:
-                data = response.json()
-                
-                # NCM returns array of status history
-                if data and isinstance(data, list) and len(data) > 0:
-                    latest_status = data[0]
-                    new_status = latest_status.get('status', '')
-                    
-                    print(f"✅ Latest Status: {new_status}\n")
-                    
-                    if new_status:
-                        old_status = order.ncm_status
-                        
-                        # Update order status if changed
-                        if new_status != old_status:
-                            order.ncm_status = new_status
-                            order.save()
-                            
-                            # Log activity
-                            try:
-                                from dashboard.models import OrderActivityLog
-                                OrderActivityLog.objects.create(
-                                    order=order,
-                                    user=request.user,
-                                    action_type='status_changed',
-                                    description=f'NCM status updated from "{old_status}" to "{new_status}"',
-                                    field_name='ncm_status',
-                                    old_value=old_status or 'N/A',
-                                    new_value=new_status
-                                )
-                            except Exception as e:
-                                print(f"⚠️ Error logging activity: {e}")
-                            
-                            messages.success(request, f'✅ Status updated to: {new_status}')
-                        else:
-                            messages.info(request, f'ℹ️ Current status: {new_status} (No change)')
-                    else:
-                        messages.warning(request, 'ℹ️ No status information in response')
-                else:
-                    messages.info(request, 'ℹ️ No tracking data available yet from NCM')
-                    
-            except ValueError as e:
-                messages.error(request, f'❌ Invalid JSON response from NCM API')
-                print(f"❌ JSON Parse Error: {e}\n")
-        
-        elif response.status_code == 404:
-            messages.error(request, f'❌ NCM Order ID {order.ncm_order_id} not found in NCM system')
-        
-        elif response.status_code == 401:
-            messages.error(request, '❌ Authentication failed. Check NCM API key.')
-        
-        else:
-            messages.error(request, f'❌ Failed to fetch tracking data (HTTP {response.status_code})')
-        
-    except requests.exceptions.Timeout:
-        messages.error(request, '❌ Request timeout. NCM server is not responding.')
-    
-    except requests.exceptions.ConnectionError:
-        messages.error(request, '❌ Cannot connect to NCM server. Check internet connection.')
-    
-    except Exception as e:
-        messages.error(request, f'❌ Error: {str(e)}')
-        print(f"💥 Exception: {e}\n")
-        import traceback
-        traceback.print_exc()
-    
+    order = await aget_object_or_404(Order.objects, id=order_id)
+
+    # Check if order has NCM ID
+    if not order.ncm_order_id:
+        messages.error(request, f'❌ Order {order.order_number} has not been sent to NCM yet.')
+        return redirect('ncm_orders_list')
+
+    # Cached for NCM_TRACKING_CACHE_SECONDS, see services/ncm_tracking.py
+    result = await ncm_tracking.status_history(order.ncm_order_id)
+    new_status = ncm_tracking.latest_status(result)
+
+    if not result['success']:
+        messages.error(request, f"❌ Failed to fetch tracking data: {result.get('error')}")
+    elif new_status is None:
+        messages.info(request, 'ℹ️ No tracking data available yet from NCM')
+    elif await sync_to_async(_record_ncm_status)(order, new_status, request.user):
+        messages.success(request, f'✅ Status updated to: {new_status}')
+    else:
+        messages.info(request, f'ℹ️ Current status: {new_status} (No change)')
+
     # Redirect back to detail page
     return redirect('ncm_order_detail', order_id=order_id)
 
 
+# Most orders ncm_track_orders_batch looks up per call (a list page is 25)
+NCM_TRACKING_BATCH_LIMIT = 100
+
+
+@login_required
+@require_POST
+async def ncm_track_orders_batch(request):
+    """
+    Track a page of NCM orders in parallel: POST order_ids=..., returns the
+    current NCM status per order id and stores the ones that changed.
+    """
+    order_ids = [int(i) for i in request.POST.getlist('order_ids') if i.isdigit()][:NCM_TRACKING_BATCH_LIMIT]
+    orders = await _ncm_orders(Order.objects.filter(id__in=order_ids))
+
+    results = await ncm_tracking.status_histories([order.ncm_order_id for order in orders])
+    statuses = {ncm_id: ncm_tracking.latest_status(result) for ncm_id, result in results.items()}
+    user = await request.auser()
+    changed = await sync_to_async(_record_ncm_statuses)(orders, statuses, user)
+
+    return conditional.FastJsonResponse({
+        'success': True,
+        'orders': {
+            str(order.id): {
+                'ncm_status': order.ncm_status,
+                'changed': order.id in changed,
+                'error': None if results[order.ncm_order_id]['success'] else str(results[order.ncm_order_id].get('error')),
+            }
+            for order in orders
+        },
+    })
+
+
 @login_required
-def ncm_sync_all_statuses(request):
+async def ncm_sync_all_statuses(request):
     """
     Sync status for all NCM orders (admin function)
     """
-    if not request.user.is_staff:
+    user = await request.auser()
+    if not user.is_staff:
         messages.error(request, '❌ Admin access required')
         return redirect('ncm_orders_list')
     
     try:
-        # Get all NCM orders
-        ncm_orders = Order.objects.filter(
-            is_deleted=False,
-            logistics='ncm'
-        ).exclude(
-            Q(ncm_order_id__isnull=True) | Q(ncm_order_id='')
-        )
-        
-        total = ncm_orders.count()
-        updated = 0
-        errors = 0
-        
-        for order in ncm_orders:
-            try:
-                # Call tracking for each order
-                base_url = getattr(settings, 'NCM_API_BASE_URL', None)
-                api_key = getattr(settings, 'NCM_API_KEY', None)
-                
-                if not base_url or not api_key:
-                    continue
-                
-                api_url = f"{base_url.rstrip('/')}/orderstatus"
-                
-                response = requests.get(
-                    api_url,
-                    params={'id': order.ncm_order_id},
-                    headers={
-                        'Authorization': f'Token {api_key}',
-                        'Content-Type': 'application/json'
-                    },
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and isinstance(data, list) and len(data) > 0:
-                        latest_status = data[0]
-                        new_status = latest_status.get('status', '')
-                        
-                        if new_status and new_status != order.ncm_status:
-                            order.ncm_status = new_status
-                            order.save()
-                            updated += 1
-            except:
-                errors += 1
-                continue
-        
-        messages.success(request, f'✅ Synced {updated} orders out of {total}. Errors: {errors}')
+        orders = await _ncm_orders(Order.objects.filter(logistics='ncm'))
+
+        # Fresh lookups, NCM_TRACKING_CONCURRENCY at a time
+        results = await ncm_tracking.status_histories([order.ncm_order_id for order in orders], refresh=True)
+        statuses = {ncm_id: ncm_tracking.latest_status(result) for ncm_id, result in results.items()}
+        errors = sum(1 for result in results.values() if not result['success'])
+        updated = len(await sync_to_async(_record_ncm_statuses)(orders, statuses, user))
+
+        messages.success(request, f'✅ Synced {updated} orders out of {len(orders)}. Errors: {errors}')
     
     except Exception as e:
         messages.error(request, f'❌ Sync failed: {str(e)}')
@@ -6162,13 +6285,24 @@ def ncm_sync_all_statuses(request):
     return redirect('ncm_orders_list')
 
 
-@login_required
-def ncm_branches_json(request):
+NCM_BRANCHES_CACHE_KEY = 'ncm:branches'
+
+
+def _wants_json(request):
+    return request.headers.get('Accept') == 'application/json' or request.GET.get('format') == 'json'
+
+
+def _fetch_ncm_branches():
     """
-    Display NCM branches fetched from NCM API as HTML page or JSON API
+    (branches, error_message) from the NCM API; successful lookups are cached
+    for NCM_BRANCHES_CACHE_SECONDS.
     """
     import requests
     from django.conf import settings
+
+    cached = cache.get(NCM_BRANCHES_CACHE_KEY)
+    if cached is not None:
+        return cached['branches'], None
     
     branches = []
     error_message = None
@@ -6246,12 +6380,36 @@ def ncm_branches_json(request):
     except Exception as e:
         error_message = f'Error fetching branches: {str(e)}'
         print(f"💥 Error: {error_message}")
+
+    if error_message is None:
+        # The stamp doubles as the ETag of the JSON response
+        cache.set(
+            NCM_BRANCHES_CACHE_KEY, {'branches': branches, 'stamp': time.time_ns()},
+            settings.NCM_BRANCHES_CACHE_SECONDS,
+        )
+    return branches, error_message
+
+
+def _ncm_branches_etag(request):
+    cached = cache.get(NCM_BRANCHES_CACHE_KEY)
+    if not _wants_json(request) or cached is None:
+        return None
+    return cached['stamp']
+
+
+@login_required
+@conditional.etag_json(_ncm_branches_etag)
+def ncm_branches_json(request):
+    """
+    Display NCM branches fetched from NCM API as HTML page or JSON API
+    """
+    branches, error_message = _fetch_ncm_branches()
     
     # Return JSON if requested via API
-    if request.headers.get('Accept') == 'application/json' or request.GET.get('format') == 'json':
+    if _wants_json(request):
         if error_message:
-            return JsonResponse({'error': error_message, 'branches': []}, status=400)
-        return JsonResponse({'branches': branches})
+            return conditional.FastJsonResponse({'error': error_message, 'branches': []}, status=400)
+        return conditional.FastJsonResponse({'branches': branches})
     
     # Otherwise return HTML page
     context = {
@@ -6264,6 +6422,7 @@ def ncm_branches_json(request):
 
 
 @login_required
+@activity_log.collect_activity
 def orders_bulk_ncm_send(request):
     """
     Bulk send multiple orders to NCM logistics
@@ -6285,7 +6444,7 @@ def orders_bulk_ncm_send(request):
             return redirect('orders_list')
         
         # Get orders
-        orders = Order.objects.filter(id__in=order_ids, is_deleted=False)
+        orders = Order.objects.filter(id__in=order_ids)
         
         if not orders.exists():
             messages.error(request, '❌ No valid orders found')
@@ -6359,7 +6518,7 @@ def ncm_single_order_send(request, order_id):
         return redirect('order_detail', order_id=order_id)
     
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=False)
+        order = get_object_or_404(Order.objects, id=order_id)
         
         result = send_single_order_to_ncm(request, order)
         
@@ -6515,8 +6674,7 @@ def send_single_order_to_ncm(request, order, from_branch='TINKUNE', delivery_typ
                 
                 # Log activity
                 try:
-                    from dashboard.models import OrderActivityLog
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user if request else None,
                         action_type='status_changed',
@@ -6606,8 +6764,7 @@ def ncm_orders_trash(request):
     NCM Orders Trash - Shows deleted NCM orders
     """
     # Get all deleted NCM orders
-    orders = Order.objects.select_related('customer', 'created_by').filter(
-        is_deleted=True,
+    orders = Order.trashed.select_related('customer', 'created_by').filter(
         logistics='ncm',
         ncm_order_id__isnull=False
     ).order_by('-deleted_at')
@@ -6633,8 +6790,7 @@ def ncm_orders_trash(request):
     total_orders = orders.count()
     
     # Get unique branches for filter dropdown
-    branches = Order.objects.filter(
-        is_deleted=True,
+    branches = Order.trashed.filter(
         logistics='ncm'
     ).exclude(
         ncm_from_branch__isnull=True
@@ -6678,7 +6834,7 @@ def ncm_order_move_to_trash(request, order_id):
     Move NCM order to trash (soft delete)
     """
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=False)
+        order = get_object_or_404(Order.objects, id=order_id)
         
         # Soft delete
         order.is_deleted = True
@@ -6688,8 +6844,7 @@ def ncm_order_move_to_trash(request, order_id):
         
         # Log activity
         try:
-            from dashboard.models import OrderActivityLog
-            OrderActivityLog.objects.create(
+            activity_log.log_order(
                 order=order,
                 user=request.user,
                 action_type='status_changed',
@@ -6718,7 +6873,7 @@ def ncm_order_restore(request, order_id):
     Restore NCM order from trash
     """
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=True)
+        order = get_object_or_404(Order.trashed, id=order_id)
         
         # Restore order
         order.is_deleted = False
@@ -6728,8 +6883,7 @@ def ncm_order_restore(request, order_id):
         
         # Log activity
         try:
-            from dashboard.models import OrderActivityLog
-            OrderActivityLog.objects.create(
+            activity_log.log_order(
                 order=order,
                 user=request.user,
                 action_type='status_changed',
@@ -6753,7 +6907,7 @@ def ncm_order_permanent_delete(request, order_id):
     Permanently delete NCM order (cannot be undone)
     """
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=True)
+        order = get_object_or_404(Order.trashed, id=order_id)
         
         order_number = order.order_number
         
@@ -6770,6 +6924,7 @@ def ncm_order_permanent_delete(request, order_id):
 
 @login_required
 @require_http_methods(["POST"])
+@activity_log.collect_activity
 def ncm_orders_bulk_trash_action(request):
     """
     Bulk actions for trash: restore or permanent delete
@@ -6786,7 +6941,7 @@ def ncm_orders_bulk_trash_action(request):
             messages.error(request, '❌ No action selected')
             return redirect('ncm_orders_trash')
         
-        orders = Order.objects.filter(id__in=order_ids, is_deleted=True)
+        orders = Order.trashed.filter(id__in=order_ids)
         count = orders.count()
         
         if action == 'restore':
@@ -6799,8 +6954,7 @@ def ncm_orders_bulk_trash_action(request):
                 
                 # Log activity
                 try:
-                    from dashboard.models import OrderActivityLog
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         user=request.user,
                         action_type='status_changed',
@@ -6813,7 +6967,7 @@ def ncm_orders_bulk_trash_action(request):
         
         elif action == 'permanent_delete':
             # Permanently delete all selected orders
-            orders.delete()
+            purge.purge(orders)
             messages.success(request, f'✅ {count} order(s) permanently deleted')
         
         else:
@@ -6837,8 +6991,7 @@ def ncm_orders_empty_trash(request):
     
     try:
         # Get all deleted NCM orders
-        orders = Order.objects.filter(
-            is_deleted=True,
+        orders = Order.trashed.filter(
             logistics='ncm'
         ).exclude(
             Q(ncm_order_id__isnull=True) | Q(ncm_order_id='')
@@ -6851,7 +7004,7 @@ def ncm_orders_empty_trash(request):
             return redirect('ncm_orders_trash')
         
         # Permanently delete all
-        orders.delete()
+        purge.purge(orders)
         
         messages.success(request, f'✅ Trash emptied! {count} order(s) permanently deleted')
     
@@ -6859,3 +7012,46 @@ def ncm_orders_empty_trash(request):
         messages.error(request, f'❌ Error: {str(e)}')
     
     return redirect('ncm_orders_trash')
+
+
+# ==================== PERFORMANCE MONITORING ====================
+
+def _performance_summary(request):
+    from .performance import summarize
+    try:
+        hours = max(1, min(int(request.GET.get('hours', 24)), 24 * 30))
+    except (TypeError, ValueError):
+        hours = 24
+    return hours, summarize(timezone.now() - timedelta(hours=hours))
+
+
+@login_required
+@admin_only
+def performance_dashboard(request):
+    """Per-view timings, query counts and N+1 suspects collected by PerformanceMiddleware"""
+    from .performance import HISTOGRAM_BUCKETS_MS
+    hours, summary = _performance_summary(request)
+    
+    context = {
+        'summary': summary,
+        'hours': hours,
+        'buckets': HISTOGRAM_BUCKETS_MS,
+        'monitoring_enabled': getattr(settings, 'PERF_MONITORING_ENABLED', False),
+        'n_plus_one_views': [row for row in summary if row['duplicate_queries']],
+    }
+    return render(request, 'performance.html', context)
+
+
+@login_required
+@admin_only
+def api_performance_metrics(request):
+    """JSON version of the performance dashboard"""
+    from .performance import HISTOGRAM_BUCKETS_MS
+    hours, summary = _performance_summary(request)
+    
+    return JsonResponse({
+        'success': True,
+        'hours': hours,
+        'histogram_buckets_ms': list(HISTOGRAM_BUCKETS_MS),
+        'views': summary,
+    })
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-19 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logistics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logisticsorder',
+            index=models.Index(fields=['ncm_order_id'], name='logistics_ncm_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logisticsorder',
+            index=models.Index(fields=['order_reference'], name='logistics_order_ref_idx'),
+        ),
+    ]
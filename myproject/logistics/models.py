@@ -52,6 +52,11 @@ class LogisticsOrder(models.Model):
     
     class Meta:
         db_table = 'logistics_order'
+        indexes = [
+            # webhook looks orders up by NCM id, sync views by our reference
+            models.Index(fields=['ncm_order_id'], name='logistics_ncm_order_idx'),
+            models.Index(fields=['order_reference'], name='logistics_order_ref_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_reference} - NCM #{self.ncm_order_id}"
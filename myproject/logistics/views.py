@@ -84,8 +84,7 @@ def logistics_dashboard(request):
     try:
         ready_to_send = Order.objects.filter(
             order_status='confirmed',
-            ncm_order_id__isnull=True,
-            is_deleted=False
+            ncm_order_id__isnull=True
         ).count()
     except:
         ready_to_send = 0
@@ -111,7 +110,7 @@ def logistics_dashboard(request):
 def send_order_to_ncm(request, order_id):
     """Send individual order to NCM"""
     
-    order = get_object_or_404(Order, id=order_id, is_deleted=False)
+    order = get_object_or_404(Order.objects, id=order_id)
     
     # Check if already sent
     if order.ncm_order_id:
@@ -166,7 +165,7 @@ def bulk_send_to_ncm(request):
         
         for order_id in order_ids:
             try:
-                order = Order.objects.get(id=order_id, is_deleted=False)
+                order = Order.objects.get(id=order_id)
                 
                 if order.ncm_order_id:
                     continue
@@ -209,7 +208,7 @@ def bulk_send_to_ncm(request):
 def sync_ncm_status_view(request, order_id):
     """Sync single order status from NCM"""
     
-    order = get_object_or_404(Order, id=order_id, is_deleted=False)
+    order = get_object_or_404(Order.objects, id=order_id)
     
     if not order.ncm_order_id:
         messages.warning(request, 'Order not sent to NCM yet')
@@ -241,8 +240,7 @@ def bulk_sync_ncm_status(request):
     
     if request.method == 'POST':
         ncm_orders = Order.objects.filter(
-            ncm_order_id__isnull=False,
-            is_deleted=False
+            ncm_order_id__isnull=False
         ).exclude(ncm_status__in=['DELIVERED', 'RETURNED', 'CANCELLED'])
         
         service = NCMService()
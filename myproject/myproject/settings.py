@@ -54,14 +54,46 @@ INSTALLED_APPS.extend(EXTERNAL_APPS)
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'dashboard.middleware.StaticAssetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.middleware.PerformanceMiddleware',
 ]
 
+# Per-view timing / query-count collection, see dashboard/performance.py
+PERF_MONITORING_ENABLED = config('PERF_MONITORING_ENABLED', default=False, cast=bool)
+PERF_FLUSH_INTERVAL = config('PERF_FLUSH_INTERVAL', default=60, cast=int)  # seconds
+
+# Results of the benchmark_* management commands (JSON lines, one per case)
+BENCHMARK_RESULTS_FILE = config('BENCHMARK_RESULTS_FILE', default=os.path.join(BASE_DIR, 'logs', 'benchmarks.jsonl'))
+
+# Trash purging, see dashboard/purge.py and the purge_trash command
+TRASH_RETENTION_DAYS = config('TRASH_RETENTION_DAYS', default=30, cast=int)
+PURGE_CHUNK_SIZE = config('PURGE_CHUNK_SIZE', default=500, cast=int)
+
+# Returns dashboard numbers; returns invalidate them, units sold refresh after this
+RETURNS_ANALYTICS_CACHE_SECONDS = config('RETURNS_ANALYTICS_CACHE_SECONDS', default=300, cast=int)
+
+# Orders whose return-screen items each process keeps in memory, see dashboard/order_lookup.py
+ORDER_LOOKUP_CACHE_SIZE = config('ORDER_LOOKUP_CACHE_SIZE', default=256, cast=int)
+
+# Sales reports; any fact refresh invalidates them, see dashboard/sales_facts.py
+SALES_REPORT_CACHE_SECONDS = config('SALES_REPORT_CACHE_SECONDS', default=600, cast=int)
+
+# Month-partitioned Parquet files for offline analytics, see dashboard/analytics_export.py
+ANALYTICS_EXPORT_DIR = config('ANALYTICS_EXPORT_DIR', default=os.path.join(BASE_DIR, 'exports', 'analytics'))
+
+# Thumbnail / medium / WebP copies of uploaded images, see dashboard/images.py
+IMAGE_DERIVATIVES_ASYNC = config('IMAGE_DERIVATIVES_ASYNC', default=True, cast=bool)
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)
+
+# Largest option matrix one "Generate All" may create, see dashboard/variation_matrix.py
+VARIATION_MATRIX_MAX = config('VARIATION_MATRIX_MAX', default=1000, cast=int)
+
 ROOT_URLCONF = 'myproject.urls'
 
 TEMPLATES = [
@@ -85,12 +117,95 @@ WSGI_APPLICATION = 'myproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE selects the profile: 'sqlite' (default, single box) or 'postgresql'.
+
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+
+if DB_ENGINE == 'postgresql':
+    # Persistent connections with health checks; set DB_POOL=True to use
+    # psycopg's connection pool instead (CONN_MAX_AGE must then be 0).
+    DB_POOL = config('DB_POOL', default=False, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='ecommerce'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
     }
-}
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
+else:
+    # WAL lets readers run alongside the single writer, and IMMEDIATE
+    # transactions take the write lock up front so concurrent writers wait up
+    # to DB_SQLITE_TIMEOUT seconds (sqlite3's busy timeout) instead of failing
+    # with "database is locked".
+    DB_SQLITE_TUNED = config('DB_SQLITE_TUNED', default=True, cast=bool)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('DB_NAME', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {},
+        }
+    }
+    if DB_SQLITE_TUNED:
+        DATABASES['default']['OPTIONS'] = {
+            'timeout': config('DB_SQLITE_TIMEOUT', default=20, cast=int),
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        }
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# With Redis (REDIS_URL) every worker sees the same cache, so sessions, users,
+# permissions, categories and the city directory are served from it and a
+# change made in one worker reaches all of them. Without it the cache is
+# per-process and those stay on the database.
+
+REDIS_URL = config('REDIS_URL', default='')
+SHARED_CACHE = bool(REDIS_URL)
+
+if SHARED_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    # Write-through: reads come from the cache, the DB copy survives restarts
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ecommerce-default',
+        }
+    }
+    # A logout or permission change would only clear one worker's copy
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+
+# Seconds a user row / principal may be served from cache
+USER_CACHE_TIMEOUT = config('USER_CACHE_TIMEOUT', default=300, cast=int)
 
 
 # Password validation
@@ -130,6 +245,16 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    # Content-hashed names plus .gz/.br copies, see dashboard/static_assets.py
+    'staticfiles': {'BACKEND': 'dashboard.static_assets.CompressedManifestStaticFilesStorage'},
+}
+# Serve STATIC_ROOT from the app (dashboard.middleware.StaticAssetMiddleware);
+# hashed files are cached for a year, anything else for STATIC_MAX_AGE seconds.
+# Off under DEBUG so edits in static/ aren't hidden behind stale collected copies
+STATIC_SERVE = config('STATIC_SERVE', default=not DEBUG, cast=bool)
+STATIC_MAX_AGE = config('STATIC_MAX_AGE', default=60, cast=int)
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
@@ -158,6 +283,11 @@ PASSWORD_RESET_TIMEOUT = 3600  # 1 hour
 NCM_API_KEY = config('NCM_API_KEY')
 NCM_API_BASE_URL = config('NCM_API_BASE_URL')
 NCM_API_BASE_URL_V2 = config('NCM_API_BASE_URL_V2')
+# Branch list behind ncm_branches_json; rarely changes
+NCM_BRANCHES_CACHE_SECONDS = config('NCM_BRANCHES_CACHE_SECONDS', default=60 * 60, cast=int)
+# Async tracking lookups, see services/ncm_tracking.py
+NCM_TRACKING_CACHE_SECONDS = config('NCM_TRACKING_CACHE_SECONDS', default=60, cast=int)
+NCM_TRACKING_CONCURRENCY = config('NCM_TRACKING_CONCURRENCY', default=8, cast=int)
 
 
 # Logging
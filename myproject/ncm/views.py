@@ -4,20 +4,24 @@ NCM (Nepal Can Move) Integration Views
 Handles order creation, status sync, and webhook processing
 """
 
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_http_methods
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 
 # Import NCM service from services folder
+from services import ncm_tracking
 from services.ncm_service import NCMService
 
 # Import models from accounts app
-from dashboard.models import Order, OrderActivityLog
+from dashboard import activity_log
+from dashboard.models import Order
 
+import asyncio
 import json
 import logging
 from datetime import datetime
@@ -62,7 +66,7 @@ def branches_json(request):
 def create_ncm_shipment(request, order_id):
     """Create NCM shipment for an existing order"""
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=False)
+        order = get_object_or_404(Order.objects, id=order_id)
         
         if order.ncm_order_id:
             messages.error(request, f'Order already exists in NCM with ID: {order.ncm_order_id}')
@@ -154,7 +158,7 @@ def create_ncm_shipment(request, order_id):
             order.status = 'processing'
             order.save()
             
-            OrderActivityLog.objects.create(
+            activity_log.log_order(
                 order=order,
                 action_type='updated',
                 user=request.user,
@@ -185,12 +189,29 @@ def create_ncm_shipment(request, order_id):
         return redirect('order_detail', order_id=order_id)
 
 
+def _store_synced_status(order, latest_status, user):
+    old_ncm_status = order.ncm_status
+    order.ncm_status = latest_status
+    order.status = ncm_service.map_ncm_status_to_system(latest_status)
+    order.save(update_fields=['ncm_status', 'status', 'updated_at'])
+    
+    activity_log.log_order(
+        order=order,
+        action_type='status_changed',
+        user=user,
+        field_name='ncm_status',
+        old_value=old_ncm_status or 'None',
+        new_value=latest_status,
+        description=f'Manual sync: {old_ncm_status or "None"} → {latest_status}'
+    )
+
+
 @login_required
 @require_http_methods(["GET", "POST"])
-def sync_ncm_status(request, order_id):
+async def sync_ncm_status(request, order_id):
     """Manually sync order status from NCM"""
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=False)
+        order = await aget_object_or_404(Order.objects, id=order_id)
         
         if not order.ncm_order_id:
             messages.error(request, 'Order not yet in NCM')
@@ -198,26 +219,13 @@ def sync_ncm_status(request, order_id):
         
         logger.info(f"Syncing NCM Order ID: {order.ncm_order_id}")
         
-        result = ncm_service.get_order_status(order.ncm_order_id)
+        # Bypass the tracking cache, but refresh it for the next page view
+        result = await ncm_tracking.status_history(order.ncm_order_id, refresh=True)
+        latest_status = ncm_tracking.latest_status(result)
         
-        if result['success'] and result['data']:
-            latest_status_data = result['data'][0]
-            latest_status = latest_status_data['status']
-            
-            old_ncm_status = order.ncm_status
-            order.ncm_status = latest_status
-            order.status = ncm_service.map_ncm_status_to_system(latest_status)
-            order.save()
-            
-            OrderActivityLog.objects.create(
-                order=order,
-                action_type='status_changed',
-                user=request.user,
-                field_name='ncm_status',
-                old_value=old_ncm_status or 'None',
-                new_value=latest_status,
-                description=f'Manual sync: {old_ncm_status or "None"} → {latest_status}'
-            )
+        if latest_status:
+            user = await request.auser()
+            await sync_to_async(_store_synced_status)(order, latest_status, user)
             
             logger.info(f"Status synced: {order.order_number} -> {latest_status}")
             messages.success(request, f'✓ Synced! NCM: {latest_status} | System: {order.status}')
@@ -236,6 +244,7 @@ def sync_ncm_status(request, order_id):
 
 @csrf_exempt
 @require_POST
+@activity_log.collect_activity
 def ncm_webhook(request):
     """Receive webhook from NCM when status changes"""
     try:
@@ -276,14 +285,15 @@ def ncm_webhook(request):
         
         for ncm_order_id in order_ids:
             try:
-                order = Order.objects.get(ncm_order_id=ncm_order_id, is_deleted=False)
+                # Trashed orders are still with the courier, keep tracking them
+                order = Order.all_objects.get(ncm_order_id=ncm_order_id)
                 
                 old_ncm_status = order.ncm_status
                 order.ncm_status = status
                 order.status = ncm_service.map_ncm_status_to_system(status)
                 order.save()
                 
-                OrderActivityLog.objects.create(
+                activity_log.log_order(
                     order=order,
                     action_type='status_changed',
                     field_name='ncm_status',
@@ -357,17 +367,20 @@ def ncm_branches_list(request):
 
 
 @login_required
-def track_ncm_order(request, order_id):
+async def track_ncm_order(request, order_id):
     """View tracking details"""
     try:
-        order = get_object_or_404(Order, id=order_id, is_deleted=False)
+        order = await aget_object_or_404(Order.objects, id=order_id)
         
         if not order.ncm_order_id:
             messages.error(request, 'Order not in NCM yet')
             return redirect('order_detail', order_id=order_id)
         
-        details_result = ncm_service.get_order_details(order.ncm_order_id)
-        status_result = ncm_service.get_order_status(order.ncm_order_id)
+        # Both lookups at once, cached briefly (services/ncm_tracking.py)
+        details_result, status_result = await asyncio.gather(
+            ncm_tracking.order_details(order.ncm_order_id),
+            ncm_tracking.status_history(order.ncm_order_id),
+        )
         
         context = {
             'order': order,
@@ -377,7 +390,7 @@ def track_ncm_order(request, order_id):
             'status_error': None if status_result['success'] else status_result.get('error')
         }
         
-        return render(request, 'ncm/tracking.html', context)
+        return await sync_to_async(render)(request, 'ncm/tracking.html', context)
         
     except Exception as e:
         logger.error(f"Error: {str(e)}")
@@ -387,12 +400,12 @@ def track_ncm_order(request, order_id):
 
 @login_required
 @require_http_methods(["GET", "POST"])
+@activity_log.collect_activity
 def bulk_sync_ncm_orders(request):
     """Sync multiple NCM orders at once"""
     try:
         ncm_orders = Order.objects.filter(
             ncm_order_id__isnull=False,
-            is_deleted=False,
             status__in=['processing', 'shipped']
         )
         
@@ -417,7 +430,7 @@ def bulk_sync_ncm_orders(request):
                     order.status = ncm_service.map_ncm_status_to_system(new_status)
                     order.save()
                     
-                    OrderActivityLog.objects.create(
+                    activity_log.log_order(
                         order=order,
                         action_type='status_changed',
                         user=request.user,
@@ -0,0 +1,68 @@
+# services/ncm_tracking.py
+"""
+Concurrent, cached NCM tracking lookups for the async views.
+
+NCMService is blocking (requests), so every call runs in a worker thread via
+asyncio.to_thread and never blocks the event loop; lookups for many orders
+overlap, at most NCM_TRACKING_CONCURRENCY at a time. Successful results are
+cached for NCM_TRACKING_CACHE_SECONDS so reopening a page doesn't call NCM
+again; refresh=True skips the cache (manual sync).
+
+    result = await ncm_tracking.status_history(order.ncm_order_id)
+    results = await ncm_tracking.status_histories([id1, id2, ...])
+    ncm_tracking.latest_status(result)  # 'Delivered' / None
+"""
+
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .ncm_service import NCMService
+
+ncm_service = NCMService()
+
+
+def _cache_key(kind, ncm_order_id):
+    return f'ncm:tracking:{kind}:{ncm_order_id}'
+
+
+async def _lookup(kind, fetch, ncm_order_id, refresh):
+    key = _cache_key(kind, ncm_order_id)
+    if not refresh:
+        cached = await cache.aget(key)
+        if cached is not None:
+            return cached
+    result = await asyncio.to_thread(fetch, ncm_order_id)
+    if result.get('success'):
+        await cache.aset(key, result, settings.NCM_TRACKING_CACHE_SECONDS)
+    return result
+
+
+async def status_history(ncm_order_id, refresh=False):
+    """NCMService.get_order_status() result; data is the history, newest first."""
+    return await _lookup('status', ncm_service.get_order_status, ncm_order_id, refresh)
+
+
+async def order_details(ncm_order_id, refresh=False):
+    """NCMService.get_order_details() result."""
+    return await _lookup('details', ncm_service.get_order_details, ncm_order_id, refresh)
+
+
+async def status_histories(ncm_order_ids, refresh=False):
+    """{ncm_order_id: status_history()} for many orders, fetched concurrently."""
+    semaphore = asyncio.Semaphore(settings.NCM_TRACKING_CONCURRENCY)
+
+    async def one(ncm_order_id):
+        async with semaphore:
+            return ncm_order_id, await status_history(ncm_order_id, refresh)
+
+    return dict(await asyncio.gather(*(one(ncm_order_id) for ncm_order_id in dict.fromkeys(ncm_order_ids))))
+
+
+def latest_status(result):
+    """Newest status string of a status_history() result, or None."""
+    data = result.get('data') if result.get('success') else None
+    if data and isinstance(data, list) and isinstance(data[0], dict):
+        return data[0].get('status') or None
+    return None